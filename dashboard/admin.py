@@ -1,7 +1,12 @@
 # dashboard/admin.py
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser
+from django.utils import timezone
+from .ledger import refresh_low_stock_locations
+from .models import (
+    BOMLine, CustomUser, LotAllocation, OrderStatusTransition, OutboxEvent, RoutingStep, StockBalance, StockLocation,
+    StockLot, StockReservation, WorkCenter,
+)
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -9,4 +14,115 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ['role', 'is_staff', 'is_superuser']
     fieldsets = UserAdmin.fieldsets + (
         ('Rôle', {'fields': ('role', 'phone')}),
-    )
\ No newline at end of file
+    )
+
+@admin.register(WorkCenter)
+class WorkCenterAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'capacity_minutes_per_day', 'efficiency', 'is_active']
+    list_filter = ['is_active']
+    search_fields = ['code', 'name']
+
+
+@admin.register(RoutingStep)
+class RoutingStepAdmin(admin.ModelAdmin):
+    list_display = ['product', 'sequence', 'operation', 'setup_minutes', 'run_minutes']
+    list_select_related = ['product']
+    search_fields = ['product__reference', 'operation']
+    raw_id_fields = ['product']
+    filter_horizontal = ['work_centers']
+
+
+@admin.register(BOMLine)
+class BOMLineAdmin(admin.ModelAdmin):
+    list_display = ['parent', 'component', 'quantity_per']
+    list_select_related = ['parent', 'component']
+    search_fields = ['parent__reference', 'component__reference']
+    raw_id_fields = ['parent', 'component']
+
+
+@admin.register(StockLocation)
+class StockLocationAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'kind', 'is_active']
+    list_filter = ['kind', 'is_active']
+    search_fields = ['code', 'name']
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    """Seuils d'alerte par emplacement ; les quantités ne bougent que par le journal de stock"""
+    list_display = ['product', 'location', 'quantity', 'min_quantity']
+    list_select_related = ['product', 'location']
+    list_filter = ['location']
+    search_fields = ['product__reference']
+    raw_id_fields = ['product']
+    readonly_fields = ['quantity']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_low_stock_locations([obj.product_id])
+
+
+@admin.register(StockLot)
+class StockLotAdmin(admin.ModelAdmin):
+    """Lots reçus ; les quantités ne bougent que par le journal de stock (ledger.receive_lot)"""
+    list_display = ['lot_number', 'product', 'location', 'received_at', 'expiry_date', 'quantity', 'remaining']
+    list_select_related = ['product', 'location']
+    list_filter = ['location']
+    search_fields = ['lot_number', 'product__reference']
+    raw_id_fields = ['product']
+    readonly_fields = ['quantity', 'remaining']
+
+
+@admin.register(LotAllocation)
+class LotAllocationAdmin(admin.ModelAdmin):
+    list_display = ['order_item', 'lot', 'quantity', 'created_at']
+    list_select_related = ['order_item__order', 'order_item__product', 'lot__product', 'lot__location']
+    search_fields = ['lot__lot_number', 'order_item__order__order_number']
+    raw_id_fields = ['lot', 'order_item']
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """Consultation seule : les réservations suivent le statut des commandes (reservations.py)"""
+    list_display = ['product', 'order_item', 'quantity', 'created_at']
+    list_select_related = ['product', 'order_item__order', 'order_item__product']
+    search_fields = ['product__reference', 'order_item__order__order_number']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OrderStatusTransition)
+class OrderStatusTransitionAdmin(admin.ModelAdmin):
+    """Consultation seule : l'historique est écrit par Order.save et Order.confirm_orders"""
+    list_display = ['order', 'from_status', 'to_status', 'changed_at', 'changed_by']
+    list_filter = ['to_status']
+    list_select_related = ['order', 'changed_by']
+    search_fields = ['order__order_number']
+    date_hierarchy = 'changed_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """Suivi de la livraison des événements (dashboard/outbox.py)"""
+    list_display = ['id', 'event_type', 'aggregate_type', 'aggregate_id', 'status', 'attempts', 'occurred_at', 'dispatched_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['aggregate_id']
+    readonly_fields = [field.name for field in OutboxEvent._meta.fields]
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Remettre à livrer")
+    def retry(self, request, queryset):
+        queryset.update(status='pending', attempts=0, next_attempt_at=timezone.now(), locked_until=None)
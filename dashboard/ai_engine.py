@@ -0,0 +1,336 @@
+"""
+Moteurs de réponse de l'assistant IA.
+
+Un moteur implémente `AnswerEngine.answer(question, context)`. Le moteur à
+règles historique est le moteur par défaut ; `LocalModelEngine` interroge un
+serveur de modèle hébergé localement (API compatible OpenAI : Ollama,
+llama.cpp, vLLM...). `answer_question` ajoute un cache des réponses, indexé
+sur la question normalisée et la version du contexte, et regroupe les
+questions identiques posées simultanément en un seul calcul. Le moteur reçoit
+la question normalisée : deux questions qui partagent une entrée du cache
+sont strictement identiques pour lui.
+"""
+import hashlib
+import json
+import logging
+import threading
+import urllib.request
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+from .models import ContextSnapshot
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_TTL = getattr(settings, 'AI_ANSWER_CACHE_TTL', 300)
+COALESCE_TIMEOUT = 60  # Attente max d'un calcul identique déjà en cours (secondes)
+
+
+# ========== MOTEURS ==========
+
+class AnswerEngine:
+    """Interface d'un moteur de réponse"""
+    name = 'base'
+
+    def answer(self, question, context):
+        raise NotImplementedError
+
+
+class RuleEngine(AnswerEngine):
+    """Moteur à règles : détection d'intention par mots-clés"""
+    name = 'rules'
+
+    def answer(self, question, context):
+        return generate_ai_response(question, context)
+
+
+class LocalModelEngine(AnswerEngine):
+    """Adaptateur pour un modèle hébergé localement (endpoint /v1/chat/completions)"""
+    name = 'local'
+
+    SYSTEM_PROMPT = (
+        "Tu es ERP Copilot, assistant d'un ERP de production. Réponds en français, "
+        "de façon concise, uniquement à partir des données métier fournies en JSON."
+    )
+
+    def __init__(self, url='http://127.0.0.1:11434/v1/chat/completions', model='mistral',
+                 timeout=30, temperature=0.2, fallback=True):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.temperature = temperature
+        self.fallback = RuleEngine() if fallback else None
+
+    def build_payload(self, question, context):
+        return {
+            'model': self.model,
+            'temperature': self.temperature,
+            'messages': [
+                {'role': 'system', 'content': self.SYSTEM_PROMPT},
+                {'role': 'system', 'content': 'Données métier : ' + json.dumps(context, cls=DjangoJSONEncoder, ensure_ascii=False)},
+                {'role': 'user', 'content': question},
+            ],
+        }
+
+    def answer(self, question, context):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(self.build_payload(question, context), cls=DjangoJSONEncoder).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode('utf-8'))
+            return body['choices'][0]['message']['content'].strip()
+        except Exception:
+            if self.fallback is None:
+                raise
+            logger.exception("Modèle local indisponible, repli sur le moteur à règles")
+            return self.fallback.answer(question, context)
+
+
+ENGINES = {
+    'rules': RuleEngine,
+    'local': LocalModelEngine,
+}
+
+_engine = None
+
+
+def get_engine():
+    """Moteur configuré par settings.AI_ENGINE ({'BACKEND': ..., 'OPTIONS': {...}})"""
+    global _engine
+    if _engine is None:
+        config = getattr(settings, 'AI_ENGINE', {})
+        backend = config.get('BACKEND', 'rules')
+        engine_class = ENGINES[backend] if backend in ENGINES else import_string(backend)
+        _engine = engine_class(**config.get('OPTIONS', {}))
+    return _engine
+
+
+# ========== CACHE ET REGROUPEMENT DES REQUÊTES ==========
+
+def normalize_question(question):
+    """Minuscules et espaces réduits ; accents et ponctuation sont conservés, car le moteur à règles
+    les distingue ('problème') et la réponse générale cite la question"""
+    return ' '.join(question.lower().split())
+
+
+def context_version(context):
+    """Empreinte du contexte métier : change dès qu'une donnée utile change"""
+    return ContextSnapshot.digest(context)
+
+
+def answer_cache_key(question, context, engine_name):
+    raw = f'{engine_name}|{normalize_question(question)}|{context_version(context)}'
+    return 'ai:answer:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _InFlight:
+    """Calcul en cours partagé entre les requêtes identiques"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def answer_question(question, context, engine=None):
+    """Répond via le moteur configuré (ou `engine`), avec cache et regroupement des questions identiques"""
+    engine = engine or get_engine()
+    question = normalize_question(question)
+    key = answer_cache_key(question, context, engine.name)
+
+    answer = cache.get(key)
+    if answer is not None:
+        return answer
+
+    with _inflight_lock:
+        call = _inflight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _inflight[key] = _InFlight()
+
+    if not is_leader:
+        # Une requête identique est déjà en cours : on attend son résultat
+        if call.done.wait(COALESCE_TIMEOUT) and call.error is None:
+            return call.result
+        return engine.answer(question, context)
+
+    try:
+        call.result = engine.answer(question, context)
+        cache.set(key, call.result, ANSWER_CACHE_TTL)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+# ========== MOTEUR À RÈGLES ==========
+
+def generate_ai_response(question, context):
+    """Génère une réponse intelligente basée sur les données"""
+    question_lower = question.lower()
+    
+    # Détection d'intention simple
+    if any(word in question_lower for word in ['stock', 'inventaire', 'niveau']):
+        return generate_stock_response(question, context)
+    elif any(word in question_lower for word in ['commande', 'production', 'retard']):
+        return generate_production_response(question, context)
+    elif any(word in question_lower for word in ['alerte', 'problème', 'urgence']):
+        return generate_alert_response(question, context)
+    elif any(word in question_lower for word in ['conseil', 'suggestion', 'optimiser']):
+        return generate_optimization_response(question, context)
+    else:
+        return generate_general_response(question, context)
+
+def generate_stock_response(question, context):
+    """Réponses intelligentes sur le stock"""
+    low_stock_count = len(context['low_stock_products'])
+    
+    if low_stock_count > 0:
+        products_list = "\n".join([
+            f"- {p['reference']} ({p['name']}) : {p['current_stock']} unités (min: {p['min_stock']})"
+            for p in context['low_stock_products'][:3]
+        ])
+        
+        return f"""🔴 **Alerte Stock** 
+
+J'ai détecté {low_stock_count} produits avec un stock faible :
+
+{products_list}
+
+**Recommandations :**
+• Planifier un réapprovisionnement urgent
+• Vérifier les commandes en cours pour ces produits
+• Contacter les fournisseurs prioritaires
+
+Voulez-vous que je génère une liste de réapprovisionnement ?"""
+    else:
+        return """✅ **État du Stock**
+
+Tous vos produits ont un niveau de stock satisfaisant ! 
+
+**Statistiques :**
+• Produits suivis : {total_products}
+• Aucune alerte stock active
+• Dernier mouvement : {last_movement}
+
+Tout semble sous contrôle ! 👍""".format(
+            total_products=context['total_products'],
+            last_movement=context['recent_stock_movements'][0]['created_at'].strftime('%d/%m/%Y') if context['recent_stock_movements'] else 'Aucun'
+        )
+
+def generate_production_response(question, context):
+    """Réponses intelligentes sur la production"""
+    delayed_count = len(context['delayed_orders'])
+    active_orders = context['active_orders_count']
+    
+    if delayed_count > 0:
+        orders_list = "\n".join([
+            f"- {o['order_number']} pour {o['customer__name']} (retard depuis {o['delivery_date']})"
+            for o in context['delayed_orders'][:3]
+        ])
+        
+        return f"""⚠️ **Retards de Production**
+
+{delayed_count} commande(s) sont en retard :
+
+{orders_list}
+
+**Actions recommandées :**
+• Contacter les clients pour les informer
+• Prioriser ces commandes en production
+• Vérifier la disponibilité des matières premières
+
+Voulez-vous que je génère des emails d'information pour ces clients ?"""
+    else:
+        return f"""🏭 **Production en Cours**
+
+**Tableau de bord production :**
+• Commandes en cours : {active_orders}
+• Commandes en retard : 0 ✅
+• Taux de service : Excellent
+
+Toutes les commandes respectent les délais ! 🎉"""
+
+def generate_alert_response(question, context):
+    """Réponses pour les alertes"""
+    alerts = []
+    
+    # Alertes stock
+    if context['low_stock_products']:
+        alerts.append(f"🔴 {len(context['low_stock_products'])} produits en stock faible")
+    
+    # Alertes retards
+    if context['delayed_orders']:
+        alerts.append(f"⚠️ {len(context['delayed_orders'])} commandes en retard")
+    
+    if alerts:
+        alerts_text = "\n".join([f"• {alert}" for alert in alerts])
+        return f"""🚨 **Alertes Actives**
+
+{alerts_text}
+
+**Priorités :**
+1. Traiter les stocks critiques
+2. Gérer les retards clients
+3. Planifier la production
+
+Que souhaitez-vous adresser en premier ?"""
+    else:
+        return """✅ **Aucune Alerte Critique**
+
+Aucune alerte nécessitant une attention immédiate. 
+
+**Statut :** Tout est sous contrôle 👍
+
+**Conseil :** Profitez-en pour optimiser vos processus !"""
+
+def generate_optimization_response(question, context):
+    """Recommandations d'optimisation"""
+    recommendations = [
+        "📊 **Analyser le TRS** : Vérifiez l'efficacité globale de vos équipements",
+        "🔄 **Optimiser les flux** : Réduisez les temps de changement de série",
+        "📦 **Automatiser les alertes** : Configurez des notifications proactives",
+        "🤖 **Planifier la maintenance** : Anticipez les arrêts techniques"
+    ]
+    
+    rec_text = "\n".join([f"• {rec}" for rec in recommendations])
+    
+    return f"""💡 **Recommandations d'Optimisation**
+
+{rec_text}
+
+**Question :** Sur quel aspect souhaitez-vous vous améliorer ?"""
+
+def generate_general_response(question, context):
+    """Réponses générales de l'assistant"""
+    return f"""🤖 **Assistant ERP Copilot**
+
+J'ai analysé votre question : "{question}"
+
+**Contexte actuel :**
+• {len(context['low_stock_products'])} produits en alerte stock
+• {len(context['delayed_orders'])} commandes en retard  
+• {context['active_orders_count']} commandes en production
+
+**Comment puis-vous vous aider ?**
+• Analyse détaillée du stock
+• Optimisation de la production
+• Gestion des alertes
+• Rapports de performance
+
+Dites-moi ce qui vous préoccupe ! 💪"""
@@ -0,0 +1,172 @@
+"""
+Planification des analyses du copilot et de l'assistant IA.
+
+Chaque type d'analyse est calculé périodiquement (commande `run_analyses`) et
+stocké dans une ligne `AIAnalysis` active avec une date de fraîcheur
+(`valid_until`). Les vues servent la dernière ligne active ; si elle est
+périmée, elle est tout de même renvoyée et un recalcul est lancé en
+arrière-plan (stale-while-revalidate). Seule l'absence totale de résultat
+déclenche un calcul synchrone.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import AIAnalysis
+
+logger = logging.getLogger(__name__)
+
+# type -> titre, fonction de calcul, arguments, durée de fraîcheur par défaut (secondes)
+ANALYSES = {
+    'stock': {
+        'title': "Analyse du stock",
+        'func': 'dashboard.analytics.analyze_stock_situation',
+        'ttl': 300,
+    },
+    'production': {
+        'title': "Analyse de la production",
+        'func': 'dashboard.analytics.analyze_production_situation',
+        'ttl': 300,
+    },
+    'efficiency': {
+        'title': "Efficacité de la production",
+        'func': 'dashboard.analytics.analyze_production_efficiency',
+        'kwargs': {'detailed': True},
+        'ttl': 300,
+    },
+    'alerts': {
+        'title': "Alertes prioritaires",
+        'func': 'dashboard.analytics.analyze_alerts',
+        'kwargs': {'detailed': True},
+        'ttl': 300,
+    },
+    'financial': {
+        'title': "Performance financière",
+        'func': 'dashboard.analytics.analyze_financial_performance',
+        'ttl': 1800,
+    },
+    'optimization': {
+        'title': "Opportunités d'optimisation",
+        'func': 'dashboard.analytics.analyze_optimization_opportunities',
+        'ttl': 1800,
+    },
+    'overview': {
+        'title': "Vue d'ensemble de l'entreprise",
+        'func': 'dashboard.analytics.get_business_overview',
+        'ttl': 600,
+    },
+}
+
+TTL_OVERRIDES = getattr(settings, 'AI_ANALYSIS_TTL', {})
+HISTORY_DAYS = getattr(settings, 'AI_ANALYSIS_HISTORY_DAYS', 7)
+REFRESH_LOCK_TIMEOUT = 300
+
+
+def get_ttl(analysis_type):
+    """Durée de fraîcheur d'un type d'analyse, surchargeable dans les settings"""
+    return TTL_OVERRIDES.get(analysis_type, ANALYSES[analysis_type]['ttl'])
+
+
+def refresh_analysis(analysis_type):
+    """Calcule une analyse et la publie comme nouvelle ligne active"""
+    spec = ANALYSES[analysis_type]
+    func = import_string(spec['func'])
+
+    started = time.perf_counter()
+    data = func(**spec.get('kwargs', {}))
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    now = timezone.now()
+
+    with transaction.atomic():
+        AIAnalysis.objects.filter(analysis_type=analysis_type, is_active=True).update(is_active=False)
+        analysis = AIAnalysis.objects.create(
+            analysis_type=analysis_type,
+            title=spec['title'],
+            insights=data.get('insights', []),
+            recommendations=data.get('recommendations') or data.get('priority_actions') or [],
+            data=data,
+            duration_ms=duration_ms,
+            valid_until=now + timedelta(seconds=get_ttl(analysis_type)),
+        )
+        # Historique borné : les anciennes versions ne servent qu'au suivi
+        AIAnalysis.objects.filter(
+            analysis_type=analysis_type, is_active=False,
+            created_at__lt=now - timedelta(days=HISTORY_DAYS)
+        ).delete()
+    return analysis
+
+
+def _refresh_in_background(analysis_type, lock_key):
+    try:
+        refresh_analysis(analysis_type)
+    except Exception:
+        logger.exception("Échec du recalcul de l'analyse %s", analysis_type)
+    finally:
+        cache.delete(lock_key)
+        close_old_connections()
+
+
+def schedule_refresh(analysis_type):
+    """Lance un recalcul en arrière-plan, sauf s'il y en a déjà un en cours"""
+    lock_key = f'analysis:refreshing:{analysis_type}'
+    if not cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+        return False
+    threading.Thread(
+        target=_refresh_in_background, args=(analysis_type, lock_key),
+        name=f'analysis-{analysis_type}', daemon=True,
+    ).start()
+    return True
+
+
+def get_analysis(analysis_type):
+    """Dernière analyse active ; recalculée en arrière-plan si elle est périmée"""
+    if analysis_type not in ANALYSES:
+        raise ValueError(f"Type d'analyse inconnu : {analysis_type}")
+
+    analysis = AIAnalysis.objects.filter(
+        analysis_type=analysis_type, is_active=True
+    ).order_by('-created_at').first()
+
+    if analysis is None:
+        return refresh_analysis(analysis_type)
+    if analysis.is_stale:
+        schedule_refresh(analysis_type)
+    return analysis
+
+
+def analysis_payload(analysis):
+    """Données d'une analyse, prêtes à être sérialisées par une vue"""
+    return dict(
+        analysis.data,
+        generated_at=analysis.created_at.isoformat(),
+        stale=analysis.is_stale,
+    )
+
+
+def analysis_etag(analysis):
+    """ETag d'une analyse : ligne active et fraîcheur, sans relire ni sérialiser les données"""
+    return f'"{analysis.analysis_type}-{analysis.pk}-{int(analysis.is_stale)}"'
+
+
+def get_analysis_data(analysis_type):
+    """Résultat de `get_analysis`, prêt à être sérialisé par une vue"""
+    return analysis_payload(get_analysis(analysis_type))
+
+
+def refresh_due_analyses(analysis_types=None, force=False):
+    """Recalcule les analyses absentes ou périmées (toutes si `force`)"""
+    refreshed = []
+    for analysis_type in analysis_types or ANALYSES:
+        current = AIAnalysis.objects.filter(
+            analysis_type=analysis_type, is_active=True
+        ).order_by('-created_at').first()
+        if force or current is None or current.is_stale:
+            refreshed.append(refresh_analysis(analysis_type))
+    return refreshed
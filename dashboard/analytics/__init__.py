@@ -0,0 +1,43 @@
+"""
+Analyses métier du copilot et de l'assistant IA.
+
+Une seule implémentation par indicateur (les vues, le planificateur
+d'analyses et les tâches de fond importent d'ici). Les compteurs d'une même
+table sont regroupés en un agrégat conditionnel ; le banc d'essai
+`manage.py benchmark analytics` vérifie le nombre de requêtes de chaque
+fonction.
+"""
+from .context import get_current_business_context, get_extended_business_context
+from .delivery import delivery_performance, on_time_performance, stage_cycle_times
+from .financial import analyze_cash_flow_risk, analyze_financial_performance, calculate_financial_health
+from .overview import (
+    analyze_alerts, analyze_optimization_opportunities, get_business_overview,
+)
+from .production import (
+    analyze_production_efficiency, analyze_production_situation, calculate_on_time_rate,
+    calculate_production_health, estimate_customer_satisfaction, estimate_production_capacity,
+)
+from .stock import analyze_stock_situation, calculate_stock_health, calculate_stock_turnover
+
+__all__ = [
+    'analyze_alerts',
+    'analyze_cash_flow_risk',
+    'analyze_financial_performance',
+    'analyze_optimization_opportunities',
+    'analyze_production_efficiency',
+    'analyze_production_situation',
+    'analyze_stock_situation',
+    'calculate_financial_health',
+    'calculate_on_time_rate',
+    'calculate_production_health',
+    'calculate_stock_health',
+    'calculate_stock_turnover',
+    'delivery_performance',
+    'estimate_customer_satisfaction',
+    'estimate_production_capacity',
+    'get_business_overview',
+    'get_current_business_context',
+    'get_extended_business_context',
+    'on_time_performance',
+    'stage_cycle_times',
+]
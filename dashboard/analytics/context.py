@@ -0,0 +1,49 @@
+"""Contexte métier partagé par l'assistant IA et le copilot"""
+
+from ..models import LOW_STOCK, Customer, Order, Product, StockMovement
+from .financial import calculate_financial_health, cash_flow_risk
+from .production import (
+    calculate_production_health, delayed_orders_filter, order_counts, production_capacity_label,
+)
+from .stock import calculate_stock_health
+
+
+def get_current_business_context():
+    """Récupère le contexte métier actuel pour l'IA"""
+    low_stock_products = list(Product.objects.filter(LOW_STOCK).values(
+        'reference', 'name', 'current_stock', 'min_stock'
+    ))
+
+    delayed_orders = list(Order.objects.filter(delayed_orders_filter()).values(
+        'order_number', 'customer__name', 'delivery_date'
+    ))
+
+    recent_stock_movements = list(StockMovement.objects.order_by('-created_at')[:10].values(
+        'product__reference', 'movement_type', 'quantity', 'reason', 'created_at'
+    ))
+
+    counts = order_counts()
+
+    return {
+        'low_stock_products': low_stock_products,
+        'delayed_orders': delayed_orders,
+        'active_orders_count': counts['in_production'],
+        'total_products': Product.objects.count(),
+        'total_customers': Customer.objects.count(),
+        'recent_stock_movements': recent_stock_movements,
+        'low_stock_products_count': len(low_stock_products),
+        'delayed_orders_count': len(delayed_orders),
+        'cash_flow_risk': cash_flow_risk(counts['shipped']),
+        'production_capacity': production_capacity_label(counts['in_production']),
+    }
+
+
+def get_extended_business_context():
+    """Contexte métier complété des indicateurs de santé"""
+    context = get_current_business_context()
+    context['health_indicators'] = {
+        'stock_health': calculate_stock_health(),
+        'production_health': calculate_production_health(),
+        'financial_health': calculate_financial_health(),
+    }
+    return context
@@ -0,0 +1,123 @@
+"""Ponctualité, durées des étapes et délais de livraison, à partir de l'historique des statuts.
+
+Une expédition est l'entrée d'une commande dans un statut expédié ou livré
+depuis un autre statut ; elle est à l'heure si elle part au plus tard à la
+date de livraison prévue. Chaque indicateur est une requête groupée sur
+`OrderStatusTransition` limitée à une fenêtre de dates (index sur
+`to_status, changed_at`) : le volume lu par Python ne dépend que du nombre de
+jours distincts de délai ou du nombre de statuts.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import OrderStatusTransition
+
+SHIPPED_STATUSES = ('shipped', 'delivered')
+DEFAULT_WINDOW_DAYS = 90
+MAX_WINDOW_DAYS = 3660
+LEAD_TIME_PERCENTILES = (50, 75, 90, 95)
+
+
+def delivery_window(start=None, end=None):
+    """Fenêtre [start, end] (dates ou chaînes ISO) ; par défaut les DEFAULT_WINDOW_DAYS derniers jours.
+    ValueError si invalide."""
+    end = date.fromisoformat(end) if isinstance(end, str) else end or timezone.localdate()
+    start = date.fromisoformat(start) if isinstance(start, str) else start or end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if end < start:
+        raise ValueError("end doit être postérieure ou égale à start")
+    if (end - start).days >= MAX_WINDOW_DAYS:
+        raise ValueError(f"Fenêtre limitée à {MAX_WINDOW_DAYS} jours")
+    return start, end
+
+
+def _transitions(start, end):
+    """Transitions horodatées dans la fenêtre (bornes converties dans le fuseau courant pour l'index)"""
+    tz = timezone.get_current_timezone()
+    return OrderStatusTransition.objects.filter(
+        changed_at__gte=timezone.make_aware(datetime.combine(start, time.min), tz),
+        changed_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def shipments(start, end):
+    """Expéditions de la fenêtre, annotées de leur jour d'expédition"""
+    return _transitions(start, end).filter(to_status__in=SHIPPED_STATUSES).exclude(
+        from_status__in=SHIPPED_STATUSES,
+    ).annotate(shipped_on=TruncDate('changed_at'))
+
+
+def _days(delta):
+    return round(delta.total_seconds() / 86400, 2) if delta is not None else None
+
+
+def _percentiles(histogram, total):
+    """Rang le plus proche sur un histogramme trié [(jours, effectif)]"""
+    result = {}
+    for p in LEAD_TIME_PERCENTILES:
+        rank = max(1, -(-p * total // 100))
+        cumulative = 0
+        for days, count in histogram:
+            cumulative += count
+            if cumulative >= rank:
+                result[f'p{p}'] = days
+                break
+    return result
+
+
+def on_time_performance(start=None, end=None):
+    """Taux de ponctualité, retard moyen et percentiles du délai (création → expédition, en jours),
+    en une requête groupée par délai"""
+    start, end = delivery_window(start, end)
+    lead_time = ExpressionWrapper(F('shipped_on') - TruncDate('order__created_at'), output_field=DurationField())
+    lateness = ExpressionWrapper(F('shipped_on') - F('order__delivery_date'), output_field=DurationField())
+    rows = list(shipments(start, end).annotate(lead_time=lead_time).values('lead_time').annotate(
+        shipped=Count('id'),
+        late=Count('id', filter=Q(shipped_on__gt=F('order__delivery_date'))),
+        days_late=Sum(lateness, filter=Q(shipped_on__gt=F('order__delivery_date'))),
+    ).order_by('lead_time'))
+
+    shipped = sum(row['shipped'] for row in rows)
+    late = sum(row['late'] for row in rows)
+    days_late = sum((row['days_late'] for row in rows if row['days_late']), timedelta())
+    histogram = [(row['lead_time'].days, row['shipped']) for row in rows]
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'shipped': shipped,
+        'on_time': shipped - late,
+        'late': late,
+        # Aucune expédition : pas de retard constaté (même convention que les autres taux)
+        'on_time_rate': round((shipped - late) / shipped * 100, 1) if shipped else 100.0,
+        'average_days_late': round(days_late.days / late, 2) if late else 0.0,
+        'lead_time_days': {
+            'average': round(sum(days * count for days, count in histogram) / shipped, 2) if shipped else None,
+            'max': histogram[-1][0] if histogram else None,
+            **_percentiles(histogram, shipped),
+        },
+    }
+
+
+def stage_cycle_times(start=None, end=None):
+    """Durée passée dans chaque statut (en jours) par les commandes qui l'ont quitté dans la fenêtre,
+    en une requête groupée par statut"""
+    start, end = delivery_window(start, end)
+    rows = _transitions(start, end).filter(duration__isnull=False).values('from_status').annotate(
+        transitions=Count('id'), total=Sum('duration'), longest=Max('duration'),
+    ).order_by('from_status')
+    return {
+        row['from_status']: {
+            'transitions': row['transitions'],
+            'average_days': _days(row['total'] / row['transitions']),
+            'max_days': _days(row['longest']),
+        }
+        for row in rows
+    }
+
+
+def delivery_performance(start=None, end=None):
+    """Ponctualité, délais et durées des étapes sur la fenêtre [start, end] (deux requêtes)"""
+    start, end = delivery_window(start, end)
+    return {**on_time_performance(start, end), 'stages': stage_cycle_times(start, end)}
@@ -0,0 +1,72 @@
+"""Analyses financières : chiffre d'affaires, santé et risque de trésorerie"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ..models import Order
+from .production import DELIVERED_STATUSES
+
+HIGH_VALUE_FACTOR = Decimal('1.5')  # Commande "forte valeur" : > 1,5 x la moyenne
+
+
+def financial_health_score(recent_paid_orders):
+    """Santé financière estimée d'après le nombre de commandes livrées sur 30 jours"""
+    if recent_paid_orders > 20:
+        return 90
+    elif recent_paid_orders > 10:
+        return 75
+    elif recent_paid_orders > 5:
+        return 60
+    else:
+        return 40
+
+
+def cash_flow_risk(shipped_orders):
+    """Risque si plus de 5 commandes expédiées non encore livrées (donc non payées)"""
+    return shipped_orders > 5
+
+
+def recent_sales_filter(days=30):
+    return Q(status__in=DELIVERED_STATUSES, created_at__gte=timezone.now() - timedelta(days=days))
+
+
+def analyze_financial_performance():
+    """Analyse les performances financières (agrégats calculés en base)"""
+    recent_orders = Order.objects.filter(recent_sales_filter())
+    stats = recent_orders.aggregate(total=Sum('total_amount'), count=Count('id'))
+
+    orders_count = stats['count']
+    total_revenue = stats['total'] or 0
+    average_order_value = total_revenue / orders_count if orders_count else 0
+
+    # Analyse de la rentabilité
+    high_value_count = recent_orders.filter(
+        total_amount__gt=average_order_value * HIGH_VALUE_FACTOR
+    ).count() if orders_count else 0
+
+    return {
+        'total_revenue_30d': total_revenue,
+        'average_order_value': round(average_order_value, 2),
+        'high_value_orders_count': high_value_count,
+        'orders_count_30d': orders_count,
+        'insights': [
+            f"CA 30j : {total_revenue:,.2f}€" if total_revenue > 0 else "Aucune vente récente",
+            f"Commande moyenne : {average_order_value:.2f}€" if average_order_value > 0 else "Aucune commande"
+        ],
+        'recommendations': [
+            "Développer le portefeuille clients" if orders_count < 10 else "Portefeuille clients stable",
+            "Fidéliser les clients à forte valeur" if high_value_count > 0 else "Diversifier le portefeuille"
+        ]
+    }
+
+
+def calculate_financial_health():
+    """Estime la santé financière (simplifié)"""
+    return financial_health_score(Order.objects.filter(recent_sales_filter()).count())
+
+
+def analyze_cash_flow_risk():
+    """Analyse simplifiée du risque de trésorerie"""
+    return cash_flow_risk(Order.objects.filter(status='shipped').count())
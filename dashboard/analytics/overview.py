@@ -0,0 +1,134 @@
+"""Vue d'ensemble, alertes et opportunités d'optimisation"""
+from datetime import timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from ..inventory_analytics import DEAD_STOCK_DAYS
+from ..models import LOW_STOCK, Customer, InventoryMetrics, Order, Product
+from .financial import financial_health_score, recent_sales_filter
+from .production import (
+    calculate_on_time_rate, customer_satisfaction_score, delayed_orders_filter, order_counts, production_health_score,
+)
+from .stock import calculate_stock_turnover, stock_health_score
+
+
+def analyze_alerts(detailed=False):
+    """Analyse consolidée des alertes"""
+    alerts = {
+        'stock_alerts': Product.objects.filter(LOW_STOCK).count(),
+        'delivery_alerts': Order.objects.filter(delayed_orders_filter()).count(),
+        'priority_alerts': [],
+        'insights': [],
+        'recommendations': []
+    }
+
+    # Déterminer la priorité
+    if alerts['stock_alerts'] > 5:
+        alerts['priority_alerts'].append("STOCK: Plus de 5 produits en alerte")
+
+    if alerts['delivery_alerts'] > 3:
+        alerts['priority_alerts'].append("LIVRAISON: Plusieurs retards clients")
+
+    # Insights
+    if alerts['stock_alerts'] > 0:
+        alerts['insights'].append(f"{alerts['stock_alerts']} alertes stock à traiter")
+
+    if alerts['delivery_alerts'] > 0:
+        alerts['insights'].append(f"{alerts['delivery_alerts']} retards de livraison")
+
+    # Recommandations
+    if alerts['priority_alerts']:
+        alerts['recommendations'].append("Traiter les alertes prioritaires immédiatement")
+
+    alerts['recommendations'].append("Mettre à jour le tableau de bord quotidien")
+
+    return alerts
+
+
+def analyze_optimization_opportunities():
+    """Identifie les opportunités d'optimisation (trois requêtes au total)"""
+    now = timezone.now()
+    opportunities = []
+
+    overstock_count = Product.objects.filter(current_stock__gt=F('min_stock') * 3).count()
+    dead_stock_count = InventoryMetrics.objects.filter(is_dead_stock=True).count()
+    order_stats = Order.objects.aggregate(
+        long_production=Count('id', filter=Q(status='in_production', created_at__lte=now - timedelta(days=7))),
+        stale_drafts=Count('id', filter=Q(status='draft', created_at__lte=now - timedelta(days=2))),
+    )
+
+    # Optimisation stock
+    if overstock_count:
+        opportunities.append({
+            'category': 'stock',
+            'title': 'Surstock potentiel',
+            'description': f'{overstock_count} produits avec stock > 3x minimum',
+            'impact': 'medium',
+            'action': 'reduire_stock'
+        })
+
+    # Stock dormant (table InventoryMetrics)
+    if dead_stock_count:
+        opportunities.append({
+            'category': 'stock',
+            'title': 'Stock dormant',
+            'description': f'{dead_stock_count} produits sans sortie depuis {DEAD_STOCK_DAYS} jours',
+            'impact': 'medium',
+            'action': 'reduire_stock'
+        })
+
+    # Optimisation production
+    if order_stats['long_production']:
+        opportunities.append({
+            'category': 'production',
+            'title': 'Temps de production longs',
+            'description': f"{order_stats['long_production']} commandes en production depuis +7j",
+            'impact': 'high',
+            'action': 'accelerer_production'
+        })
+
+    # Optimisation processus
+    if order_stats['stale_drafts']:
+        opportunities.append({
+            'category': 'process',
+            'title': 'Commandes en attente',
+            'description': f"{order_stats['stale_drafts']} commandes brouillons non traitées",
+            'impact': 'low',
+            'action': 'traiter_brouillons'
+        })
+
+    return {
+        'total_opportunities': len(opportunities),
+        'high_impact_count': len([o for o in opportunities if o['impact'] == 'high']),
+        'opportunities': opportunities
+    }
+
+
+def get_business_overview():
+    """Vue d'ensemble de l'entreprise : un agrégat par table au lieu d'une requête par indicateur"""
+    counts = order_counts()
+    products = Product.objects.aggregate(
+        total=Count('id'),
+        healthy=Count('id', filter=~LOW_STOCK),
+    )
+    sales = Order.objects.filter(recent_sales_filter()).aggregate(total=Sum('total_amount'), count=Count('id'))
+
+    return {
+        'summary': {
+            'total_customers': Customer.objects.count(),
+            'total_products': products['total'],
+            'active_orders': counts['in_production'],
+            'monthly_revenue': sales['total'] or 0
+        },
+        'health_indicators': {
+            'stock_health': stock_health_score(products['healthy'], products['total']),
+            'production_health': production_health_score(counts),
+            'financial_health': financial_health_score(sales['count'])
+        },
+        'key_metrics': {
+            'on_time_delivery_rate': calculate_on_time_rate(),
+            'stock_turnover': calculate_stock_turnover(),
+            'customer_satisfaction': customer_satisfaction_score(counts)
+        }
+    }
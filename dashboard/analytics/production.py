@@ -0,0 +1,128 @@
+"""Analyses de la production et des livraisons"""
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import Order
+from .delivery import on_time_performance
+
+ACTIVE_STATUSES = ['confirmed', 'in_production']
+DELIVERED_STATUSES = ['shipped', 'delivered']
+URGENT_DAYS = 2
+
+
+def delayed_orders_filter(today=None):
+    """Commandes actives dont la date de livraison est dépassée"""
+    return Q(delivery_date__lt=today or timezone.now().date(), status__in=ACTIVE_STATUSES)
+
+
+def order_counts(today=None):
+    """Tous les compteurs de commandes utilisés par les analyses, en une seule requête"""
+    today = today or timezone.now().date()
+    return Order.objects.aggregate(
+        in_production=Count('id', filter=Q(status='in_production')),
+        active=Count('id', filter=Q(status__in=ACTIVE_STATUSES)),
+        delayed=Count('id', filter=delayed_orders_filter(today)),
+        urgent=Count('id', filter=Q(
+            delivery_date__lte=today + timedelta(days=URGENT_DAYS), status__in=ACTIVE_STATUSES
+        )),
+        shipped=Count('id', filter=Q(status='shipped')),
+        tracked=Count('id', filter=Q(status__in=['confirmed', 'in_production', 'shipped'])),
+    )
+
+
+# ========== INDICATEURS (calculés à partir des compteurs) ==========
+
+def production_health_score(counts):
+    """Part des commandes suivies (en cours ou expédiées) qui ne sont pas en retard"""
+    if counts['tracked'] == 0:
+        return 100
+    return round((1 - counts['delayed'] / counts['tracked']) * 100, 1)
+
+
+def customer_satisfaction_score(counts):
+    if counts['active'] == 0:
+        return 95
+    satisfaction = 100 - (counts['delayed'] / counts['active'] * 50)  # Pénalité pour retards
+    return max(60, min(100, round(satisfaction, 1)))
+
+
+def production_capacity_label(in_production):
+    return "Élevée" if in_production < 8 else "Critique" if in_production > 15 else "Normale"
+
+
+# ========== ANALYSES ==========
+
+def calculate_on_time_rate(start=None, end=None):
+    """Taux de ponctualité des expéditions de la fenêtre (par défaut les 90 derniers jours),
+    d'après l'historique des statuts (analytics/delivery.py)"""
+    return on_time_performance(start, end)['on_time_rate']
+
+
+def calculate_production_health():
+    """Calcule la santé de la production (0-100%)"""
+    return production_health_score(order_counts())
+
+
+def estimate_customer_satisfaction():
+    """Estime la satisfaction client (simplifié)"""
+    return customer_satisfaction_score(order_counts())
+
+
+def estimate_production_capacity():
+    """Estime la capacité de production actuelle"""
+    return production_capacity_label(Order.objects.filter(status='in_production').count())
+
+
+def analyze_production_situation():
+    """Analyse concrète de la production"""
+    counts = order_counts()
+    delayed_orders = list(Order.objects.filter(delayed_orders_filter()).values(
+        'order_number', 'customer__name', 'delivery_date'
+    ))
+
+    return {
+        'delayed_orders_count': len(delayed_orders),
+        'urgent_orders_count': counts['urgent'],
+        'total_active_orders': counts['in_production'],
+        'delayed_orders': delayed_orders,
+        'priority_actions': [
+            "Traiter les commandes en retard en priorité",
+            "Replanifier la production pour les urgences",
+            "Contacter les clients pour les retards importants"
+        ] if delayed_orders else ["Production dans les délais"]
+    }
+
+
+def analyze_production_efficiency(detailed=False):
+    """Analyse de l'efficacité production"""
+    counts = order_counts()
+
+    analysis = {
+        'delayed_orders_count': counts['delayed'],
+        'total_active_orders': counts['in_production'],
+        'on_time_rate': calculate_on_time_rate(),
+        'insights': [],
+        'recommendations': []
+    }
+
+    if detailed:
+        analysis['delayed_orders'] = list(Order.objects.filter(delayed_orders_filter()).values(
+            'order_number', 'customer__name', 'delivery_date'
+        ))
+
+    # Insights
+    if analysis['delayed_orders_count'] > 0:
+        analysis['insights'].append(f"{analysis['delayed_orders_count']} commandes en retard")
+
+    if analysis['on_time_rate'] < 90:
+        analysis['insights'].append("Taux de ponctualité inférieur à 90%")
+
+    # Recommandations
+    if analysis['delayed_orders_count'] > 0:
+        analysis['recommendations'].append("Mettre en place un plan de rattrapage")
+
+    analysis['recommendations'].append("Optimiser la planification de la production")
+
+    return analysis
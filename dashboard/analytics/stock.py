@@ -0,0 +1,46 @@
+"""Analyses du stock : ruptures, santé et rotation"""
+from django.db.models import Count
+
+from ..inventory_analytics import get_catalog_turnover
+from ..models import LOW_STOCK, Product
+
+
+def stock_health_score(healthy_products, total_products):
+    """Part des produits au-dessus de leur stock minimum (0-100 %)"""
+    if total_products == 0:
+        return 100
+    return round((healthy_products / total_products) * 100, 1)
+
+
+def analyze_stock_situation():
+    """Analyse concrète de la situation du stock"""
+    low_stock_products = list(Product.objects.filter(LOW_STOCK).values(
+        'reference', 'name', 'current_stock', 'min_stock'
+    ))
+
+    critical_products = [p for p in low_stock_products if p['current_stock'] == 0]
+
+    return {
+        'low_stock_count': len(low_stock_products),
+        'critical_count': len(critical_products),
+        'low_stock_products': low_stock_products,
+        'insights': [
+            f"{len(critical_products)} produits en rupture de stock",
+            f"{len(low_stock_products)} produits sous le stock minimum",
+            "Planifier les réapprovisionnements urgents" if critical_products else "Stock globalement stable"
+        ]
+    }
+
+
+def calculate_stock_health():
+    """Calcule la santé du stock (0-100%) en une requête"""
+    stats = Product.objects.aggregate(
+        total=Count('id'),
+        healthy=Count('id', filter=~LOW_STOCK),
+    )
+    return stock_health_score(stats['healthy'], stats['total'])
+
+
+def calculate_stock_turnover():
+    """Rotation annualisée des stocks (table InventoryMetrics rafraîchie chaque nuit)"""
+    return get_catalog_turnover()
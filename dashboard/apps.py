@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        from . import data_versions, intervals, reservations
+
+        # Ordre important : l'index d'événements vérifie la version 'planning' incrémentée juste avant
+        data_versions.connect_signals()
+        intervals.connect_signals()
+        reservations.connect_signals()
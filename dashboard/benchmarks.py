@@ -0,0 +1,760 @@
+"""
+Bancs d'essai de performance, lancés via `python manage.py benchmark <nom>`.
+
+Chaque banc est une fonction enregistrée avec `@benchmark('nom')` qui reçoit
+les options de la commande et retourne un dict de mesures.
+"""
+import json
+import math
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Enregistre une fonction de banc d'essai sous un nom"""
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+@contextmanager
+def timed(results, label):
+    """Mesure la durée du bloc (en secondes) dans results[label]"""
+    start = time.perf_counter()
+    yield
+    results[label] = round(time.perf_counter() - start, 4)
+
+
+# ========== PRÉVISION DE LA DEMANDE ==========
+
+@benchmark('forecast')
+def bench_forecast(products=100_000, days=730, movements_per_product=100, seed=42, **options):
+    """Prévision vectorisée sur un catalogue synthétique (100k produits x 2 ans par défaut)"""
+    from .forecasting import compute_demand_stats, compute_reorder_policy
+
+    rng = np.random.default_rng(seed)
+    n_movements = products * movements_per_product
+    results = {'products': products, 'days': days, 'movements': n_movements}
+
+    with timed(results, 'generate_s'):
+        product_idx = rng.integers(0, products, n_movements)
+        day_idx = rng.integers(0, days, n_movements)
+        quantities = rng.integers(1, 20, n_movements).astype(np.float64)
+        current_stock = rng.integers(0, 500, products).astype(np.float64)
+        min_stock = rng.integers(0, 50, products).astype(np.float64)
+
+    with timed(results, 'demand_stats_s'):
+        rate, sigma = compute_demand_stats(product_idx, day_idx, quantities, products, days)
+
+    with timed(results, 'reorder_policy_s'):
+        compute_reorder_policy(rate, sigma, current_stock, min_stock)
+
+    return results
+
+
+# ========== STOCKAGE DU CONTEXTE DES CONVERSATIONS ==========
+
+@benchmark('context_storage')
+def bench_context_storage(conversations=100_000, changes_every=50, seed=42, **options):
+    """Stockage JSON brut vs snapshots dédupliqués et compressés (100k conversations)"""
+    import random
+    import zlib
+    from datetime import date, datetime, timedelta
+
+    from .models import ContextSnapshot
+
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 8, 0)
+    products = [
+        {'reference': f'P-{i:05d}', 'name': f'Produit {i}', 'current_stock': rng.randint(0, 5), 'min_stock': 5}
+        for i in range(40)
+    ]
+    movements = [
+        {'product__reference': f'P-{rng.randrange(40):05d}', 'movement_type': 'out', 'quantity': rng.randint(1, 9),
+         'reason': 'Commande', 'created_at': start}
+        for _ in range(10)
+    ]
+
+    def build_context(step):
+        # Le contexte n'évolue qu'à chaque nouveau mouvement de stock (toutes les `changes_every` questions)
+        movements.insert(0, {
+            'product__reference': f'P-{rng.randrange(40):05d}', 'movement_type': rng.choice(['in', 'out']),
+            'quantity': rng.randint(1, 9), 'reason': f'Commande CMD-{step:06d}',
+            'created_at': start + timedelta(minutes=step),
+        })
+        del movements[10:]
+        return {
+            'low_stock_products': products[:rng.randint(5, 40)],
+            'delayed_orders': [
+                {'order_number': f'CMD-{i:06d}', 'customer__name': f'Client {i % 17}',
+                 'delivery_date': date(2025, 1, 1) + timedelta(days=i % 30)}
+                for i in range(rng.randint(0, 15))
+            ],
+            'active_orders_count': rng.randint(0, 30),
+            'total_products': 40,
+            'total_customers': 17,
+            'recent_stock_movements': list(movements),
+        }
+
+    results = {'conversations': conversations}
+    with timed(results, 'elapsed_s'):
+        raw_bytes = 0
+        snapshots = {}
+        for i in range(conversations):
+            if i % changes_every == 0:
+                context = build_context(i)
+                payload = ContextSnapshot.serialize(context)
+                digest = ContextSnapshot.digest(context)
+            raw_bytes += len(payload)
+            if digest not in snapshots:
+                snapshots[digest] = len(zlib.compress(payload, 9))
+
+    compact_bytes = sum(snapshots.values()) + conversations * 64  # + référence par conversation
+    results.update({
+        'unique_contexts': len(snapshots),
+        'raw_json_bytes': raw_bytes,
+        'compact_bytes': compact_bytes,
+        'savings_ratio': round(raw_bytes / compact_bytes, 1),
+    })
+    return results
+
+
+# ========== ANALYSES MÉTIER (NOMBRE DE REQUÊTES ET DURÉE) ==========
+
+# Nombre maximal de requêtes SQL par analyse, indépendant du volume de données
+ANALYTICS_QUERY_BUDGETS = {
+    'get_current_business_context': 6,
+    'get_business_overview': 6,
+    'analyze_stock_situation': 1,
+    'calculate_stock_health': 1,
+    'calculate_stock_turnover': 1,
+    'analyze_production_situation': 2,
+    'analyze_production_efficiency': 3,
+    'calculate_on_time_rate': 1,
+    'on_time_performance': 1,
+    'stage_cycle_times': 1,
+    'calculate_production_health': 1,
+    'estimate_customer_satisfaction': 1,
+    'estimate_production_capacity': 1,
+    'analyze_financial_performance': 2,
+    'calculate_financial_health': 1,
+    'analyze_cash_flow_risk': 1,
+    'analyze_alerts': 2,
+    'analyze_optimization_opportunities': 3,
+}
+
+# Durée maximale (meilleure de plusieurs exécutions) d'une analyse, en millisecondes
+ANALYTICS_MAX_MS = 500
+
+
+@benchmark('analytics')
+def bench_analytics(products=5_000, customers=500, orders=20_000, movements=50_000, repeat=3,
+                    max_ms=ANALYTICS_MAX_MS, seed=42, **options):
+    """Requêtes et durée de chaque analyse sur un jeu de données réaliste (annulé ensuite)"""
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    from . import analytics
+    from .seeding import seed_scale
+
+    results = {'products': products, 'customers': customers, 'orders': orders, 'movements': movements}
+    failures = []
+
+    with transaction.atomic():
+        with timed(results, 'seed_s'):
+            seed_scale(
+                customers=customers, products=products, orders=orders, movements=movements,
+                events=0, notifications=0, days=365, seed=seed, prefix='BENCH',
+            )
+
+        for name, budget in ANALYTICS_QUERY_BUDGETS.items():
+            func = getattr(analytics, name)
+            with CaptureQueriesContext(connection) as captured:
+                func()
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                durations.append(time.perf_counter() - start)
+            best_ms = round(min(durations) * 1000, 2)
+
+            results[name] = {'queries': len(captured), 'budget': budget, 'ms': best_ms}
+            if len(captured) > budget:
+                failures.append(f"{name}: {len(captured)} requêtes (budget {budget})")
+            if best_ms > max_ms:
+                failures.append(f"{name}: {best_ms} ms (max {max_ms} ms)")
+
+        transaction.set_rollback(True)
+
+    results['failures'] = failures
+    return results
+
+
+# ========== ARBRE D'INTERVALLES DES ÉVÉNEMENTS ==========
+
+@benchmark('intervals')
+def bench_intervals(events=100_000, queries=2_000, days=3_650, max_length=15, seed=42, **options):
+    """Requêtes de chevauchement et de fenêtres libres : arbre d'intervalles vs parcours linéaire"""
+    import random
+
+    from .intervals import IntervalTree
+
+    rng = random.Random(seed)
+    intervals = []
+    for key in range(events):
+        start = rng.randrange(days)
+        intervals.append((key, start, start + rng.randrange(max_length)))
+    windows = []
+    for _ in range(queries):
+        lo = rng.randrange(days)
+        windows.append((lo, lo + rng.randrange(42)))
+
+    results = {'events': events, 'queries': queries}
+    tree = IntervalTree(seed=seed)
+    with timed(results, 'build_s'):
+        for key, start, end in intervals:
+            tree.insert(key, start, end)
+
+    with timed(results, 'tree_overlap_s'):
+        found_tree = [sorted(node.key for node in tree.overlap(lo, hi)) for lo, hi in windows]
+    with timed(results, 'scan_overlap_s'):
+        found_scan = [sorted(key for key, start, end in intervals if start <= hi and end >= lo) for lo, hi in windows]
+    with timed(results, 'tree_gaps_s'):
+        for lo, hi in windows:
+            list(tree.gaps(lo, hi, 1))
+
+    with timed(results, 'update_s'):
+        for key, start, end in intervals[:queries]:
+            tree.remove(key)
+            tree.insert(key, start + 1, end + 1)
+
+    results.update({
+        'matches': sum(len(keys) for keys in found_tree),
+        'speedup': round(results['scan_overlap_s'] / max(results['tree_overlap_s'], 1e-9), 1),
+        'failures': [] if found_tree == found_scan else ["Résultats différents de l'arbre et du parcours linéaire"],
+    })
+    return results
+
+
+# ========== TABLE DES GAMMES ==========
+
+@benchmark('routing')
+def bench_routing(lines=100_000, repeat=3, **options):
+    """Temps de fabrication de lignes de commande : table compilée vs une requête par ligne"""
+    import random
+
+    from django.db import connection
+    from django.db.models import Sum
+    from django.test.utils import CaptureQueriesContext
+
+    from .models import RoutingStep
+    from .routing import build_routing_table
+
+    results = {'lines': lines}
+    with CaptureQueriesContext(connection) as captured:
+        with timed(results, 'build_s'):
+            table = build_routing_table()
+    results.update({'products': len(table), 'steps': table.step_count, 'build_queries': len(captured)})
+    if not len(table):
+        results['failures'] = ["Aucune gamme : lancer d'abord `manage.py seed_scale`"]
+        return results
+
+    rng = random.Random(42)
+    product_ids = [rng.choice(table.product_ids.tolist()) for _ in range(lines)]
+    quantities = [rng.randint(1, 50) for _ in range(lines)]
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        times = table.processing_times(product_ids, quantities)
+        table.work_center_load(product_ids, quantities)
+        durations.append(time.perf_counter() - start)
+    results['table_ms'] = round(min(durations) * 1000, 2)
+
+    # Référence : agrégat SQL par ligne, extrapolé à partir d'un échantillon
+    sample = min(lines, 500)
+    start = time.perf_counter()
+    for pid, quantity in zip(product_ids[:sample], quantities[:sample]):
+        totals = RoutingStep.objects.filter(product_id=pid).aggregate(setup=Sum('setup_minutes'), run=Sum('run_minutes'))
+        float(totals['setup']) + float(totals['run']) * quantity
+    results['per_line_query_ms'] = round((time.perf_counter() - start) * 1000 * lines / sample, 2)
+    results['speedup'] = round(results['per_line_query_ms'] / max(results['table_ms'], 1e-6), 1)
+
+    expected = [
+        float(sum(s.setup_minutes for s in steps) + sum(s.run_minutes for s in steps) * q)
+        for steps, q in (
+            (list(RoutingStep.objects.filter(product_id=pid)), q)
+            for pid, q in zip(product_ids[:20], quantities[:20])
+        )
+    ]
+    mismatches = sum(abs(a - b) > 1e-6 for a, b in zip(times[:20].tolist(), expected))
+    results['failures'] = [f"{mismatches} temps différents du calcul ligne à ligne"] if mismatches else []
+    return results
+
+
+# ========== NOMENCLATURES ET MRP ==========
+
+def _synthetic_bom(rng, skus, levels):
+    """Nomenclature aléatoire : chaque article de niveau l < levels - 1 a 2 à 4 composants plus bas"""
+    per_level = np.array_split(np.arange(skus), levels)
+    parents, components, quantities = [], [], []
+    for level, items in enumerate(per_level[:-1]):
+        lower = np.concatenate(per_level[level + 1:])
+        for item in items.tolist():
+            for component in rng.choice(lower, size=int(rng.integers(2, 5)), replace=False).tolist():
+                parents.append(item)
+                components.append(component)
+                quantities.append(float(rng.choice([1, 1, 2, 3, 0.5])))
+    return per_level[0], parents, components, quantities
+
+
+def _naive_mrp(n, parents, components, quantities, gross, available, lead_times):
+    """MRP article par article, boucles Python (référence de contrôle)"""
+    children = {}
+    for p, c, q in zip(parents, components, quantities):
+        children.setdefault(p, []).append((c, q))
+    level = [0] * n
+    for _ in range(n):  # relaxation jusqu'au point fixe : niveau = profondeur maximale
+        changed = False
+        for p, c in zip(parents, components):
+            if level[c] < level[p] + 1:
+                level[c] = level[p] + 1
+                changed = True
+        if not changed:
+            break
+    gross = [list(row) for row in gross.tolist()]
+    periods = len(gross[0])
+    releases = [[0.0] * periods for _ in range(n)]
+    for item in sorted(range(n), key=lambda i: level[i]):
+        cumulative_gross, previous = 0.0, 0.0
+        for t in range(periods):
+            cumulative_gross += gross[item][t]
+            cumulative = math.ceil(max(cumulative_gross - available[item], 0.0) - 1e-9)
+            if cumulative > previous:
+                releases[item][max(t - lead_times[item], 0)] += cumulative - previous
+            previous = cumulative
+        for component, quantity in children.get(item, ()):
+            for t in range(periods):
+                gross[component][t] += releases[item][t] * quantity
+    return np.array(releases)
+
+
+@benchmark('mrp')
+def bench_mrp(skus=10_000, levels=5, periods=90, demand_lines=20_000, check_skus=600, seed=42, **options):
+    """MRP vectorisé sur une nomenclature synthétique (10k articles, 5 niveaux par défaut)"""
+    from .bom import BOMStructure, compute_mrp
+
+    def instance(n):
+        rng = np.random.default_rng(seed)
+        top, parents, components, quantities = _synthetic_bom(rng, n, levels)
+        gross = np.zeros((n, periods))
+        np.add.at(gross, (rng.choice(top, demand_lines), rng.integers(0, periods, demand_lines)),
+                  rng.integers(1, 20, demand_lines).astype(np.float64))
+        on_hand = rng.integers(0, 200, n).astype(np.float64)
+        safety_stock = rng.integers(0, 20, n).astype(np.float64)
+        return parents, components, quantities, gross, on_hand, safety_stock
+
+    parents, components, quantities, gross, on_hand, safety_stock = instance(skus)
+    results = {'skus': skus, 'levels': levels, 'bom_lines': len(parents), 'periods': periods}
+    with timed(results, 'build_s'):
+        structure = BOMStructure.from_edges(np.arange(skus), parents, components, quantities)
+    lead_times = np.where(structure.is_manufactured, 2, 7)
+    with timed(results, 'mrp_s'):
+        net, releases = compute_mrp(structure, gross, on_hand, safety_stock, lead_times)
+    with timed(results, 'explosion_s'):
+        explosion = structure.explosion(0)
+    with timed(results, 'explosion_cached_s'):
+        structure.explosion(0)
+    results.update({
+        'max_level': structure.max_level,
+        'planned_orders': int(np.count_nonzero(releases)),
+        'planned_units': int(releases.sum()),
+        'explosion_components': len(explosion),
+    })
+
+    # Contrôle sur une instance réduite face à l'implémentation article par article
+    parents, components, quantities, gross, on_hand, safety_stock = instance(check_skus)
+    structure = BOMStructure.from_edges(np.arange(check_skus), parents, components, quantities)
+    lead_times = np.where(structure.is_manufactured, 2, 7)
+    with timed(results, 'naive_check_s'):
+        expected = _naive_mrp(check_skus, parents, components, quantities, gross.copy(),
+                              (on_hand - safety_stock).tolist(), lead_times.tolist())
+    with timed(results, 'vectorized_check_s'):
+        _, releases = compute_mrp(structure, gross, on_hand, safety_stock, lead_times)
+    results['failures'] = [] if np.allclose(releases, expected) else ["Lancements différents du calcul article par article"]
+    return results
+
+
+# ========== SCÉNARIOS « ET SI » ==========
+
+@benchmark('scenarios')
+def bench_scenarios(scenarios=8, workers=4, **options):
+    """Évaluation de scénarios de panne sur les données en base : séquentiel vs pool de processus"""
+    from .scenarios import evaluate_scenarios, parse_scenarios
+    from .scheduling import load_snapshot
+
+    results = {'scenarios': scenarios, 'workers': workers}
+    with timed(results, 'snapshot_s'):
+        snapshot = load_snapshot()
+    codes = snapshot.routing.work_center_codes
+    if not codes or not snapshot.order_count:
+        results['failures'] = ["Aucun poste ou aucune commande ouverte : lancer d'abord `manage.py seed_scale`"]
+        return results
+
+    start = snapshot.today.isoformat()
+    spec = [
+        {'name': f'Panne {codes[i % len(codes)]}', 'changes': [
+            {'type': 'work_center_down', 'work_center': codes[i % len(codes)], 'start': start, 'end': start},
+        ]}
+        for i in range(scenarios)
+    ]
+    parsed = parse_scenarios(spec, snapshot)
+    with timed(results, 'sequential_s'):
+        sequential = evaluate_scenarios(parsed, snapshot, workers=1)
+    with timed(results, 'pool_s'):
+        pooled = evaluate_scenarios(parsed, snapshot, workers=workers)
+
+    results.update({
+        'orders': snapshot.order_count,
+        'baseline': sequential['baseline'],
+        'failures': [] if sequential == pooled else ["Résultats différents entre séquentiel et pool"],
+    })
+    return results
+
+
+@benchmark('optimizer')
+def bench_optimizer(seconds=5, seed=0, **options):
+    """Recuit simulé sur les commandes ouvertes : coût incrémental vérifié contre un recalcul complet"""
+    from .optimizer import SequenceModel, anneal
+    from .scheduling import edd_sequence, evaluate, load_snapshot
+
+    results = {'seconds': seconds}
+    with timed(results, 'snapshot_s'):
+        snapshot = load_snapshot()
+    if snapshot.order_count < 2:
+        results['failures'] = ["Moins de deux commandes ouvertes : lancer d'abord `manage.py seed_scale`"]
+        return results
+
+    model = SequenceModel(snapshot)
+    edd = edd_sequence(snapshot)
+    best, best_cost, stats = anneal(model, edd.tolist(), seconds, seed=seed)
+    with timed(results, 'evaluate_s'):
+        optimized = evaluate(snapshot, np.array(best, dtype=np.int64))
+
+    failures = []
+    if sorted(best) != list(range(snapshot.order_count)):
+        failures.append("La séquence optimisée n'est pas une permutation des commandes")
+    if not math.isclose(best_cost, model.total_cost(best), rel_tol=1e-6, abs_tol=1e-6):
+        failures.append(f"Coût incrémental {best_cost:.2f} != recalcul {model.total_cost(best):.2f}")
+    results.update({
+        'orders': snapshot.order_count,
+        'iterations_per_s': round(stats['iterations'] / max(stats['seconds'], 1e-9)),
+        'improvements': stats['improvements'],
+        'surrogate_edd': round(model.total_cost(edd.tolist()), 2),
+        'surrogate_best': round(best_cost, 2),
+        'weighted_tardiness_edd': evaluate(snapshot, edd)['weighted_tardiness'],
+        'weighted_tardiness_optimized': optimized['weighted_tardiness'],
+        'failures': failures,
+    })
+    return results
+
+
+@benchmark('promise')
+def bench_promise(queries=200, seed=0, **options):
+    """Promesse ATP/CTP : requêtes sur le profil mis en cache vs recalcul du profil à chaque requête"""
+    from .promising import PromiseProfile, promise
+    from .scheduling import load_snapshot
+
+    results = {'queries': queries}
+    snapshot = load_snapshot()
+    if not len(snapshot.product_ids):
+        results['failures'] = ["Aucun produit : lancer d'abord `manage.py seed_scale`"]
+        return results
+
+    with timed(results, 'profile_s'):
+        profile = PromiseProfile(snapshot)
+    rng = np.random.default_rng(seed)
+    requests = [
+        [(int(product_id), int(quantity)) for product_id, quantity in zip(
+            rng.choice(snapshot.product_ids, size=rng.integers(1, 5)), rng.integers(1, 200, size=4),
+        )]
+        for _ in range(queries)
+    ]
+    with timed(results, 'cached_s'):
+        cached = [promise(lines, profile) for lines in requests]
+    with timed(results, 'rebuilt_s'):
+        rebuilt = [promise(lines, PromiseProfile(snapshot)) for lines in requests[:5]]
+    results.update({
+        'cached_per_query_ms': round(results['cached_s'] / queries * 1000, 3),
+        'rebuilt_per_query_ms': round(results['rebuilt_s'] / 5 * 1000, 3),
+        'capable': sum(result['capable'] for result in cached),
+        'failures': [] if rebuilt == cached[:5] else ["Résultats différents entre profil en cache et recalculé"],
+    })
+    return results
+
+
+# ========== LOTS : ALLOCATION FEFO ==========
+
+@benchmark('lots')
+def bench_lots(products=5, lots_per_product=5_000, orders=100, seed=42, **options):
+    """Confirmation groupée avec allocation FEFO par l'index des lots ouverts, comparée à un
+    parcours de tous les lots du produit par ligne (données créées puis annulées)"""
+    import random
+    from datetime import date, timedelta
+
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    from .ledger import default_location
+    from .models import Customer, LotAllocation, Order, OrderItem, Product, StockBalance, StockLot
+
+    rng = random.Random(seed)
+    results = {'products': products, 'lots_per_product': lots_per_product, 'orders': orders}
+    failures = []
+
+    def fefo_key(lot):
+        return (lot.expiry_date is None, lot.expiry_date or date.min, lot.received_at, lot.id)
+
+    with transaction.atomic():
+        with timed(results, 'seed_s'):
+            location = default_location()
+            customer = Customer.objects.create(name='BENCH-LOTS', email='bench@example.com', phone='', address='')
+            now = timezone.now()
+            catalog = []
+            for i in range(products):
+                product = Product.objects.create(reference=f'BENCH-LOT-{i:03d}', name=f'Lot {i}', price=10, min_stock=0)
+                lots = []
+                for j in range(lots_per_product):
+                    quantity = rng.randint(1, 20)
+                    lots.append(StockLot(
+                        product=product, location=location, lot_number=f'L{j:06d}',
+                        received_at=now - timedelta(days=rng.randint(0, 720), minutes=j),
+                        # Un lot sur dix non périssable : consommé après les lots datés
+                        expiry_date=None if rng.random() < 0.1 else now.date() + timedelta(days=rng.randint(1, 720)),
+                        quantity=quantity, remaining=quantity,
+                    ))
+                StockLot.objects.bulk_create(lots, batch_size=1000)
+                stock = sum(lot.remaining for lot in lots)
+                Product.objects.filter(pk=product.pk).update(current_stock=stock)
+                StockBalance.objects.create(product=product, location=location, quantity=stock)
+                catalog.append(product)
+
+            batch = []
+            for i in range(orders):
+                order = Order.objects.create(
+                    order_number=f'BENCH-LOT-{i:05d}', customer=customer,
+                    delivery_date=now.date() + timedelta(days=rng.randint(1, 60)),
+                )
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=product, quantity=rng.randint(1, 30), unit_price=10)
+                    for product in rng.sample(catalog, rng.randint(1, min(3, products)))
+                ])
+                batch.append(order)
+        items = list(OrderItem.objects.filter(order__in=batch).order_by('order__delivery_date', 'order_id', 'pk'))
+        results['lines'] = len(items)
+
+        # Référence : tous les lots ouverts du produit relus et triés à chaque ligne (aucune écriture)
+        with timed(results, 'scan_s'):
+            consumed = {}
+            expected = []
+            for item in items:
+                needed = item.quantity
+                lots = [
+                    lot for lot in StockLot.objects.filter(product_id=item.product_id, location=location)
+                    if lot.remaining - consumed.get(lot.pk, 0) > 0
+                ]
+                for lot in sorted(lots, key=fefo_key):
+                    used = min(lot.remaining - consumed.get(lot.pk, 0), needed)
+                    consumed[lot.pk] = consumed.get(lot.pk, 0) + used
+                    expected.append((item.pk, lot.pk, used))
+                    needed -= used
+                    if not needed:
+                        break
+
+        with CaptureQueriesContext(connection) as captured:
+            with timed(results, 'indexed_s'):
+                confirmed = Order.confirm_orders(batch)
+        allocated = list(LotAllocation.objects.filter(order_item__in=items).order_by('pk').values_list(
+            'order_item_id', 'lot_id', 'quantity',
+        ))
+        results.update({
+            'confirmed': len(confirmed),
+            'queries': len(captured),
+            'scan_per_line_ms': round(results['scan_s'] / len(items) * 1000, 3),
+            'indexed_per_line_ms': round(results['indexed_s'] / len(items) * 1000, 3),
+        })
+        if sorted(allocated) != sorted(expected):
+            failures.append("Allocations différentes entre l'index FEFO et le parcours complet")
+        if len(confirmed) != orders:
+            failures.append(f"{len(confirmed)} commandes confirmées sur {orders}")
+
+        transaction.set_rollback(True)
+
+    results['failures'] = failures
+    return results
+
+
+# ========== RÉSERVATIONS ==========
+
+@benchmark('reservations')
+def bench_reservations(products=500, **options):
+    """Disponibilité : colonne `Product.reserved` vs agrégation des réservations"""
+    from django.db.models import Sum
+
+    from .models import Product, StockReservation
+
+    catalog = list(Product.objects.order_by('id')[:products])
+    results = {'products': len(catalog)}
+    if not catalog:
+        results['failures'] = ["Aucun produit : lancer d'abord `manage.py seed_scale`"]
+        return results
+
+    with timed(results, 'column_s'):
+        column = [product.available_stock for product in catalog]
+    with timed(results, 'aggregate_s'):
+        aggregated = [
+            product.current_stock - (StockReservation.objects.filter(
+                product=product,
+            ).aggregate(total=Sum('quantity'))['total'] or 0)
+            for product in catalog
+        ]
+    results.update({
+        'column_per_product_us': round(results['column_s'] / len(catalog) * 1e6, 2),
+        'aggregate_per_product_us': round(results['aggregate_s'] / len(catalog) * 1e6, 2),
+        'failures': [] if column == aggregated else ["Disponibilité différente entre compteur et agrégation"],
+    })
+    return results
+
+
+# ========== OUTBOX ==========
+
+@benchmark('outbox')
+def bench_outbox(events=20_000, batch_size=200, fail_first=3, **options):
+    """Débit du dispatcher de l'outbox vers un webhook local et un fichier JSONL ; les `fail_first`
+    premières requêtes du webhook échouent pour exercer les nouveaux essais (événements supprimés à la fin)"""
+    import tempfile
+    from pathlib import Path
+
+    from django.utils import timezone
+
+    from .models import OutboxEvent
+    from .outbox import JsonlSink, WebhookSink, dispatch, emit
+    from .tests.stubs import StubWebhookServer
+
+    results = {'events': events, 'batch_size': batch_size, 'fail_first': fail_first}
+    failures = []
+    # Hors transaction : le dispatcher valide chaque lot comme en production
+    with timed(results, 'emit_s'):
+        created = emit(*[
+            OutboxEvent(event_type='bench.event', aggregate_type='bench', aggregate_id=str(i), payload={'n': i})
+            for i in range(events)
+        ])
+    ids = {event.pk for event in created}
+    try:
+        with tempfile.TemporaryDirectory() as directory, StubWebhookServer(fail_first=fail_first) as server:
+            path = Path(directory) / 'events.jsonl'
+            sinks = {'webhook': WebhookSink(server.url), 'jsonl': JsonlSink(path)}
+            rounds = 0
+            with timed(results, 'dispatch_s'):
+                while OutboxEvent.objects.filter(pk__in=ids, status='pending').exists() and rounds < 10:
+                    # Les lots en échec attendent leur délai : on les rend livrables aussitôt
+                    OutboxEvent.objects.filter(pk__in=ids, status='pending').update(next_attempt_at=timezone.now())
+                    dispatch(sinks=sinks, burst=True, batch_size=batch_size)
+                    rounds += 1
+            with path.open(encoding='utf-8') as lines:
+                written = [json.loads(line)['id'] for line in lines]
+            received = [event['id'] for event in server.events]
+
+        delivered = OutboxEvent.objects.filter(pk__in=ids, status='dispatched').count()
+        results.update({
+            'rounds': rounds,
+            'webhook_requests': server.requests,
+            'events_per_s': round(delivered / results['dispatch_s'], 1) if results['dispatch_s'] else None,
+            'emit_per_event_us': round(results['emit_s'] / max(events, 1) * 1e6, 2),
+        })
+        if delivered != events:
+            failures.append(f"{delivered} événements livrés sur {events}")
+        if not ids <= set(received):
+            failures.append("Événements absents du webhook")
+        if len([i for i in written if i in ids]) != events:
+            failures.append("Fichier JSONL incomplet ou en double (le puits déjà servi a été relivré)")
+    finally:
+        OutboxEvent.objects.filter(pk__in=ids).delete()
+
+    results['failures'] = failures
+    return results
+
+
+# ========== MOTEURS DE RÉPONSE DE L'ASSISTANT ==========
+
+@benchmark('ai_engine')
+def bench_ai_engine(concurrent=20, **options):
+    """Moteur de modèle local contre un serveur simulé (réponse, repli sur les règles si indisponible),
+    cache des réponses et regroupement de `concurrent` questions identiques simultanées"""
+    import threading
+    import uuid
+
+    from .ai_engine import LocalModelEngine, RuleEngine, answer_question
+    from .analytics import get_current_business_context
+    from .tests.stubs import StubModelServer
+
+    results = {'concurrent': concurrent}
+    failures = []
+    context = get_current_business_context()
+    # Question propre à cette exécution : le cache partagé ne doit pas servir une réponse précédente
+    marker = uuid.uuid4().hex[:8]
+
+    with StubModelServer(reply='Réponse du modèle local') as server:
+        engine = LocalModelEngine(url=server.url, timeout=5)
+        with timed(results, 'local_s'):
+            answer = answer_question(f'État du stock ? {marker}', context, engine=engine)
+        if answer != 'Réponse du modèle local' or len(server.requests) != 1:
+            failures.append("Le modèle local simulé n'a pas été interrogé")
+        elif server.requests[0]['messages'][-1]['content'] != f'état du stock ? {marker}':
+            failures.append("Question normalisée non transmise au modèle")
+
+        with timed(results, 'cached_s'):
+            cached = answer_question(f'  état du STOCK ?  {marker}', context, engine=engine)
+        if cached != answer or len(server.requests) != 1:
+            failures.append("Question normalisée identique : réponse non servie par le cache")
+
+        # Regroupement : les questions simultanées identiques ne déclenchent qu'un appel au modèle
+        answers = []
+        threads = [
+            threading.Thread(target=lambda: answers.append(
+                answer_question(f'Retards de production ? {marker}', context, engine=engine)
+            ))
+            for _ in range(concurrent)
+        ]
+        with timed(results, 'coalesced_s'):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        results['model_calls'] = len(server.requests) - 1
+        if len(answers) != concurrent or results['model_calls'] > 1:
+            failures.append(f"{results['model_calls']} appels au modèle pour {concurrent} questions identiques")
+
+    with StubModelServer(fail=True) as server:
+        engine = LocalModelEngine(url=server.url, timeout=5)
+        question = f'Alerte problème {marker}'
+        with timed(results, 'fallback_s'):
+            fallback = answer_question(question, context, engine=engine)
+        if not server.requests or fallback != RuleEngine().answer(question.lower(), context):
+            failures.append("Modèle indisponible : pas de repli sur le moteur à règles")
+
+    # Les accents distinguent les intentions du moteur à règles : clés de cache distinctes
+    rules = RuleEngine()
+    accented = answer_question(f'problème {marker}', context, engine=rules)
+    plain = answer_question(f'probleme {marker}', context, engine=rules)
+    if accented == plain:
+        failures.append("'problème' et 'probleme' partagent une réponse")
+
+    results['failures'] = failures
+    return results
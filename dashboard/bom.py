@@ -0,0 +1,268 @@
+"""
+Nomenclatures (BOM) et calcul des besoins nets (MRP).
+
+La nomenclature complète est chargée en deux requêtes et compilée en tableaux
+NumPy (`BOMStructure`) :
+
+- chaque produit reçoit son code de bas niveau (low-level code), la
+  profondeur maximale à laquelle il apparaît : un composant est toujours
+  traité après tous ses parents ;
+- les liens sont triés par niveau du parent, `level_offsets[l]:level_offsets[l + 1]`
+  délimitant ceux des parents de niveau `l`.
+
+Le MRP (`compute_mrp`) traite les niveaux dans l'ordre : pour un niveau, le
+calcul des besoins nets par période (besoins bruts cumulés - stock), le
+décalage par le délai d'obtention et l'éclatement vers les composants sont
+des opérations vectorisées sur tous les produits et toutes les périodes. Le
+nombre d'itérations Python est le nombre de niveaux, pas le nombre
+d'articles.
+
+Les besoins bruts viennent des lignes de commandes confirmées ou en
+production dont le stock n'est pas encore sorti (leurs réservations : les
+lignes présentes à l'ouverture de la commande sont déjà déduites de
+`current_stock`), rapprochées de `current_stock` (même convention que
+`Product.available_stock`), avec `min_stock` comme stock de sécurité : le
+manque est planifié avant d'être constaté.
+"""
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .data_versions import get_versions
+from .models import BOMLine, OrderItem, Product
+
+HORIZON_DAYS = getattr(settings, 'MRP_HORIZON_DAYS', 90)
+MANUFACTURING_LEAD_TIME_DAYS = getattr(settings, 'MRP_MANUFACTURING_LEAD_TIME_DAYS', 2)
+PURCHASE_LEAD_TIME_DAYS = getattr(settings, 'MRP_PURCHASE_LEAD_TIME_DAYS', getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 7))
+DEMAND_STATUSES = ('confirmed', 'in_production')
+
+PlannedOrder = namedtuple('PlannedOrder', ['product_id', 'kind', 'quantity', 'release_date', 'due_date'])
+
+
+def low_level_codes(n_products, parents, components):
+    """Code de bas niveau de chaque produit (tri topologique de Kahn) ; ValueError en cas de boucle"""
+    order = np.argsort(parents, kind='stable')
+    sorted_components = components[order]
+    child_offsets = np.zeros(n_products + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parents, minlength=n_products), out=child_offsets[1:])
+
+    indegree = np.bincount(components, minlength=n_products)
+    levels = np.zeros(n_products, dtype=np.int64)
+    frontier = np.flatnonzero(indegree == 0)
+    visited = len(frontier)
+    depth = 0
+    # Un niveau de profondeur par itération : tous les produits dont les parents sont traités
+    while len(frontier):
+        starts, ends = child_offsets[frontier], child_offsets[frontier + 1]
+        counts = ends - starts
+        if not counts.sum():
+            break
+        edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        children = sorted_components[edges]
+        depth += 1
+        levels[children] = depth
+        np.subtract.at(indegree, children, 1)
+        frontier = np.unique(children[indegree[children] == 0])
+        visited += len(frontier)
+    if visited < n_products:
+        raise ValueError("La nomenclature contient une boucle")
+    return levels
+
+
+class BOMStructure:
+    """Nomenclature aplatie et triée par niveau, indexée par position de produit"""
+
+    def __init__(self, product_ids, parents, components, quantities):
+        self.product_ids = product_ids
+        self._index = {pid: i for i, pid in enumerate(product_ids.tolist())}
+        self.levels = low_level_codes(len(product_ids), parents, components)
+        self.max_level = int(self.levels.max()) if len(product_ids) else 0
+
+        order = np.argsort(self.levels[parents], kind='stable')
+        self.parents = parents[order]
+        self.components = components[order]
+        self.quantities = quantities[order]
+        self.level_offsets = np.searchsorted(self.levels[self.parents], np.arange(self.max_level + 2))
+        self.is_manufactured = np.bincount(parents, minlength=len(product_ids)) > 0
+        self._explosions = {}
+
+    @classmethod
+    def from_edges(cls, product_ids, parent_ids, component_ids, quantities):
+        """Structure à partir d'identifiants de produits (triés) et de liens parent -> composant"""
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        return cls(
+            product_ids,
+            np.searchsorted(product_ids, np.asarray(parent_ids, dtype=np.int64)),
+            np.searchsorted(product_ids, np.asarray(component_ids, dtype=np.int64)),
+            np.asarray(quantities, dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def index(self, product_id):
+        return self._index.get(product_id)
+
+    def level_edges(self, level):
+        return slice(int(self.level_offsets[level]), int(self.level_offsets[level + 1]))
+
+    def explosion(self, product_id):
+        """Composants de tous niveaux et quantité totale pour une unité du produit (mise en cache)"""
+        i = self._index.get(product_id)
+        if i is None:
+            return {}
+        if i not in self._explosions:
+            required = np.zeros(len(self.product_ids))
+            required[i] = 1.0
+            for level in range(int(self.levels[i]), self.max_level):
+                edges = self.level_edges(level)
+                np.add.at(required, self.components[edges], required[self.parents[edges]] * self.quantities[edges])
+            required[i] = 0.0
+            found = np.flatnonzero(required)
+            self._explosions[i] = dict(zip(self.product_ids[found].tolist(), required[found].tolist()))
+        return self._explosions[i]
+
+    def is_descendant(self, product_id, ancestor_id):
+        """Indique si `product_id` est `ancestor_id` ou l'un de ses composants (détection de boucle)"""
+        return product_id == ancestor_id or product_id in self.explosion(ancestor_id)
+
+
+def build_bom_structure():
+    """Charge tous les produits et toutes les lignes de nomenclature"""
+    product_ids = np.array(Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    lines = list(BOMLine.objects.values_list('parent_id', 'component_id', 'quantity_per'))
+    parents, components, quantities = zip(*lines) if lines else ((), (), ())
+    return BOMStructure.from_edges(product_ids, parents, components, [float(q) for q in quantities])
+
+
+_lock = threading.Lock()
+_structure = None
+_structure_version = None
+
+
+def get_bom_structure(refresh=False):
+    """Nomenclature du processus, recompilée quand une ligne de nomenclature a changé"""
+    global _structure, _structure_version
+    version = get_versions(('bom',))['bom']
+    with _lock:
+        if refresh or _structure is None or _structure_version != version:
+            _structure = build_bom_structure()
+            _structure_version = version
+        return _structure
+
+
+def compute_mrp(structure, gross, on_hand, safety_stock, lead_times):
+    """Besoins nets et lancements planifiés, par produit et par période.
+
+    `gross` (produits x périodes) contient les besoins bruts indépendants ;
+    il est complété sur place par les besoins dépendants. Retourne
+    (besoins nets par date de besoin, lancements par date de lancement),
+    arrondis à l'unité. Un lancement qui tomberait avant la première
+    période y est ramené (retard à rattraper).
+    """
+    n_products, n_periods = gross.shape
+    net = np.zeros_like(gross)
+    releases = np.zeros_like(gross)
+    periods = np.arange(n_periods)
+    # Un stock sous le stock de sécurité crée un besoin immédiat
+    available = on_hand - safety_stock
+
+    for level in range(structure.max_level + 1):
+        rows = np.flatnonzero(structure.levels == level)
+        if not len(rows):
+            continue
+        # Besoin net cumulé = max(besoin brut cumulé - disponible, 0), arrondi à l'unité
+        cumulative = np.ceil(np.maximum(np.cumsum(gross[rows], axis=1) - available[rows, None], 0.0) - 1e-9)
+        level_net = np.diff(cumulative, axis=1, prepend=0.0)
+        net[rows] = level_net
+
+        release_at = np.maximum(periods[None, :] - lead_times[rows, None], 0)
+        np.add.at(releases, (np.repeat(rows, n_periods), release_at.ravel()), level_net.ravel())
+
+        # Éclatement : besoins bruts des composants à la date de lancement du parent
+        edges = structure.level_edges(level)
+        if edges.stop > edges.start:
+            np.add.at(
+                gross, structure.components[edges],
+                releases[structure.parents[edges]] * structure.quantities[edges, None],
+            )
+    return net, releases
+
+
+class MRPResult:
+    """Résultat d'un calcul MRP : lancements planifiés par produit et par jour"""
+
+    def __init__(self, structure, start, net, releases):
+        self.structure = structure
+        self.start = start
+        self.net = net
+        self.releases = releases
+
+    @property
+    def horizon_days(self):
+        return self.releases.shape[1]
+
+    def planned_orders(self):
+        """Ordres planifiés (fabrication ou achat), par date de lancement"""
+        rows, periods = np.nonzero(self.releases)
+        order = np.lexsort((rows, periods))
+        lead_times = lead_times_for(self.structure)
+        product_ids = self.structure.product_ids
+        return [
+            PlannedOrder(
+                product_id=int(product_ids[row]),
+                kind='make' if self.structure.is_manufactured[row] else 'buy',
+                quantity=int(self.releases[row, period]),
+                release_date=self.start + timedelta(days=int(period)),
+                due_date=self.start + timedelta(days=int(period + lead_times[row])),
+            )
+            for row, period in zip(rows[order].tolist(), periods[order].tolist())
+        ]
+
+    def shortages(self):
+        """Produits dont un besoin net existe, avec la quantité totale à lancer"""
+        totals = self.releases.sum(axis=1)
+        rows = np.flatnonzero(totals)
+        return dict(zip(self.structure.product_ids[rows].tolist(), totals[rows].astype(np.int64).tolist()))
+
+
+def lead_times_for(structure):
+    """Délai d'obtention de chaque produit : fabrication s'il a une nomenclature, achat sinon"""
+    return np.where(structure.is_manufactured, MANUFACTURING_LEAD_TIME_DAYS, PURCHASE_LEAD_TIME_DAYS)
+
+
+def run_mrp(horizon_days=HORIZON_DAYS, use_safety_stock=True, today=None):
+    """MRP complet à partir des commandes ouvertes et du stock courant"""
+    today = today or timezone.localdate()
+    products = list(Product.objects.order_by('id').values_list('id', 'current_stock', 'min_stock'))
+    product_ids = np.fromiter((p[0] for p in products), dtype=np.int64, count=len(products))
+    structure = get_bom_structure()
+    # La version 'bom' ne suit pas les créations de produits : recompiler si le catalogue a changé
+    if not np.array_equal(structure.product_ids, product_ids):
+        structure = get_bom_structure(refresh=True)
+    n_products = len(structure)
+
+    on_hand = np.fromiter((max(p[1], 0) for p in products), dtype=np.float64, count=n_products)
+    safety_stock = np.fromiter((p[2] if use_safety_stock else 0 for p in products), dtype=np.float64, count=n_products)
+
+    gross = np.zeros((n_products, horizon_days))
+    rows = list(OrderItem.objects.filter(
+        order__status__in=DEMAND_STATUSES, order__delivery_date__lte=today + timedelta(days=horizon_days - 1),
+        reservation__isnull=False,
+    ).values_list('product_id', 'order__delivery_date', 'reservation__quantity'))
+    if rows:
+        item_products, delivery_dates, quantities = zip(*rows)
+        product_idx = np.searchsorted(structure.product_ids, np.array(item_products, dtype=np.int64))
+        # Livraisons en retard : besoin immédiat (première période)
+        period = np.clip(
+            (np.array(delivery_dates, dtype='datetime64[D]') - np.datetime64(today, 'D')).astype(np.int64),
+            0, horizon_days - 1,
+        )
+        np.add.at(gross, (product_idx, period), np.array(quantities, dtype=np.float64))
+
+    net, releases = compute_mrp(structure, gross, on_hand, safety_stock, lead_times_for(structure))
+    return MRPResult(structure, today, net, releases)
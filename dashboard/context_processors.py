@@ -0,0 +1,9 @@
+from .data_versions import FRAGMENT_CACHE_TTL, TemplateVersions
+
+
+def data_versions(request):
+    """Versions des données pour les blocs {% cache %} (lues seulement si un gabarit les utilise)"""
+    return {
+        'data_versions': TemplateVersions(),
+        'fragment_cache_ttl': FRAGMENT_CACHE_TTL,
+    }
@@ -0,0 +1,175 @@
+"""
+Versions des données, pour le cache des fragments de gabarits.
+
+Chaque famille de données a un compteur en base (`DataVersion`), incrémenté
+par les signaux `post_save` / `post_delete` (branchés dans
+`DashboardConfig.ready`) une fois la transaction validée. En base plutôt que
+dans le cache : le cache par défaut est propre à chaque processus, et les
+modifications faites par le worker, le dispatcher ou les commandes de
+gestion doivent invalider les fragments et les ETags du serveur web, comme
+les caches de processus (gammes, nomenclature, planification) du worker.
+Les blocs `{% cache %}` des gabarits sont indexés sur les versions dont ils
+dépendent, la date du jour et le rôle de l'utilisateur :
+
+    {% cache fragment_cache_ttl dashboard_main data_versions.order data_versions.day user.role %}
+
+Tant qu'aucune version ne change, le fragment est servi depuis le cache. Le
+contexte des vues étant paresseux (requêtes non évaluées, fonctions), la
+seule requête SQL est alors la lecture des versions (une requête sur la clé
+primaire de `DataVersion`, une fois par requête HTTP).
+
+Les mêmes versions servent d'ETag aux pages de liste et aux API JSON
+(`etag_for`, avec le décorateur `condition`) : une requête `If-None-Match`
+qui correspond reçoit un 304 après la seule lecture des versions, sans rendu
+de gabarit.
+Les notifications ont une version par utilisateur (`notifications:<id>`).
+
+Les opérations en masse (`QuerySet.update`, `bulk_create`, `bulk_update`)
+n'émettent pas de signal : appeler `bump_versions` après coup.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils import timezone
+
+from .models import DataVersion
+
+# modèle -> versions invalidées. Un mouvement de stock modifie aussi Product.current_stock et
+# StockBalance par des UPDATE (voir ledger.py), sans signal sur ces modèles.
+VERSIONED_MODELS = {
+    'Order': ('order',),
+    'Product': ('product',),
+    'StockMovement': ('stock', 'product'),
+    'StockLocation': ('stock',),
+    'StockBalance': ('stock', 'product'),
+    'StockLot': ('stock',),
+    'LotAllocation': ('stock',),
+    'PlanningEvent': ('planning',),
+    'AIAnalysis': ('analysis',),
+    'Customer': ('customer',),
+    'WorkCenter': ('routing',),
+    'RoutingStep': ('routing',),
+    'BOMLine': ('bom',),
+}
+NAMES = ('order', 'product', 'stock', 'planning', 'analysis', 'customer', 'routing', 'bom')
+
+FRAGMENT_CACHE_TTL = getattr(settings, 'FRAGMENT_CACHE_TTL', 3600)
+
+
+def _initial_version():
+    # Horodatage plutôt que 1 : une base recréée ne ressert pas une version encore présente dans un cache partagé
+    return time.time_ns()
+
+
+def _create_missing(names):
+    DataVersion.objects.bulk_create(
+        [DataVersion(name=name, version=_initial_version()) for name in names], ignore_conflicts=True,
+    )
+
+
+def get_versions(names=NAMES):
+    """Versions courantes, lues en une requête (les versions encore absentes sont créées)"""
+    names = list(names)
+    versions = dict(DataVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    missing = [name for name in names if name not in versions]
+    if missing:
+        _create_missing(missing)
+        versions.update(DataVersion.objects.filter(name__in=missing).values_list('name', 'version'))
+    return {name: versions[name] for name in names}
+
+
+def bump_versions(*names):
+    """Invalide les fragments qui dépendent de ces versions (toutes par défaut), pour tous les processus"""
+    names = list(names or NAMES)
+    _create_missing(names)
+    # Incrément en SQL : deux modifications concurrentes donnent deux versions distinctes
+    DataVersion.objects.filter(name__in=names).update(version=F('version') + 1)
+
+
+def _on_change(sender, **kwargs):
+    names = VERSIONED_MODELS[sender.__name__]
+    # Après validation : une requête concurrente ne doit pas mettre en cache l'ancien état sous la nouvelle version
+    transaction.on_commit(lambda: bump_versions(*names))
+
+
+def _on_routing_change(sender, action, **kwargs):
+    # Postes éligibles d'une opération (table de liaison RoutingStep.work_centers)
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: bump_versions('routing'))
+
+
+def user_version_name(name, user_id):
+    """Nom d'une version propre à un utilisateur (ex. ses notifications)"""
+    return f'{name}:{user_id}'
+
+
+def _on_notification_change(sender, instance, **kwargs):
+    name = user_version_name('notifications', instance.user_id)
+    transaction.on_commit(lambda: bump_versions(name))
+
+
+def connect_signals():
+    from . import models
+
+    for model_name in VERSIONED_MODELS:
+        model = getattr(models, model_name)
+        post_save.connect(_on_change, sender=model, dispatch_uid=f'data_version_save_{model_name}')
+        post_delete.connect(_on_change, sender=model, dispatch_uid=f'data_version_delete_{model_name}')
+    m2m_changed.connect(_on_routing_change, sender=models.RoutingStep.work_centers.through,
+                        dispatch_uid='data_version_m2m_RoutingStep')
+    post_save.connect(_on_notification_change, sender=models.Notification, dispatch_uid='data_version_save_Notification')
+    post_delete.connect(_on_notification_change, sender=models.Notification,
+                        dispatch_uid='data_version_delete_Notification')
+
+
+class TemplateVersions:
+    """Versions exposées aux gabarits (`data_versions.order`, `data_versions.day`...), lues au premier usage"""
+
+    def __init__(self):
+        self._versions = None
+
+    def __getitem__(self, name):
+        if name == 'day':
+            return timezone.localdate().isoformat()
+        if self._versions is None:
+            self._versions = get_versions()
+        return self._versions[name]
+
+
+def fragment_is_cached(fragment_name, names, role):
+    """Indique si un fragment indexé sur `names`, le jour et le rôle est en cache (même clé que `{% cache %}`)"""
+    versions = get_versions(names)
+    vary_on = [versions[name] for name in names] + [timezone.localdate().isoformat(), role]
+    return cache.has_key(make_template_fragment_key(fragment_name, vary_on))
+
+
+def etag_for(*names, user_names=()):
+    """Fonction ETag pour `condition`, calculée en une requête SQL (les versions).
+
+    Combine les versions `names`, les versions propres à l'utilisateur
+    `user_names`, le jour, l'utilisateur et l'URL complète. Pas d'ETag (donc
+    pas de 304) tant que des messages flash attendent d'être affichés.
+
+    Les pages embarquent `{% csrf_token %}` : la session et le secret CSRF,
+    renouvelés à la connexion, entrent aussi dans l'ETag, sinon le navigateur
+    resservirait après une reconnexion une page dont le jeton est périmé.
+    """
+    def etag_func(request, *args, **kwargs):
+        if len(getattr(request, '_messages', ())):
+            return None
+        user = request.user
+        scoped = list(names) + [user_version_name(name, user.pk) for name in user_names]
+        versions = get_versions(scoped)
+        raw = '|'.join(
+            [str(versions[name]) for name in scoped]
+            + [timezone.localdate().isoformat(), str(user.pk), getattr(user, 'role', ''), request.get_full_path()]
+            + [request.session.session_key or '', request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+        )
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return etag_func
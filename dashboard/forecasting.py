@@ -0,0 +1,135 @@
+"""
+Prévision de la demande et points de commande pour tout le catalogue.
+
+L'historique des sorties de stock (`StockMovement` de type 'out') est agrégé par
+jour en SQL puis chargé dans des tableaux NumPy : taux de demande, variabilité,
+stock de sécurité et point de commande sont calculés en une seule passe
+vectorisée pour tous les produits, puis mis en cache.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .data_versions import get_versions
+from .models import Product, StockMovement
+
+HISTORY_DAYS = getattr(settings, 'FORECAST_HISTORY_DAYS', 365)
+LEAD_TIME_DAYS = getattr(settings, 'FORECAST_LEAD_TIME_DAYS', 7)
+REVIEW_PERIOD_DAYS = getattr(settings, 'FORECAST_REVIEW_PERIOD_DAYS', 7)
+SERVICE_LEVEL_Z = getattr(settings, 'FORECAST_SERVICE_LEVEL_Z', 1.65)  # ~95 %
+CACHE_TTL = getattr(settings, 'FORECAST_CACHE_TTL', 3600)
+
+
+def compute_demand_stats(product_idx, day_idx, quantities, n_products, n_days):
+    """Taux de demande journalier moyen et écart-type par produit.
+
+    Les trois tableaux décrivent des sorties (éventuellement plusieurs par jour) ;
+    les jours sans sortie comptent comme une demande nulle.
+    """
+    keys = product_idx.astype(np.int64) * n_days + day_idx
+    cells, inverse = np.unique(keys, return_inverse=True)
+    daily = np.bincount(inverse, weights=quantities)
+    cell_products = cells // n_days
+
+    total = np.bincount(cell_products, weights=daily, minlength=n_products)
+    total_sq = np.bincount(cell_products, weights=daily * daily, minlength=n_products)
+
+    rate = total / n_days
+    sigma = np.sqrt(np.maximum(total_sq / n_days - rate * rate, 0.0))
+    return rate, sigma
+
+
+def compute_reorder_policy(rate, sigma, current_stock, min_stock,
+                           lead_time=LEAD_TIME_DAYS, review_period=REVIEW_PERIOD_DAYS, z=SERVICE_LEVEL_Z):
+    """Stock de sécurité, point de commande et quantité à commander (vectorisé)"""
+    safety_stock = z * sigma * math.sqrt(lead_time)
+    reorder_point = rate * lead_time + safety_stock
+    # Niveau de recomplètement : couvre le délai + la période de revue, jamais sous le stock mini
+    order_up_to = np.maximum(rate * (lead_time + review_period) + safety_stock, min_stock)
+    suggested_quantity = np.ceil(np.maximum(order_up_to - current_stock, 0.0)).astype(np.int64)
+    return safety_stock, reorder_point, suggested_quantity
+
+
+class CatalogForecast:
+    """Résultat de prévision pour tout le catalogue, indexé par produit"""
+
+    def __init__(self, product_ids, rate, sigma, safety_stock, reorder_point, suggested_quantity, computed_at):
+        self.product_ids = product_ids
+        self.rate = rate
+        self.sigma = sigma
+        self.safety_stock = safety_stock
+        self.reorder_point = reorder_point
+        self.suggested_quantity = suggested_quantity
+        self.computed_at = computed_at
+        self._index = {pid: i for i, pid in enumerate(product_ids.tolist())}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def for_product(self, product_id):
+        """Indicateurs d'un produit, ou None s'il est inconnu"""
+        i = self._index.get(product_id)
+        if i is None:
+            return None
+        return {
+            'daily_demand': round(float(self.rate[i]), 2),
+            'demand_std': round(float(self.sigma[i]), 2),
+            'safety_stock': round(float(self.safety_stock[i]), 1),
+            'reorder_point': round(float(self.reorder_point[i]), 1),
+            'suggested_quantity': int(self.suggested_quantity[i]),
+        }
+
+
+def build_catalog_forecast(history_days=HISTORY_DAYS, now=None):
+    """Charge l'historique des sorties et calcule la prévision de tout le catalogue"""
+    now = now or timezone.now()
+    start = (now - timedelta(days=history_days)).date()
+
+    products = list(Product.objects.order_by('id').values_list('id', 'current_stock', 'min_stock'))
+    product_ids = np.fromiter((p[0] for p in products), dtype=np.int64, count=len(products))
+    current_stock = np.fromiter((p[1] for p in products), dtype=np.float64, count=len(products))
+    min_stock = np.fromiter((p[2] for p in products), dtype=np.float64, count=len(products))
+
+    # Agrégation journalière en base : une ligne par (produit, jour) au lieu d'une par mouvement
+    rows = list(StockMovement.objects.filter(
+        movement_type='out', created_at__date__gte=start
+    ).annotate(day=TruncDate('created_at')).values('product_id', 'day').annotate(
+        total=Sum('quantity')
+    ).values_list('product_id', 'day', 'total'))
+
+    if rows:
+        movement_products, days, quantities = zip(*rows)
+        product_idx = np.searchsorted(product_ids, np.array(movement_products, dtype=np.int64))
+        day_idx = (np.array(days, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+        rate, sigma = compute_demand_stats(
+            product_idx, day_idx, np.array(quantities, dtype=np.float64), len(products), history_days + 1
+        )
+    else:
+        rate = np.zeros(len(products))
+        sigma = np.zeros(len(products))
+
+    safety_stock, reorder_point, suggested_quantity = compute_reorder_policy(rate, sigma, current_stock, min_stock)
+    return CatalogForecast(product_ids, rate, sigma, safety_stock, reorder_point, suggested_quantity, now)
+
+
+def get_catalog_forecast():
+    """Prévision du catalogue, recalculée quand le journal de stock ou les produits (stock mini...) ont changé"""
+    stamp = StockMovement.objects.aggregate(last=Max('id'))['last'] or 0
+    versions = get_versions(('product', 'stock'))
+    key = f"forecast:catalog:{stamp}:{Product.objects.count()}:{versions['product']}:{versions['stock']}"
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = build_catalog_forecast()
+        cache.set(key, forecast, CACHE_TTL)
+    return forecast
+
+
+def get_product_forecast(product):
+    """Indicateurs de prévision d'un produit (taux, sécurité, point de commande, quantité)"""
+    return get_catalog_forecast().for_product(product.pk)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Product, Order, Customer, StockMovement
+from .models import Product, Order, Customer, StockLocation, StockMovement
 
 class ProductForm(forms.ModelForm):
     class Meta:
@@ -69,6 +69,21 @@ class OrderForm(forms.ModelForm):
         }
 
 class StockMovementForm(forms.ModelForm):
+    # Vide : emplacement par défaut (ledger.DEFAULT_LOCATION)
+    location = forms.ModelChoiceField(
+        queryset=StockLocation.objects.filter(is_active=True), required=False,
+        empty_label="Emplacement par défaut", widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    # Entrée seulement : renseigné, le stock reçu est suivi par lot (ledger.receive_lot)
+    lot_number = forms.CharField(
+        max_length=50, required=False, label="Numéro de lot",
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    expiry_date = forms.DateField(
+        required=False, label="Date de péremption",
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+
     class Meta:
         model = StockMovement
         fields = ['movement_type', 'quantity', 'reason']
@@ -78,11 +93,46 @@ class StockMovementForm(forms.ModelForm):
             'reason': forms.TextInput(attrs={'class': 'form-control'}),
         }
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Les transferts ont leur propre formulaire (paire de mouvements)
+        self.fields['movement_type'].choices = [
+            choice for choice in self.fields['movement_type'].choices if choice[0] != 'transfer'
+        ]
+
     def clean_quantity(self):
         quantity = self.cleaned_data['quantity']
         if quantity <= 0:
             raise forms.ValidationError("La quantité doit être positive.")
         return quantity
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lot_number = (cleaned_data.get('lot_number') or '').strip()
+        cleaned_data['lot_number'] = lot_number
+        if (lot_number or cleaned_data.get('expiry_date')) and cleaned_data.get('movement_type') != 'in':
+            raise forms.ValidationError("Le numéro de lot et la péremption ne s'appliquent qu'à une entrée.")
+        if cleaned_data.get('expiry_date') and not lot_number:
+            self.add_error('lot_number', "Numéro de lot requis avec une date de péremption.")
+        return cleaned_data
+
+class StockTransferForm(forms.Form):
+    source = forms.ModelChoiceField(
+        queryset=StockLocation.objects.filter(is_active=True), label="Origine",
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    destination = forms.ModelChoiceField(
+        queryset=StockLocation.objects.filter(is_active=True), label="Destination",
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    quantity = forms.IntegerField(min_value=1, label="Quantité", widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    reason = forms.CharField(max_length=100, required=False, label="Raison", widget=forms.TextInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('source') and cleaned_data.get('source') == cleaned_data.get('destination'):
+            raise forms.ValidationError("Les emplacements d'origine et de destination doivent être différents.")
+        return cleaned_data
     
 class CustomerForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,261 @@
+"""
+Arbre d'intervalles en mémoire pour les événements de planification.
+
+`IntervalTree` est un treap (arbre binaire de recherche équilibré par des
+priorités aléatoires) trié sur le début des intervalles et augmenté de la
+fin maximale de chaque sous-arbre. Les intervalles sont fermés ([début,
+fin]) et les requêtes coûtent O(log n + k) pour k résultats :
+
+- `overlap(lo, hi)` : intervalles qui chevauchent [lo, hi] ;
+- `stab(point)` : intervalles qui contiennent un point ;
+- `gaps(lo, hi, step)` : fenêtres de [lo, hi] couvertes par aucun intervalle.
+
+`EventIndex` tient un tel arbre pour les `PlanningEvent` de la base. Il est
+construit au premier usage, mis à jour par les signaux post_save /
+post_delete, et reconstruit si la version `planning` (voir data_versions.py)
+a été modifiée par un autre processus.
+"""
+import random
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .data_versions import get_versions
+
+# Événements qui bloquent la capacité de production
+BLOCKING_TYPES = ('maintenance', 'breakdown', 'holiday')
+# Types qui ne peuvent pas se chevaucher entre eux
+EXCLUSIVE_TYPES = ('breakdown',)
+
+EventInterval = namedtuple('EventInterval', ['id', 'start_date', 'end_date', 'event_type', 'title'])
+
+
+class _Node:
+    __slots__ = ('key', 'start', 'end', 'data', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, key, start, end, data, priority):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.data = data
+        self.priority = priority
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    max_end = node.end
+    if node.left is not None and node.left.max_end > max_end:
+        max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > max_end:
+        max_end = node.right.max_end
+    node.max_end = max_end
+
+
+def _split(node, order):
+    """Sépare en (clés < order, clés >= order)"""
+    if node is None:
+        return None, None
+    if (node.start, node.key) < order:
+        node.right, right = _split(node.right, order)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, order)
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    """Fusionne deux treaps dont toutes les clés de `left` précèdent celles de `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _remove(node, order):
+    if node is None:
+        return None
+    node_order = (node.start, node.key)
+    if node_order == order:
+        return _merge(node.left, node.right)
+    if order < node_order:
+        node.left = _remove(node.left, order)
+    else:
+        node.right = _remove(node.right, order)
+    _update(node)
+    return node
+
+
+class IntervalTree:
+    """Intervalles fermés [start, end] identifiés par une clé unique"""
+
+    def __init__(self, seed=None):
+        self._root = None
+        self._starts = {}  # clé -> début, pour retrouver le nœud à supprimer
+        self._random = random.Random(seed)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __contains__(self, key):
+        return key in self._starts
+
+    def insert(self, key, start, end, data=None):
+        """Ajoute (ou remplace) l'intervalle `key`"""
+        if end < start:
+            raise ValueError(f"Intervalle invalide : {start} > {end}")
+        if key in self._starts:
+            self.remove(key)
+        node = _Node(key, start, end, data, self._random.random())
+        left, right = _split(self._root, (start, key))
+        self._root = _merge(_merge(left, node), right)
+        self._starts[key] = start
+
+    def remove(self, key):
+        """Retire l'intervalle `key` (sans effet s'il est absent)"""
+        start = self._starts.pop(key, None)
+        if start is not None:
+            self._root = _remove(self._root, (start, key))
+
+    def overlap(self, lo, hi):
+        """Nœuds chevauchant [lo, hi], par début croissant"""
+        stack = []
+        node = self._root
+        while stack or node is not None:
+            # Descente à gauche tant que le sous-arbre peut contenir un intervalle qui finit après lo
+            while node is not None and node.max_end >= lo:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if node.start > hi:
+                # Tous les nœuds suivants commencent après hi
+                return
+            if node.end >= lo:
+                yield node
+            node = node.right
+
+    def stab(self, point):
+        """Nœuds dont l'intervalle contient `point`"""
+        return self.overlap(point, point)
+
+    def gaps(self, lo, hi, step, predicate=None):
+        """Fenêtres [début, fin] de [lo, hi] couvertes par aucun intervalle retenu par `predicate`"""
+        cursor = lo
+        for node in self.overlap(lo, hi):
+            if predicate is not None and not predicate(node.data):
+                continue
+            if node.start > cursor:
+                yield cursor, node.start - step
+            if node.end >= cursor:
+                cursor = node.end + step
+            if cursor > hi:
+                return
+        if cursor <= hi:
+            yield cursor, hi
+
+
+class EventIndex:
+    """Index des événements de planification, un par processus"""
+
+    def __init__(self):
+        self._tree = None
+        self._version = None
+        self._lock = threading.RLock()
+
+    def _current_tree(self):
+        version = get_versions(('planning',))['planning']
+        with self._lock:
+            if self._tree is None or version != self._version:
+                self._rebuild(version)
+            return self._tree
+
+    def _rebuild(self, version):
+        from .models import PlanningEvent
+
+        tree = IntervalTree()
+        for row in PlanningEvent.objects.values_list('id', 'start_date', 'end_date', 'event_type', 'title'):
+            event = EventInterval(*row)
+            tree.insert(event.id, event.start_date, event.end_date, event)
+        self._tree = tree
+        self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+
+    def apply(self, event, deleted=False):
+        """Répercute un enregistrement ou une suppression (appelé après validation de la transaction)"""
+        version = get_versions(('planning',))['planning']
+        with self._lock:
+            if self._tree is None:
+                return
+            if version != self._version + 1:
+                # D'autres modifications ont eu lieu entre-temps (autre processus) : reconstruction au prochain usage
+                self._tree = None
+                return
+            if deleted:
+                self._tree.remove(event.pk)
+            else:
+                self._tree.insert(event.pk, event.start_date, event.end_date, EventInterval(
+                    event.pk, event.start_date, event.end_date, event.event_type, event.title
+                ))
+            self._version = version
+
+    def overlapping(self, start, end, event_types=None):
+        """Événements qui chevauchent [start, end], par date de début"""
+        with self._lock:
+            return [
+                node.data for node in self._current_tree().overlap(start, end)
+                if event_types is None or node.data.event_type in event_types
+            ]
+
+    def at(self, day, event_types=BLOCKING_TYPES):
+        """Événements qui bloquent la capacité le jour `day`"""
+        return self.overlapping(day, day, event_types)
+
+    def conflicts(self, start, end, event_type):
+        """Événements exclusifs du même type qui chevaucheraient un nouvel événement"""
+        if event_type not in EXCLUSIVE_TYPES:
+            return []
+        return self.overlapping(start, end, (event_type,))
+
+    def free_windows(self, start, end, min_days=1, event_types=BLOCKING_TYPES):
+        """Fenêtres libres d'au moins `min_days` jours dans [start, end]"""
+        with self._lock:
+            windows = self._current_tree().gaps(
+                start, end, timedelta(days=1), lambda event: event.event_type in event_types
+            )
+            return [(lo, hi) for lo, hi in windows if (hi - lo).days + 1 >= min_days]
+
+
+event_index = EventIndex()
+
+
+def _on_event_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: event_index.apply(instance))
+
+
+def _on_event_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: event_index.apply(instance, deleted=True))
+
+
+def connect_signals():
+    """À appeler après data_versions.connect_signals : la version doit être incrémentée avant `apply`"""
+    from .models import PlanningEvent
+
+    post_save.connect(_on_event_saved, sender=PlanningEvent, dispatch_uid='event_index_save')
+    post_delete.connect(_on_event_deleted, sender=PlanningEvent, dispatch_uid='event_index_delete')
@@ -0,0 +1,109 @@
+"""
+Analyse du stock : rotation, couverture, stock dormant et classification ABC.
+
+Les agrégats sont calculés en base (une requête groupée par source) puis
+stockés dans `InventoryMetrics`, que le copilot et la liste des produits
+lisent directement. Le rafraîchissement est prévu pour tourner chaque nuit.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.utils import timezone
+
+from .data_versions import bump_versions
+from .models import InventoryMetrics, OrderItem, Product, StockMovement, StockSnapshot
+
+WINDOW_DAYS = getattr(settings, 'INVENTORY_ANALYTICS_WINDOW_DAYS', 365)
+DEAD_STOCK_DAYS = getattr(settings, 'INVENTORY_DEAD_STOCK_DAYS', 90)
+ABC_THRESHOLDS = (0.80, 0.95)  # Part cumulée du CA : A jusqu'à 80 %, B jusqu'à 95 %
+
+
+def classify_abc(revenues):
+    """Classe A/B/C selon la part cumulée du chiffre d'affaires ({product_id: classe})"""
+    total = sum(revenues.values())
+    classes = {}
+    cumulated = Decimal(0)
+    for product_id, revenue in sorted(revenues.items(), key=lambda item: item[1], reverse=True):
+        if total <= 0 or revenue <= 0:
+            classes[product_id] = 'C'
+            continue
+        share_before = cumulated / total
+        cumulated += revenue
+        if share_before < ABC_THRESHOLDS[0]:
+            classes[product_id] = 'A'
+        elif share_before < ABC_THRESHOLDS[1]:
+            classes[product_id] = 'B'
+        else:
+            classes[product_id] = 'C'
+    return classes
+
+
+def refresh_inventory_metrics(window_days=WINDOW_DAYS, now=None):
+    """Recalcule la table InventoryMetrics pour tous les produits"""
+    now = now or timezone.now()
+    since = now - timedelta(days=window_days)
+    dead_before = now - timedelta(days=DEAD_STOCK_DAYS)
+
+    outflows = {
+        row['product_id']: row
+        for row in StockMovement.objects.filter(
+            movement_type='out', created_at__gte=since
+        ).values('product_id').annotate(units=Sum('quantity'), last_out=Max('created_at'))
+    }
+
+    line_total = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    revenues = dict(OrderItem.objects.filter(
+        order__created_at__gte=since,
+        order__status__in=['confirmed', 'in_production', 'shipped', 'delivered'],
+    ).values('product_id').annotate(revenue=Sum(line_total)).values_list('product_id', 'revenue'))
+
+    average_stocks = dict(StockSnapshot.objects.filter(
+        taken_at__gte=since
+    ).values('product_id').annotate(average=Avg('quantity')).values_list('product_id', 'average'))
+
+    products = list(Product.objects.values_list('id', 'current_stock'))
+    abc_classes = classify_abc({product_id: revenues.get(product_id) or Decimal(0) for product_id, _ in products})
+
+    metrics = []
+    for product_id, current_stock in products:
+        outflow = outflows.get(product_id, {})
+        units_out = outflow.get('units') or 0
+        last_out_at = outflow.get('last_out')
+        average_stock = average_stocks.get(product_id, current_stock) or 0
+        daily_demand = units_out / window_days
+
+        metrics.append(InventoryMetrics(
+            product_id=product_id,
+            units_out=units_out,
+            revenue=revenues.get(product_id) or 0,
+            average_stock=round(average_stock, 2),
+            turnover=round(units_out * 365 / window_days / average_stock, 2) if average_stock > 0 else None,
+            days_of_coverage=round(current_stock / daily_demand, 1) if daily_demand > 0 else None,
+            last_out_at=last_out_at,
+            is_dead_stock=current_stock > 0 and (last_out_at is None or last_out_at < dead_before),
+            abc_class=abc_classes[product_id],
+            refreshed_at=now,
+        ))
+
+    with transaction.atomic():
+        InventoryMetrics.objects.all().delete()
+        InventoryMetrics.objects.bulk_create(metrics, batch_size=1000)
+    # Insertion en masse, sans signal : invalider les pages qui affichent ces indicateurs
+    bump_versions('product')
+
+    return len(metrics)
+
+
+def get_catalog_turnover():
+    """Rotation annualisée globale du stock, lue dans la table de synthèse"""
+    # Moyenne des rotations pondérée par le stock moyen = sorties annualisées / stock moyen total
+    totals = InventoryMetrics.objects.filter(turnover__isnull=False).aggregate(
+        annual_units=Sum(F('turnover') * F('average_stock')),
+        stock=Sum('average_stock'),
+    )
+    if not totals['stock']:
+        return 0.0
+    return round(totals['annual_units'] / totals['stock'], 2)
@@ -0,0 +1,157 @@
+"""
+File de tâches de fond stockée en base, sans broker externe.
+
+Les vues mettent en file les traitements lourds (`enqueue`) et renvoient
+l'identifiant du `Job` ; un ou plusieurs processus `manage.py run_worker`
+réclament les tâches de façon atomique (UPDATE conditionnel sur le statut),
+les exécutent et stockent le résultat, conservé `RESULT_TTL` secondes.
+Un échec est retenté avec un délai exponentiel jusqu'à `max_attempts`.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Nom de tâche -> fonction exécutée par le worker (appelée avec le payload en arguments nommés)
+HANDLERS = {
+    'stock_report': 'dashboard.views.generate_stock_report',
+    'production_plan': 'dashboard.views.generate_production_plan',
+    'customer_analysis': 'dashboard.views.generate_customer_analysis',
+    'scenarios': 'dashboard.scenarios.run_scenarios',
+    'optimize_schedule': 'dashboard.optimizer.optimize_schedule',
+}
+
+_config = getattr(settings, 'JOB_QUEUE', {})
+EAGER = _config.get('EAGER', False)  # Exécution immédiate dans la requête (développement sans worker)
+MAX_ATTEMPTS = _config.get('MAX_ATTEMPTS', 3)
+RETRY_BACKOFF = _config.get('RETRY_BACKOFF', 10)  # secondes, doublé à chaque essai
+RESULT_TTL = _config.get('RESULT_TTL', 3600)
+LOCK_TIMEOUT = _config.get('LOCK_TIMEOUT', 600)  # Tâche "running" abandonnée au-delà (worker tué)
+CONCURRENCY = _config.get('CONCURRENCY', 2)
+POLL_INTERVAL = _config.get('POLL_INTERVAL', 1.0)
+MAINTENANCE_INTERVAL = _config.get('MAINTENANCE_INTERVAL', 60)  # Reprise des tâches abandonnées et purge (s)
+
+
+def enqueue(name, payload=None, user=None, max_attempts=MAX_ATTEMPTS):
+    """Met une tâche en file et la retourne"""
+    if name not in HANDLERS:
+        raise ValueError(f"Tâche inconnue : {name}")
+    job = Job.objects.create(name=name, payload=payload or {}, created_by=user, max_attempts=max_attempts)
+    if EAGER:
+        run_job(claim_job(job.pk, 'eager'))
+        job.refresh_from_db()
+    return job
+
+
+def claim_job(job_id, worker_id):
+    """Réclame une tâche en attente ; None si un autre worker l'a prise avant"""
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+    )
+    return Job.objects.get(pk=job_id) if claimed else None
+
+
+def claim_next(worker_id):
+    """Réclame la plus ancienne tâche exécutable"""
+    while True:
+        job_id = Job.objects.filter(
+            status='queued', run_after__lte=timezone.now()
+        ).order_by('run_after', 'id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        job = claim_job(job_id, worker_id)
+        if job is not None:
+            return job
+        # Prise par un autre worker entre la lecture et l'UPDATE : on passe à la suivante
+
+
+def run_job(job):
+    """Exécute une tâche réclamée et enregistre son résultat ou son échec"""
+    handler = import_string(HANDLERS[job.name])
+    try:
+        result = handler(**job.payload)
+    except Exception:
+        now = timezone.now()
+        job.error = traceback.format_exc()
+        job.locked_by = ''
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = now + timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1))
+        else:
+            job.status = 'failed'
+            job.finished_at = now
+            job.expires_at = now + timedelta(seconds=RESULT_TTL)
+        logger.warning("Tâche %s #%s en échec (essai %s/%s)", job.name, job.pk, job.attempts, job.max_attempts)
+    else:
+        now = timezone.now()
+        job.status = 'succeeded'
+        job.result = result
+        job.error = ''
+        job.finished_at = now
+        job.expires_at = now + timedelta(seconds=RESULT_TTL)
+    job.save(update_fields=['status', 'result', 'error', 'locked_by', 'run_after', 'finished_at', 'expires_at'])
+    return job
+
+
+def requeue_stale_jobs():
+    """Remet en file les tâches dont le worker a disparu pendant l'exécution ; celles qui ont épuisé
+    leurs essais (une tâche qui tue son worker le tuerait encore) passent en échec. Retourne le nombre
+    de tâches remises en file."""
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=LOCK_TIMEOUT))
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', error="Worker disparu pendant l'exécution", finished_at=now,
+        expires_at=now + timedelta(seconds=RESULT_TTL),
+    )
+    return stale.update(status='queued', locked_by='')
+
+
+def purge_expired_jobs():
+    """Supprime les tâches terminées dont le résultat a expiré"""
+    deleted, _ = Job.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
+
+
+def worker_id(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def work(stop_event=None, poll_interval=POLL_INTERVAL, burst=False, index=0):
+    """Boucle d'un worker : réclame et exécute les tâches jusqu'à l'arrêt.
+
+    En mode `burst`, le worker s'arrête dès que la file est vide. Toutes les
+    MAINTENANCE_INTERVAL secondes, il reprend les tâches abandonnées et purge
+    les résultats expirés.
+    """
+    me = worker_id(index)
+    done = 0
+    next_maintenance = 0.0
+    while not (stop_event and stop_event.is_set()):
+        close_old_connections()
+        if time.monotonic() >= next_maintenance:
+            requeue_stale_jobs()
+            purge_expired_jobs()
+            next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        job = claim_next(me)
+        if job is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        run_job(job)
+        done += 1
+    close_old_connections()
+    return done
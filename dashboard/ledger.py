@@ -0,0 +1,523 @@
+"""
+Journal de stock (ledger) : toutes les variations de stock passent par ici.
+
+`StockMovement` est la source de vérité en ajout seul. Chaque mouvement porte
+un emplacement ; `StockBalance` (stock par produit et emplacement) et
+`Product.current_stock` (total) n'en sont que des projections matérialisées,
+mises à jour dans la même transaction, avec le compteur
+`Product.low_stock_locations` des emplacements sous leur seuil. Les vues
+agrégées (stock total, stock faible) lisent ces colonnes sans sommer les
+soldes.
+
+Un transfert (`transfer`) est une paire de mouvements qui s'annulent : le
+total du produit ne change pas.
+
+Suivi par lot : `receive_lot` enregistre une entrée et le lot reçu
+(`StockLot`). Toute baisse d'un solde consomme d'abord ses lots ouverts dans
+l'ordre FEFO (péremption puis réception), lus au début de l'index partiel des
+lots ouverts ; un transfert déplace les lots consommés vers la destination.
+La somme des lots ouverts d'un emplacement ne dépasse donc jamais son solde.
+`allocate_lines` prélève en une transaction les lignes de plusieurs commandes
+et garde la trace des lots servis (`LotAllocation`).
+
+Chaque mouvement publie un événement `stock.movement_recorded` dans l'outbox
+(outbox.py), dans la même transaction.
+
+Les `StockSnapshot` périodiques bornent le nombre de mouvements à relire pour
+reconstituer le stock à une date donnée.
+"""
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .data_versions import bump_versions
+from .outbox import emit, stock_movement_event
+from .models import (
+    LotAllocation, Product, StockBalance, StockLocation, StockLot, StockMovement, StockSnapshot,
+)
+
+DEFAULT_LOCATION = getattr(settings, 'STOCK_DEFAULT_LOCATION', 'MAIN')
+LOT_CHUNK = 100  # Lots ouverts lus par requête lors d'une consommation FEFO
+# Ordre de prélèvement : emplacement d'expédition d'abord, puis les autres par code
+SHIPPING_FIRST = (
+    Case(When(location__code=DEFAULT_LOCATION, then=Value(0)), default=Value(1), output_field=IntegerField()),
+    'location__code',
+)
+
+
+def default_location():
+    """Emplacement des mouvements sans emplacement explicite (créé au besoin)"""
+    location, _ = StockLocation.objects.get_or_create(
+        code=DEFAULT_LOCATION, defaults={'name': 'Entrepôt principal'},
+    )
+    return location
+
+
+def compute_delta(movement_type, quantity, current_stock):
+    """Variation signée appliquée au stock (d'un emplacement) pour un mouvement donné"""
+    if movement_type == 'in':
+        return quantity
+    if movement_type == 'out':
+        # Comme l'ajustement manuel historique : le stock ne descend jamais sous zéro
+        return -min(quantity, current_stock)
+    if movement_type == 'adjustment':
+        return quantity - current_stock
+    if movement_type == 'transfer':
+        raise ValueError("Un transfert s'enregistre avec ledger.transfer")
+    raise ValueError(f"Type de mouvement inconnu : {movement_type}")
+
+
+def _lock_product(product):
+    """Verrouille la ligne du produit (ordre de verrouillage : produit puis soldes) et relit ses compteurs"""
+    product.current_stock, product.low_stock_locations = Product.objects.select_for_update().values_list(
+        'current_stock', 'low_stock_locations'
+    ).get(pk=product.pk)
+
+
+def _lock_balance(product, location):
+    balance, _ = StockBalance.objects.select_for_update().get_or_create(product_id=product.pk, location=location)
+    return balance
+
+
+def _consume_lots(product_id, location_id, quantity):
+    """Consomme `quantity` sur les lots ouverts d'un emplacement, en FEFO (verrous produit et solde déjà pris).
+
+    Les lots sont lus par tranches depuis le début de l'index des lots ouverts : le coût dépend du
+    nombre de lots consommés, pas du nombre de lots ouverts. Ce qui dépasse les lots est du stock
+    non suivi. Retourne [(lot, quantité prise)] dans l'ordre de consommation.
+    """
+    open_lots = StockLot.objects.select_for_update().filter(
+        product_id=product_id, location_id=location_id, remaining__gt=0,
+    ).order_by(*StockLot.FEFO)
+    consumed = []
+    offset = 0
+    while quantity > 0:
+        chunk = list(open_lots[offset:offset + LOT_CHUNK])
+        for lot in chunk:
+            taken = min(lot.remaining, quantity)
+            lot.remaining -= taken
+            quantity -= taken
+            consumed.append((lot, taken))
+            if not quantity:
+                break
+        if len(chunk) < LOT_CHUNK:
+            break
+        offset += LOT_CHUNK
+    if consumed:
+        StockLot.objects.bulk_update([lot for lot, _ in consumed], ['remaining'])
+    return consumed
+
+
+def _add_to_lot(product, location, lot_number, quantity, received_at=None, expiry_date=None):
+    """Ajoute `quantity` au lot `lot_number` de l'emplacement (créé au besoin)"""
+    lot, created = StockLot.objects.select_for_update().get_or_create(
+        product_id=product.pk, location=location, lot_number=lot_number,
+        defaults={
+            'received_at': received_at or timezone.now(),
+            'expiry_date': expiry_date,
+            'quantity': quantity,
+            'remaining': quantity,
+        },
+    )
+    if not created:
+        StockLot.objects.filter(pk=lot.pk).update(
+            quantity=F('quantity') + quantity, remaining=F('remaining') + quantity,
+        )
+        lot.quantity += quantity
+        lot.remaining += quantity
+    return lot
+
+
+def _post(product, balance, movement_type, quantity, delta, **fields):
+    """Applique `delta` au solde et au total du produit (verrous déjà pris) et écrit le mouvement.
+
+    Une baisse consomme les lots de l'emplacement ; ils sont disponibles dans `movement.lots`.
+    """
+    was_low = balance.is_low
+    balance.quantity += delta
+    low_change = int(balance.is_low) - int(was_low)
+    StockBalance.objects.filter(pk=balance.pk).update(quantity=F('quantity') + delta)
+    Product.objects.filter(pk=product.pk).update(
+        current_stock=F('current_stock') + delta,
+        low_stock_locations=F('low_stock_locations') + low_change,
+    )
+    product.current_stock += delta
+    product.low_stock_locations += low_change
+    lots = _consume_lots(product.pk, balance.location_id, -delta) if delta < 0 else []
+
+    movement = StockMovement.objects.create(
+        product=product,
+        location=balance.location,
+        movement_type=movement_type,
+        quantity=quantity,
+        delta=delta,
+        **fields,
+    )
+    emit(stock_movement_event(movement))
+    movement.lots = lots
+    return movement
+
+
+def record_movement(product, movement_type, quantity, user=None, reason='', customer=None, customer_id=None,
+                    location=None):
+    """Enregistre un mouvement sur un emplacement (par défaut : DEFAULT_LOCATION) de façon atomique"""
+    location = location or default_location()
+    with transaction.atomic():
+        _lock_product(product)
+        balance = _lock_balance(product, location)
+        delta = compute_delta(movement_type, quantity, balance.quantity)
+        return _post(
+            product, balance, movement_type, quantity, delta,
+            reason=reason[:100],
+            user=user,
+            customer_id=customer.pk if customer else customer_id,
+        )
+
+
+def issue(product, quantity, user=None, reason='', customer_id=None):
+    """Sortie de `quantity` prélevée emplacement par emplacement : l'emplacement par défaut
+    (expédition) d'abord, puis les autres par code ; ValueError si le stock total est insuffisant"""
+    with transaction.atomic():
+        _lock_product(product)
+        if product.current_stock < quantity:
+            raise ValueError(f"Stock insuffisant pour {product.reference}")
+        balances = StockBalance.objects.select_for_update().select_related('location').filter(
+            product_id=product.pk, quantity__gt=0,
+        ).order_by(*SHIPPING_FIRST)
+        movements = []
+        remaining = quantity
+        for balance in balances:
+            if remaining <= 0:
+                break
+            taken = min(balance.quantity, remaining)
+            movements.append(_post(
+                product, balance, 'out', taken, -taken,
+                reason=reason[:100], user=user, customer_id=customer_id,
+            ))
+            remaining -= taken
+        return movements
+
+
+def transfer(product, source, destination, quantity, user=None, reason=''):
+    """Transfert entre deux emplacements : sortie à l'origine et entrée à destination, liées ;
+    ValueError si les emplacements sont identiques ou le stock d'origine insuffisant"""
+    if source.pk == destination.pk:
+        raise ValueError("Les emplacements d'origine et de destination doivent être différents")
+    if quantity <= 0:
+        raise ValueError("La quantité transférée doit être positive")
+    reason = (reason or f'Transfert {source.code} -> {destination.code}')[:100]
+    with transaction.atomic():
+        _lock_product(product)
+        # Soldes verrouillés dans l'ordre des emplacements, comme tout autre transfert
+        balances = {location.pk: _lock_balance(product, location) for location in sorted(
+            (source, destination), key=lambda location: location.pk
+        )}
+        if balances[source.pk].quantity < quantity:
+            raise ValueError(
+                f"Stock insuffisant en {source.code} : {balances[source.pk].quantity} disponible(s)"
+            )
+        outgoing = _post(product, balances[source.pk], 'transfer', quantity, -quantity, reason=reason, user=user)
+        _post(
+            product, balances[destination.pk], 'transfer', quantity, quantity,
+            reason=reason, user=user, transfer_source=outgoing,
+        )
+        # Les lots quittent l'origine avec leur numéro, leur date de réception et leur péremption
+        for lot, moved in outgoing.lots:
+            _add_to_lot(product, destination, lot.lot_number, moved, lot.received_at, lot.expiry_date)
+        return outgoing
+
+
+# ========== LOTS ==========
+
+def receive_lot(product, lot_number, quantity, expiry_date=None, location=None, user=None, reason='',
+                received_at=None):
+    """Entrée d'un lot sur un emplacement (par défaut : DEFAULT_LOCATION) ; une nouvelle réception
+    d'un lot déjà présent l'augmente. ValueError si le numéro est vide ou la quantité non positive"""
+    lot_number = (lot_number or '').strip()
+    if not lot_number:
+        raise ValueError("Le numéro de lot est obligatoire")
+    if quantity <= 0:
+        raise ValueError("La quantité reçue doit être positive")
+    location = location or default_location()
+    with transaction.atomic():
+        _lock_product(product)
+        balance = _lock_balance(product, location)
+        movement = _post(
+            product, balance, 'in', quantity, quantity,
+            reason=(reason or f'Réception lot {lot_number}')[:100], user=user,
+        )
+        movement.lot = _add_to_lot(product, location, lot_number, quantity, received_at, expiry_date)
+        return movement
+
+
+def allocate_lines(items, user=None):
+    """Sortie de stock de lignes de commande en une seule transaction, avec affectation des lots.
+
+    Chaque ligne est prélevée comme par `issue` (emplacement d'expédition, puis les autres par code).
+    Les produits sont verrouillés par identifiant croissant et leurs soldes lus en une requête ; les
+    lots de chaque emplacement sont consommés une fois pour toutes les lignes (FEFO) puis répartis
+    entre elles dans l'ordre des lignes. Mouvements, affectations et soldes sont écrits en masse.
+    Les lignes doivent avoir leur commande chargée (`item.order`). ValueError si le stock d'un produit
+    ne couvre pas ses lignes : rien n'est écrit. Retourne les mouvements créés.
+    """
+    items = [item for item in items if item.quantity > 0]
+    demand = defaultdict(int)
+    for item in items:
+        demand[item.product_id] += item.quantity
+    if not demand:
+        return []
+
+    with transaction.atomic():
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update().filter(pk__in=demand).order_by('pk')
+        }
+        for product_id, quantity in demand.items():
+            if products[product_id].current_stock < quantity:
+                raise ValueError(f"Stock insuffisant pour {products[product_id].reference}")
+        balances = defaultdict(list)
+        for balance in StockBalance.objects.select_for_update().select_related('location').filter(
+            product_id__in=demand, quantity__gt=0,
+        ).order_by('product_id', *SHIPPING_FIRST):
+            balances[balance.product_id].append(balance)
+
+        # Répartition des lignes sur les soldes : (ligne, solde, quantité)
+        legs = []
+        taken = defaultdict(int)
+        for item in items:
+            needed = item.quantity
+            for balance in balances[item.product_id]:
+                quantity = min(balance.quantity - taken[balance.pk], needed)
+                if quantity > 0:
+                    legs.append((item, balance, quantity))
+                    taken[balance.pk] += quantity
+                    needed -= quantity
+            if needed:
+                raise ValueError(f"Stock par emplacement insuffisant pour {products[item.product_id].reference}")
+
+        touched = {balance.pk: balance for _, balance, _ in legs}
+        lots = {
+            pk: deque(_consume_lots(balance.product_id, balance.location_id, taken[pk]))
+            for pk, balance in touched.items()
+        }
+        movements, allocations = [], []
+        for item, balance, quantity in legs:
+            movements.append(StockMovement(
+                product=products[item.product_id],
+                location=balance.location,
+                movement_type='out',
+                quantity=quantity,
+                delta=-quantity,
+                reason=f'Commande {item.order.order_number}'[:100],
+                user=user,
+                customer_id=item.order.customer_id,
+            ))
+            queue = lots[balance.pk]
+            while quantity and queue:
+                lot, available = queue[0]
+                used = min(available, quantity)
+                allocations.append(LotAllocation(lot=lot, order_item=item, quantity=used))
+                quantity -= used
+                if used == available:
+                    queue.popleft()
+                else:
+                    queue[0] = (lot, available - used)
+
+        for pk, balance in touched.items():
+            product = products[balance.product_id]
+            was_low = balance.is_low
+            balance.quantity -= taken[pk]
+            product.low_stock_locations += int(balance.is_low) - int(was_low)
+        for product_id, quantity in demand.items():
+            products[product_id].current_stock -= quantity
+
+        StockBalance.objects.bulk_update(touched.values(), ['quantity'])
+        Product.objects.bulk_update(products.values(), ['current_stock', 'low_stock_locations'])
+        movements = StockMovement.objects.bulk_create(movements)
+        LotAllocation.objects.bulk_create(allocations)
+        emit(*[stock_movement_event(movement) for movement in movements])
+        # Écritures en masse : pas de signal post_save
+        transaction.on_commit(lambda: bump_versions('stock', 'product'))
+        return movements
+
+
+def release_lines(items, user=None):
+    """Retour en stock de lignes de commande (annulation) : les quantités servies par des lots
+    retournent dans leurs lots, sur leur emplacement ; le reste va sur l'emplacement par défaut"""
+    items = list(items)
+    with transaction.atomic():
+        allocations = defaultdict(list)
+        for allocation in LotAllocation.objects.select_related('lot__location').filter(order_item__in=items):
+            allocations[allocation.order_item_id].append(allocation)
+        for item in items:
+            fields = {
+                'user': user,
+                'reason': f'Annulation commande {item.order.order_number}',
+                'customer_id': item.order.customer_id,
+            }
+            by_location = defaultdict(list)
+            for allocation in allocations[item.pk]:
+                by_location[allocation.lot.location].append(allocation)
+            returned = 0
+            for location, location_allocations in by_location.items():
+                quantity = sum(allocation.quantity for allocation in location_allocations)
+                record_movement(item.product, 'in', quantity, location=location, **fields)
+                for allocation in location_allocations:
+                    StockLot.objects.filter(pk=allocation.lot_id).update(
+                        remaining=F('remaining') + allocation.quantity,
+                    )
+                returned += quantity
+            if item.quantity > returned:
+                record_movement(item.product, 'in', item.quantity - returned, **fields)
+        LotAllocation.objects.filter(order_item__in=items).delete()
+
+
+def refresh_low_stock_locations(product_ids=None):
+    """Recalcule `Product.low_stock_locations` depuis les soldes (après modification d'un seuil)"""
+    low = StockBalance.objects.filter(
+        product=OuterRef('pk'), min_quantity__gt=0, quantity__lte=F('min_quantity'),
+    ).order_by().values('product').annotate(count=Count('pk')).values('count')
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    return products.update(low_stock_locations=Coalesce(Subquery(low), 0))
+
+
+# ========== RECONSTITUTION DU STOCK ==========
+
+def stock_at(product, at):
+    """Stock d'un produit à la date `at` : dernière photo + mouvements postérieurs"""
+    snapshot = StockSnapshot.objects.filter(
+        product=product, taken_at__lte=at
+    ).order_by('-taken_at').first()
+
+    movements = StockMovement.objects.filter(product=product, created_at__lte=at)
+    base = 0
+    if snapshot:
+        base = snapshot.quantity
+        movements = movements.filter(created_at__gt=snapshot.taken_at)
+
+    return base + (movements.aggregate(total=Sum('delta'))['total'] or 0)
+
+
+def stock_levels_at(at=None):
+    """Stock de tous les produits à la date `at` ({product_id: quantité})"""
+    at = at or timezone.now()
+    taken_at = StockSnapshot.objects.filter(taken_at__lte=at).aggregate(
+        last=Max('taken_at')
+    )['last']
+
+    levels = dict.fromkeys(Product.objects.values_list('id', flat=True), 0)
+    movements = StockMovement.objects.filter(created_at__lte=at)
+    if taken_at:
+        levels.update(StockSnapshot.objects.filter(
+            taken_at=taken_at
+        ).values_list('product_id', 'quantity'))
+        movements = movements.filter(created_at__gt=taken_at)
+
+    for product_id, total in movements.values('product_id').annotate(
+        total=Sum('delta')
+    ).values_list('product_id', 'total'):
+        levels[product_id] = levels.get(product_id, 0) + total
+
+    return levels
+
+
+def take_snapshot(at=None):
+    """Écrit une photo du stock de tous les produits, calculée depuis le journal"""
+    at = at or timezone.now()
+    with transaction.atomic():
+        levels = stock_levels_at(at)
+        StockSnapshot.objects.bulk_create(
+            [StockSnapshot(product_id=pid, quantity=qty, taken_at=at) for pid, qty in levels.items()],
+            batch_size=1000,
+        )
+    return len(levels)
+
+
+def detect_drift():
+    """Compare `current_stock` et la somme des soldes par emplacement au stock reconstitué depuis le journal"""
+    levels = stock_levels_at()
+    balances = dict(StockBalance.objects.values('product_id').annotate(
+        total=Sum('quantity')
+    ).values_list('product_id', 'total'))
+    drifts = []
+    for product_id, reference, current_stock in Product.objects.values_list(
+        'id', 'reference', 'current_stock'
+    ).order_by('reference'):
+        ledger_stock = levels.get(product_id, 0)
+        balance_stock = balances.get(product_id, 0)
+        if ledger_stock != current_stock or balance_stock != ledger_stock:
+            drifts.append({
+                'product_id': product_id,
+                'reference': reference,
+                'current_stock': current_stock,
+                'balance_stock': balance_stock,
+                'ledger_stock': ledger_stock,
+                'drift': current_stock - ledger_stock,
+            })
+    return drifts
+
+
+def _opening_stock(product_ids, at):
+    """Stock non expliqué par le journal ({product_id: quantité}) : dernière photo avant `at` moins les deltas
+    qui la précèdent. Non nul pour les produits antérieurs au journal (ajustement de reprise à delta 0)."""
+    taken_at = StockSnapshot.objects.filter(taken_at__lte=at).aggregate(last=Max('taken_at'))['last']
+    if not taken_at:
+        return {}
+    opening = dict(StockSnapshot.objects.filter(
+        taken_at=taken_at, product_id__in=product_ids,
+    ).values_list('product_id', 'quantity'))
+    for product_id, total in StockMovement.objects.filter(
+        product_id__in=product_ids, created_at__lte=taken_at,
+    ).values('product_id').annotate(total=Sum('delta')).values_list('product_id', 'total'):
+        opening[product_id] = opening.get(product_id, 0) - total
+    return opening
+
+
+def rebuild_balances(product_ids):
+    """Réaligne les soldes par emplacement sur le journal (le journal fait foi).
+
+    Même base que `stock_levels_at` : la somme des soldes d'un produit égale
+    son stock reconstitué à l'instant présent (les mouvements datés dans le
+    futur ne comptent pas encore). Chaque emplacement reçoit la somme de ses deltas ;
+    le stock d'ouverture (`_opening_stock`) revient à l'emplacement par défaut,
+    comme le solde d'ouverture créé par la migration 0016.
+    """
+    at = timezone.now()
+    with transaction.atomic():
+        totals = {
+            (product_id, location_id): total
+            for product_id, location_id, total in StockMovement.objects.filter(
+                product_id__in=product_ids, created_at__lte=at,
+            ).values('product_id', 'location_id').annotate(total=Sum('delta')).values_list(
+                'product_id', 'location_id', 'total'
+            )
+        }
+        location = default_location()
+        for product_id, quantity in _opening_stock(product_ids, at).items():
+            totals[(product_id, location.pk)] = totals.get((product_id, location.pk), 0) + quantity
+
+        StockBalance.objects.filter(product_id__in=product_ids).update(quantity=0)
+        for (product_id, location_id), total in totals.items():
+            StockBalance.objects.update_or_create(
+                product_id=product_id, location_id=location_id, defaults={'quantity': total},
+            )
+        # Les lots ouverts ne peuvent dépasser le solde réaligné : l'excédent est consommé en FEFO
+        quantities = {
+            (product_id, location_id): quantity
+            for product_id, location_id, quantity in StockBalance.objects.filter(
+                product_id__in=product_ids
+            ).values_list('product_id', 'location_id', 'quantity')
+        }
+        for product_id, location_id, total in StockLot.objects.filter(
+            product_id__in=product_ids, remaining__gt=0
+        ).values('product_id', 'location_id').annotate(total=Sum('remaining')).values_list(
+            'product_id', 'location_id', 'total'
+        ):
+            excess = total - max(quantities.get((product_id, location_id), 0), 0)
+            if excess > 0:
+                _consume_lots(product_id, location_id, excess)
+        refresh_low_stock_locations(product_ids)
@@ -0,0 +1,302 @@
+"""
+Test de charge HTTP des parcours principaux.
+
+Les parcours (tableau de bord, création de commande, changements de statut,
+ajustement de stock, facture PDF, analyses du copilot, scrutation des
+notifications) sont décrits une seule fois dans `TASKS` et joués :
+
+- par `locustfile.py` (à la racine du projet) si Locust est installé ;
+- sinon par le client asyncio de ce module (`manage.py loadtest`), qui
+  n'utilise que la bibliothèque standard.
+
+Chaque utilisateur virtuel se connecte avec un compte `seed_<rôle>` créé par
+`seed_scale` et n'exécute que les tâches autorisées pour son rôle. Les
+mesures (p50/p95/p99, débit, erreurs) sont écrites dans un fichier JSON aux
+clés triées, que l'on peut comparer d'une exécution à l'autre.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from itertools import accumulate
+from urllib.parse import urlencode, urlsplit
+
+from .seeding import PREFIX, ROLES
+
+LOGIN_PATH = '/accounts/login/'
+SAMPLE_SIZE = 500
+NEXT_STATUSES = ['confirmed', 'in_production', 'shipped', 'delivered']
+COPILOT_ANALYSES = ['overview', 'stock', 'production', 'financial', 'optimization']
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    method: str
+    path: str
+    weight: int
+    roles: tuple = tuple(ROLES)
+    data: object = None  # fonction (targets, rng) -> dict des champs du formulaire
+
+
+def _order_form(targets, rng):
+    products = rng.sample(targets['products'], k=min(3, len(targets['products'])))
+    return {
+        'customer': rng.choice(targets['customers']),
+        'delivery_date': (date.today() + timedelta(days=rng.randint(7, 60))).isoformat(),
+        'status': 'draft',
+        'products': [product_id for product_id, _ in products],
+        'quantities': [rng.randint(1, 5) for _ in products],
+        'prices': [price for _, price in products],
+    }
+
+
+def _status_form(targets, rng):
+    return {'status': rng.choice(NEXT_STATUSES)}
+
+
+def _stock_form(targets, rng):
+    return {'movement_type': 'in', 'quantity': rng.randint(1, 20), 'reason': 'Test de charge'}
+
+
+TASKS = [
+    Task('dashboard', 'GET', '/dashboard/', 10),
+    Task('notifications_poll', 'GET', '/notifications/unread-count/', 20),
+    Task('order_list', 'GET', '/orders/', 5),
+    Task('order_detail', 'GET', '/orders/{order}/', 5),
+    Task('invoice_pdf', 'GET', '/order/{order}/invoice/pdf/', 2),
+    Task('copilot_analyze', 'GET', '/copilot/analyze/?analysis_type={analysis}', 3),
+    Task('order_create', 'POST', '/orders/new/', 2, ('admin', 'manager', 'supervisor'), _order_form),
+    Task('order_status', 'POST', '/orders/{order}/update-status/', 2, ('admin', 'manager', 'supervisor'), _status_form),
+    Task('stock_adjust', 'POST', '/products/{product}/adjust-stock/', 2, ('admin', 'manager'), _stock_form),
+]
+
+
+def load_targets(prefix=PREFIX, sample=SAMPLE_SIZE, seed=42):
+    """Identifiants visés par les tâches, tirés parmi les données de `seed_scale` (accès ORM)"""
+    from .models import Customer, Order, Product
+
+    rng = random.Random(seed)
+
+    def pick(values):
+        values = list(values)
+        return rng.sample(values, k=min(sample, len(values)))
+
+    targets = {
+        'orders': pick(Order.objects.filter(
+            order_number__startswith=f'{prefix}-'
+        ).values_list('id', flat=True)),
+        'products': [(pk, str(price)) for pk, price in pick(Product.objects.filter(
+            reference__startswith=f'{prefix}-', is_active=True
+        ).values_list('id', 'price'))],
+        'customers': pick(Customer.objects.filter(
+            email__endswith=f'@{prefix.lower()}.example.com'
+        ).values_list('id', flat=True)),
+    }
+    empty = [key for key, values in targets.items() if not values]
+    if empty:
+        raise ValueError(f"Aucune donnée {prefix} pour : {', '.join(empty)} (lancer seed_scale)")
+    return targets
+
+
+def tasks_for_role(role):
+    tasks = [task for task in TASKS if role in task.roles]
+    return tasks, list(accumulate(task.weight for task in tasks))
+
+
+def build_request(task, targets, rng):
+    """Chemin et formulaire d'une exécution de la tâche"""
+    path = task.path.format(
+        order=rng.choice(targets['orders']),
+        product=rng.choice(targets['products'])[0],
+        analysis=rng.choice(COPILOT_ANALYSES),
+    )
+    return path, (task.data(targets, rng) if task.data else None)
+
+
+def percentile(sorted_values, fraction):
+    """Percentile au rang le plus proche d'une liste triée"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies, failures, duration):
+    """Statistiques d'un point d'accès : latences en millisecondes, débit en requêtes/s"""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        'requests': count,
+        'failures': failures,
+        'throughput_rps': round(count / duration, 2) if duration else None,
+        'mean_ms': round(sum(values) / count, 2) if count else None,
+        'p50_ms': percentile(values, 0.50),
+        'p95_ms': percentile(values, 0.95),
+        'p99_ms': percentile(values, 0.99),
+        'max_ms': values[-1] if values else None,
+    }
+
+
+def write_report(path, meta, endpoints):
+    """Artefact JSON : mêmes clés pour Locust et le client asyncio, triées pour être comparées"""
+    report = {'meta': meta, 'endpoints': endpoints}
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2, sort_keys=True, default=str)
+        fh.write('\n')
+    return report
+
+
+# ---------- Client asyncio (bibliothèque standard uniquement) ----------
+
+class HttpError(Exception):
+    pass
+
+
+class Session:
+    """Session HTTP/1.1 minimale : une connexion par requête, cookies et ETag conservés.
+
+    Comme un navigateur, les GET renvoient le dernier ETag reçu pour l'URL
+    (`If-None-Match`) ; un 304 compte comme un succès.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http':
+            raise ValueError("Seul http:// est pris en charge par le client asyncio")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.etags = {}
+
+    async def request(self, method, path, data=None, headers=None):
+        body = urlencode(data or {}, doseq=True).encode() if method == 'POST' else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: close',
+            'User-Agent: erp-copilot-loadtest',
+        ]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if method == 'POST':
+            lines += [
+                'Content-Type: application/x-www-form-urlencoded',
+                f'Content-Length: {len(body)}',
+                f"X-CSRFToken: {self.cookies.get('csrftoken', '')}",
+            ]
+        if method == 'GET' and path in self.etags:
+            lines.append(f'If-None-Match: {self.etags[path]}')
+        for name, value in (headers or {}).items():
+            lines.append(f'{name}: {value}')
+
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+
+        head, _, payload = raw.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HttpError(f"Réponse invalide : {status_line!r}")
+
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            if name == 'set-cookie':
+                for key, morsel in SimpleCookie(value.strip()).items():
+                    self.cookies[key] = morsel.value
+            else:
+                response_headers[name] = value.strip()
+        if method == 'GET' and status == 200 and 'etag' in response_headers:
+            self.etags[path] = response_headers['etag']
+        if response_headers.get('transfer-encoding') == 'chunked':
+            payload = _dechunk(payload)
+        return status, response_headers, payload
+
+    async def login(self, username, password):
+        await self.request('GET', LOGIN_PATH)
+        status, headers, _ = await self.request('POST', LOGIN_PATH, {
+            'username': username, 'password': password,
+            'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''),
+        })
+        if status != 302 or 'sessionid' not in self.cookies:
+            raise HttpError(f"Connexion refusée pour {username} (HTTP {status})")
+
+
+def _dechunk(payload):
+    body = b''
+    while payload:
+        size_line, _, rest = payload.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if not size:
+            break
+        body += rest[:size]
+        payload = rest[size + 2:]
+    return body
+
+
+async def _virtual_user(base_url, role, username, password, targets, rng, deadline, think_time, timeout, records):
+    session = Session(base_url, timeout=timeout)
+    await session.login(username, password)
+    tasks, cum_weights = tasks_for_role(role)
+
+    while time.monotonic() < deadline:
+        task = rng.choices(tasks, cum_weights=cum_weights)[0]
+        path, data = build_request(task, targets, rng)
+        started = time.perf_counter()
+        try:
+            status, _, _ = await session.request(task.method, path, data)
+            ok = status < 400
+        except (OSError, asyncio.TimeoutError, HttpError):
+            ok = False
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        latencies, failures = records.setdefault(task.name, ([], [0]))
+        latencies.append(elapsed_ms)
+        if not ok:
+            failures[0] += 1
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+
+
+async def run_async(base_url, targets, users=10, duration=60, think_time=0.5, timeout=30,
+                    password='password123', prefix=PREFIX, seed=42):
+    """Joue les parcours avec `users` utilisateurs virtuels pendant `duration` secondes.
+
+    `targets` vient de `load_targets`, appelé hors de la boucle asyncio (accès ORM).
+    """
+    records = {}
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+
+    await asyncio.gather(*(
+        _virtual_user(
+            base_url, role, f'{prefix.lower()}_{role}', password, targets,
+            random.Random(seed + i), deadline, think_time, timeout, records,
+        )
+        for i, role in ((i, ROLES[i % len(ROLES)]) for i in range(users))
+    ))
+    elapsed = time.monotonic() - started
+
+    endpoints = {
+        name: summarize(latencies, failures[0], elapsed)
+        for name, (latencies, failures) in sorted(records.items())
+    }
+    endpoints['total'] = summarize(
+        [value for latencies, _ in records.values() for value in latencies],
+        sum(failures[0] for _, failures in records.values()),
+        elapsed,
+    )
+    return endpoints, elapsed
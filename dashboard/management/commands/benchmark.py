@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Lance un banc d'essai de performance et affiche les mesures en JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?', help="Nom du banc d'essai (vide = liste)")
+        parser.add_argument(
+            '--param', action='append', default=[], metavar='CLE=VALEUR',
+            help="Paramètre entier du banc d'essai (ex. --param products=10000)",
+        )
+
+    def handle(self, *args, **options):
+        name = options['name']
+        if not name:
+            for bench_name, func in sorted(BENCHMARKS.items()):
+                self.stdout.write(f"{bench_name}: {(func.__doc__ or '').strip()}")
+            return
+
+        if name not in BENCHMARKS:
+            raise CommandError(f"Banc d'essai inconnu : {name} (disponibles : {', '.join(sorted(BENCHMARKS))})")
+
+        params = {}
+        for param in options['param']:
+            key, _, value = param.partition('=')
+            try:
+                params[key] = int(value)
+            except ValueError:
+                raise CommandError(f"Paramètre invalide : {param}")
+
+        results = BENCHMARKS[name](**params)
+        self.stdout.write(json.dumps({'benchmark': name, **results}, indent=2, default=str))
+
+        # Un banc peut signaler des dépassements de budget : la commande échoue alors (utile en CI)
+        if results.get('failures'):
+            raise CommandError(f"{len(results['failures'])} dépassement(s) de budget")
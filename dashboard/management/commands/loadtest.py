@@ -0,0 +1,66 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.loadtest import TASKS, load_targets, run_async, write_report
+from dashboard.seeding import PREFIX
+
+
+class Command(BaseCommand):
+    help = ("Test de charge des parcours principaux contre un serveur local (client asyncio, "
+            "sans dépendance ; voir locustfile.py pour Locust)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='http://127.0.0.1:8000', help="URL du serveur testé")
+        parser.add_argument('--users', type=int, default=10, help="Utilisateurs virtuels simultanés")
+        parser.add_argument('--duration', type=float, default=60, help="Durée du test (secondes)")
+        parser.add_argument('--think-time', type=float, default=0.5,
+                            help="Pause moyenne entre deux requêtes d'un utilisateur (secondes)")
+        parser.add_argument('--timeout', type=float, default=30,
+                            help="Délai maximal d'une requête, compté comme erreur (secondes)")
+        parser.add_argument('--password', default='password123', help="Mot de passe des comptes seed_<rôle>")
+        parser.add_argument('--prefix', default=PREFIX, help="Préfixe des données générées par seed_scale")
+        parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (rejouabilité)")
+        parser.add_argument('--output', default='loadtest-results.json', help="Fichier JSON des résultats")
+
+    def handle(self, *args, **options):
+        try:
+            targets = load_targets(prefix=options['prefix'], seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started_at = timezone.now()
+        self.stdout.write(
+            f"{options['users']} utilisateurs pendant {options['duration']:g} s sur {options['host']}..."
+        )
+        try:
+            endpoints, elapsed = asyncio.run(run_async(
+                options['host'], targets,
+                users=options['users'], duration=options['duration'], think_time=options['think_time'],
+                timeout=options['timeout'],
+                password=options['password'], prefix=options['prefix'], seed=options['seed'],
+            ))
+        except OSError as e:
+            raise CommandError(f"Serveur injoignable : {e}")
+
+        meta = {
+            'tool': 'asyncio',
+            'host': options['host'],
+            'users': options['users'],
+            'duration_s': round(elapsed, 2),
+            'think_time_s': options['think_time'],
+            'timeout_s': options['timeout'],
+            'seed': options['seed'],
+            'started_at': started_at.isoformat(),
+            'tasks': {task.name: task.weight for task in TASKS},
+        }
+        write_report(options['output'], meta, endpoints)
+
+        for name, stats in endpoints.items():
+            self.stdout.write(
+                f"{name:<20} {stats['requests']:>7} req  {stats['throughput_rps'] or 0:>8} req/s  "
+                f"p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  "
+                f"erreurs {stats['failures']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from dashboard import reservations
+from dashboard.ledger import detect_drift, rebuild_balances
+from dashboard.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Détecte les écarts entre Product.current_stock, les soldes par emplacement "
+        "et le stock reconstitué depuis le journal, et entre Product.reserved et les réservations"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help="Aligne current_stock et les soldes par emplacement sur le journal (le journal fait foi) "
+                 "et recalcule Product.reserved depuis les réservations",
+        )
+
+    def handle(self, *args, **options):
+        self.reconcile_ledger(options['fix'])
+        self.reconcile_reservations(options['fix'])
+
+    def reconcile_ledger(self, fix):
+        drifts = detect_drift()
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS(
+                "Aucun écart : current_stock et les soldes par emplacement sont cohérents avec le journal"
+            ))
+            return
+
+        for drift in drifts:
+            self.stdout.write(
+                f"{drift['reference']}: current_stock={drift['current_stock']} "
+                f"emplacements={drift['balance_stock']} journal={drift['ledger_stock']} (écart {drift['drift']:+d})"
+            )
+
+        if fix:
+            with transaction.atomic():
+                for drift in drifts:
+                    Product.objects.filter(pk=drift['product_id']).update(current_stock=drift['ledger_stock'])
+                rebuild_balances([drift['product_id'] for drift in drifts])
+            self.stdout.write(self.style.SUCCESS(f"{len(drifts)} produit(s) réalignés sur le journal"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drifts)} écart(s) détecté(s) - relancer avec --fix pour corriger"))
+
+    def reconcile_reservations(self, fix):
+        drifts = reservations.detect_drift()
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS("Aucun écart : Product.reserved est cohérent avec les réservations"))
+            return
+
+        for drift in drifts:
+            self.stdout.write(
+                f"{drift['reference']}: reserved={drift['reserved']} réservations={drift['reservations_total']}"
+            )
+
+        if fix:
+            reservations.rebuild([drift['id'] for drift in drifts])
+            self.stdout.write(self.style.SUCCESS(f"{len(drifts)} compteur(s) de réservation recalculés"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(drifts)} écart(s) de réservation détecté(s) - relancer avec --fix pour corriger"
+            ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.inventory_analytics import WINDOW_DAYS, refresh_inventory_metrics
+
+
+class Command(BaseCommand):
+    help = "Recalcule les indicateurs de stock (rotation, couverture, stock dormant, ABC) - à planifier chaque nuit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, default=WINDOW_DAYS, help="Période analysée en jours")
+
+    def handle(self, *args, **options):
+        count = refresh_inventory_metrics(window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f"Indicateurs de stock recalculés pour {count} produit(s)"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.analysis_scheduler import ANALYSES, refresh_due_analyses
+
+
+class Command(BaseCommand):
+    help = "Recalcule les analyses IA périmées (stock, production, alertes...) - à planifier toutes les quelques minutes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('analysis_types', nargs='*', help=f"Types à recalculer parmi : {', '.join(ANALYSES)}")
+        parser.add_argument('--force', action='store_true', help="Recalculer même les analyses encore fraîches")
+
+    def handle(self, *args, **options):
+        unknown = set(options['analysis_types']) - set(ANALYSES)
+        if unknown:
+            raise CommandError(f"Type(s) d'analyse inconnu(s) : {', '.join(sorted(unknown))}")
+
+        refreshed = refresh_due_analyses(options['analysis_types'], force=options['force'])
+        for analysis in refreshed:
+            self.stdout.write(f"{analysis.analysis_type}: {analysis.duration_ms} ms")
+        self.stdout.write(self.style.SUCCESS(f"{len(refreshed)} analyse(s) recalculée(s)"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import outbox
+
+
+class Command(BaseCommand):
+    help = "Livre les événements de l'outbox aux puits configurés (settings.OUTBOX['SINKS'])"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE, help="Événements par lot")
+        parser.add_argument('--poll-interval', type=float, default=outbox.POLL_INTERVAL, help="Attente quand rien n'est à livrer (s)")
+        parser.add_argument('--burst', action='store_true', help="S'arrêter dès que rien n'est livrable")
+        parser.add_argument('--retry-failed', action='store_true', help="Remettre à livrer les événements en échec")
+
+    def handle(self, *args, **options):
+        sinks = outbox.get_sinks()
+        if not sinks:
+            raise CommandError(
+                "Aucun puits configuré dans settings.OUTBOX['SINKS'] : les événements restent en attente"
+            )
+        if options['retry_failed']:
+            self.stdout.write(f"{outbox.retry_failed()} événement(s) en échec remis à livrer")
+
+        self.stdout.write(f"Puits : {', '.join(sinks)}")
+        try:
+            delivered = outbox.dispatch(
+                sinks=sinks, poll_interval=options['poll_interval'], burst=options['burst'],
+                batch_size=max(options['batch_size'], 1),
+            )
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé")
+            return
+        self.stdout.write(self.style.SUCCESS(f"{delivered} événement(s) livré(s)"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.bom import HORIZON_DAYS, run_mrp
+from dashboard.models import Product
+
+
+class Command(BaseCommand):
+    help = "Calcule les besoins nets sur nomenclature (MRP) et affiche les ordres planifiés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=HORIZON_DAYS, help="Horizon de planification en jours")
+        parser.add_argument('--no-safety-stock', action='store_true', help="Ignorer min_stock (stock de sécurité)")
+        parser.add_argument('--limit', type=int, default=20, help="Nombre d'ordres planifiés affichés")
+
+    def handle(self, *args, **options):
+        if options['horizon'] < 1:
+            raise CommandError("L'horizon doit être d'au moins un jour")
+        try:
+            result = run_mrp(horizon_days=options['horizon'], use_safety_stock=not options['no_safety_stock'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        planned = result.planned_orders()
+        references = dict(Product.objects.filter(
+            id__in={order.product_id for order in planned[:options['limit']]}
+        ).values_list('id', 'reference'))
+        for order in planned[:options['limit']]:
+            kind = 'Fabriquer' if order.kind == 'make' else 'Acheter'
+            self.stdout.write(
+                f"{order.release_date:%d/%m/%Y}  {kind:<9} {order.quantity:>7} x {references[order.product_id]}"
+                f"  (besoin le {order.due_date:%d/%m/%Y})"
+            )
+        makes = sum(order.kind == 'make' for order in planned)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(planned)} ordre(s) planifié(s) sur {options['horizon']} jours : "
+            f"{makes} de fabrication, {len(planned) - makes} d'achat, {len(result.shortages())} produit(s) concerné(s)"
+        ))
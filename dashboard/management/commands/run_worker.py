@@ -0,0 +1,56 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dashboard import jobs
+
+
+def _worker_process(index, stop_event, poll_interval, burst):
+    """Point d'entrée d'un processus worker (compatible fork et spawn)"""
+    import django
+    django.setup()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # L'arrêt passe par stop_event
+    jobs.work(stop_event=stop_event, poll_interval=poll_interval, burst=burst, index=index)
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches de fond en file (rapports, analyses lourdes du copilot)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=jobs.CONCURRENCY, help="Nombre de processus worker")
+        parser.add_argument('--poll-interval', type=float, default=jobs.POLL_INTERVAL, help="Attente quand la file est vide (s)")
+        parser.add_argument('--burst', action='store_true', help="S'arrêter dès que la file est vide")
+
+    def handle(self, *args, **options):
+        # Reprise des tâches abandonnées et purge : faites périodiquement par chaque worker (jobs.work)
+        concurrency = max(options['concurrency'], 1)
+        if concurrency == 1:
+            done = jobs.work(poll_interval=options['poll_interval'], burst=options['burst'])
+            self.stdout.write(self.style.SUCCESS(f"{done} tâche(s) exécutée(s)"))
+            return
+
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        stop_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_process, name=f'worker-{index}',
+                args=(index, stop_event, options['poll_interval'], options['burst']),
+            )
+            for index in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"{concurrency} worker(s) démarré(s)")
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Arrêt demandé, fin des tâches en cours...")
+            stop_event.set()
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Workers arrêtés"))
@@ -0,0 +1,52 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dashboard.data_versions import bump_versions
+from dashboard.ledger import take_snapshot
+from dashboard.seeding import BATCH_SIZE, DEFAULT_VOLUMES, PREFIX, clear_seeded_data, seed_scale
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données synthétique à l'échelle de la production (déterministe par graine)"
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f"Volume (défaut : {default})")
+        parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire")
+        parser.add_argument('--end-date', help="Dernier jour de l'historique (AAAA-MM-JJ, défaut : aujourd'hui)")
+        parser.add_argument('--password', default='password123', help="Mot de passe des utilisateurs seed_<rôle>")
+        parser.add_argument('--prefix', default=PREFIX, help="Préfixe des références générées")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--clear', action='store_true', help="Supprimer d'abord les données générées avec ce préfixe")
+
+    def handle(self, *args, **options):
+        end = None
+        if options['end_date']:
+            try:
+                end = date.fromisoformat(options['end_date'])
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['end_date']}")
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                clear_seeded_data(options['prefix'])
+            counts = seed_scale(
+                **{name: options[name] for name in DEFAULT_VOLUMES},
+                seed=options['seed'], end=end, password=options['password'],
+                prefix=options['prefix'], batch_size=options['batch_size'],
+                log=lambda message: self.stdout.write(f"  {message}"),
+            )
+            take_snapshot()
+            # Insertions en masse, sans signal : invalider les fragments en cache
+            transaction.on_commit(bump_versions)
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Données générées en {elapsed:.1f} s : {summary}"))
+        self.stdout.write(
+            "Pensez à lancer refresh_inventory_metrics et run_analyses --force pour les indicateurs dérivés"
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Enregistre une photo du stock de tous les produits (à planifier périodiquement, ex. chaque nuit)"
+
+    def handle(self, *args, **options):
+        count = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Photo de stock enregistrée pour {count} produit(s)"))
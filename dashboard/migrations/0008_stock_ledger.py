@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+
+def backfill_ledger(apps, schema_editor):
+    """Renseigne `delta` pour l'historique et ouvre le journal avec une photo du stock actuel"""
+    StockMovement = apps.get_model('dashboard', 'StockMovement')
+    StockSnapshot = apps.get_model('dashboard', 'StockSnapshot')
+    Product = apps.get_model('dashboard', 'Product')
+
+    # Les ajustements historiques ne conservent pas le niveau précédent : delta inconnu (0)
+    StockMovement.objects.update(delta=Case(
+        When(movement_type='in', then=F('quantity')),
+        When(movement_type='out', then=-F('quantity')),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product_id, quantity=current_stock, taken_at=now)
+        for product_id, current_stock in Product.objects.values_list('id', 'current_stock')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_stockmovement_customer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('taken_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='delta',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='role',
+            field=models.CharField(choices=[('admin', 'Administrateur'), ('manager', 'Manager'), ('supervisor', 'Superviseur'), ('operator', 'Opérateur')], default='operator', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_stock_movements', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['product', 'created_at'], name='dashboard_s_product_bc3b3d_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='dashboard.product'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['product', 'taken_at'], name='dashboard_s_product_442370_idx'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
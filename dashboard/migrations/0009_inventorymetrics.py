@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units_out', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('average_stock', models.FloatField(default=0)),
+                ('turnover', models.FloatField(blank=True, null=True)),
+                ('days_of_coverage', models.FloatField(blank=True, null=True)),
+                ('last_out_at', models.DateTimeField(blank=True, null=True)),
+                ('is_dead_stock', models.BooleanField(db_index=True, default=False)),
+                ('abc_class', models.CharField(choices=[('A', 'A - Forte valeur'), ('B', 'B - Valeur moyenne'), ('C', 'C - Faible valeur')], db_index=True, default='C', max_length=1)),
+                ('refreshed_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_metrics', to='dashboard.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:07
+
+import hashlib
+import json
+import zlib
+
+import django.db.models.deletion
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+
+
+def compact_contexts(apps, schema_editor):
+    """Déplace le contexte JSON de chaque conversation vers un snapshot dédupliqué"""
+    AIConversation = apps.get_model('dashboard', 'AIConversation')
+    ContextSnapshot = apps.get_model('dashboard', 'ContextSnapshot')
+
+    known = set(ContextSnapshot.objects.values_list('hash', flat=True))
+    batch = []
+    for conversation in AIConversation.objects.only('id', 'context').iterator(chunk_size=1000):
+        payload = json.dumps(
+            conversation.context or {}, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')
+        digest = hashlib.sha256(payload).hexdigest()
+        if digest not in known:
+            ContextSnapshot.objects.create(hash=digest, data=zlib.compress(payload, 9), raw_size=len(payload))
+            known.add(digest)
+        conversation.context_snapshot_id = digest
+        batch.append(conversation)
+        if len(batch) >= 1000:
+            AIConversation.objects.bulk_update(batch, ['context_snapshot'])
+            batch = []
+    if batch:
+        AIConversation.objects.bulk_update(batch, ['context_snapshot'])
+
+
+def expand_contexts(apps, schema_editor):
+    """Retour arrière : recopie le contexte du snapshot dans chaque conversation"""
+    AIConversation = apps.get_model('dashboard', 'AIConversation')
+    ContextSnapshot = apps.get_model('dashboard', 'ContextSnapshot')
+
+    contexts = {
+        snapshot.hash: json.loads(zlib.decompress(bytes(snapshot.data)))
+        for snapshot in ContextSnapshot.objects.all()
+    }
+    for conversation in AIConversation.objects.exclude(context_snapshot=None).iterator(chunk_size=1000):
+        conversation.context = contexts[conversation.context_snapshot_id]
+        conversation.save(update_fields=['context'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_inventorymetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContextSnapshot',
+            fields=[
+                ('hash', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('data', models.BinaryField()),
+                ('raw_size', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='aiconversation',
+            name='context_snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='conversations', to='dashboard.contextsnapshot'),
+        ),
+        migrations.RunPython(compact_contexts, expand_contexts),
+        migrations.RemoveField(
+            model_name='aiconversation',
+            name='context',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_compact_conversation_context'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aianalysis',
+            name='data',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AddField(
+            model_name='aianalysis',
+            name='duration_ms',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='aianalysis',
+            name='valid_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='aianalysis',
+            name='analysis_type',
+            field=models.CharField(choices=[('stock', 'Analyse Stock'), ('production', 'Analyse Production'), ('sales', 'Analyse Ventes'), ('efficiency', 'Analyse Efficacité'), ('alerts', 'Analyse Alertes'), ('financial', 'Analyse Financière'), ('optimization', "Opportunités d'optimisation"), ('overview', "Vue d'ensemble")], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='aianalysis',
+            index=models.Index(fields=['analysis_type', 'is_active', '-created_at'], name='dashboard_a_analysi_8af4ab_idx'),
+        ),
+    ]
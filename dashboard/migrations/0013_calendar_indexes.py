@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['delivery_date', 'status'], name='dashboard_o_deliver_08a139_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planningevent',
+            index=models.Index(fields=['start_date', 'end_date'], name='dashboard_p_start_d_f5a4d6_idx'),
+        ),
+    ]
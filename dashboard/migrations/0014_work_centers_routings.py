@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_calendar_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkCenter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('capacity_minutes_per_day', models.PositiveIntegerField(default=480)),
+                ('efficiency', models.DecimalField(decimal_places=2, default=1, max_digits=4)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoutingStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('operation', models.CharField(max_length=100)),
+                ('setup_minutes', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('run_minutes', models.DecimalField(decimal_places=3, help_text='Temps opératoire par unité', max_digits=8)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routing_steps', to='dashboard.product')),
+                ('work_centers', models.ManyToManyField(related_name='routing_steps', to='dashboard.workcenter')),
+            ],
+            options={
+                'ordering': ['product', 'sequence'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'sequence'), name='unique_routing_step_sequence')],
+            },
+        ),
+    ]
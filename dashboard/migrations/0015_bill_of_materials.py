@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_work_centers_routings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BOMLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity_per', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('component', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='used_in', to='dashboard.product')),
+                ('parent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bom_lines', to='dashboard.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('parent', 'component'), name='unique_bom_line'), models.CheckConstraint(condition=models.Q(('parent', models.F('component')), _negated=True), name='bom_line_not_self')],
+            },
+        ),
+    ]
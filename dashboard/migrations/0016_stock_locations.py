@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_locations(apps, schema_editor):
+    """Rattache l'historique à l'emplacement par défaut et y ouvre un solde égal au stock actuel"""
+    StockLocation = apps.get_model('dashboard', 'StockLocation')
+    StockBalance = apps.get_model('dashboard', 'StockBalance')
+    StockMovement = apps.get_model('dashboard', 'StockMovement')
+    Product = apps.get_model('dashboard', 'Product')
+
+    location, _ = StockLocation.objects.get_or_create(
+        code=getattr(settings, 'STOCK_DEFAULT_LOCATION', 'MAIN'), defaults={'name': 'Entrepôt principal'},
+    )
+    StockMovement.objects.update(location=location)
+    StockBalance.objects.bulk_create([
+        StockBalance(product_id=product_id, location=location, quantity=current_stock)
+        for product_id, current_stock in Product.objects.values_list('id', 'current_stock')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_bill_of_materials'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('warehouse', 'Entrepôt'), ('line_side', 'Bord de ligne')], default='warehouse', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['code'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock_locations',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='transfer_source',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transfer_destination', to='dashboard.stockmovement'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('in', 'Entrée'), ('out', 'Sortie'), ('adjustment', 'Ajustement'), ('transfer', 'Transfert')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='dashboard.stocklocation'),
+        ),
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0)),
+                ('min_quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='dashboard.product')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='dashboard.stocklocation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['location', 'product'], name='dashboard_s_locatio_455dee_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'location'), name='unique_stock_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_locations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='dashboard.stocklocation'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_stock_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_number', models.CharField(max_length=50)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('quantity', models.IntegerField()),
+                ('remaining', models.IntegerField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lots', to='dashboard.stocklocation')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='dashboard.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LotAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lot_allocations', to='dashboard.orderitem')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='dashboard.stocklot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('remaining__gt', 0)), fields=['product', 'location', 'expiry_date', 'received_at', 'id'], name='stock_lot_open_fefo'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklot',
+            constraint=models.UniqueConstraint(fields=('product', 'location', 'lot_number'), name='unique_stock_lot'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklot',
+            constraint=models.CheckConstraint(condition=models.Q(('remaining__gte', 0)), name='stock_lot_remaining_gte_0'),
+        ),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+import hashlib
+import json
+import zlib
+
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
-from django.db.models import Sum
+from django.db.models import F, Q
+from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from datetime import timedelta
@@ -35,7 +41,12 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     min_stock = models.IntegerField(default=5)
     max_stock = models.IntegerField(default=100)
-    current_stock = models.IntegerField(default=0)
+    current_stock = models.IntegerField(default=0)  # Total de tous les emplacements (somme des StockBalance)
+    # Nombre d'emplacements sous leur seuil, maintenu par le journal (ledger.py) comme current_stock
+    low_stock_locations = models.IntegerField(default=0)
+    # Quantité des lignes de commandes ouvertes dont le stock n'est pas encore sorti,
+    # somme des StockReservation (maintenue par reservations.py)
+    reserved = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -43,20 +54,17 @@ class Product(models.Model):
     
     @property
     def is_low_stock(self):
-        return self.current_stock <= self.min_stock
+        return self.current_stock <= self.min_stock or self.low_stock_locations > 0
     
     @property
     def reserved_quantity(self):
-        """Quantité réservée dans les commandes actives"""
-        return OrderItem.objects.filter(
-            product=self,
-            order__status__in=['confirmed', 'in_production']
-        ).aggregate(total=Sum('quantity'))['total'] or 0
+        """Quantité réservée dans les commandes actives (compteur maintenu, sans agrégation)"""
+        return self.reserved
     
     @property
     def available_stock(self):
         """Stock disponible (stock actuel - réservé)"""
-        return self.current_stock - self.reserved_quantity
+        return self.current_stock - self.reserved
     
     def can_fulfill_order(self, quantity):
         """Vérifie si le stock peut satisfaire une commande"""
@@ -64,7 +72,7 @@ class Product(models.Model):
     
     def needs_reorder(self):
         """CORRECTION: Added this method that was being called but didn't exist"""
-        return self.current_stock <= self.min_stock
+        return self.is_low_stock
     
     is_active = models.BooleanField(default=True)
     archived_at = models.DateTimeField(null=True, blank=True)
@@ -81,6 +89,9 @@ class Product(models.Model):
         self.archived_at = None
         self.save()
 
+# Produits en stock faible : total sous le stock minimum ou au moins un emplacement sous son seuil
+LOW_STOCK = Q(current_stock__lte=F('min_stock')) | Q(low_stock_locations__gt=0)
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Brouillon'),
@@ -98,6 +109,12 @@ class Order(models.Model):
     delivery_date = models.DateField()
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
+    class Meta:
+        indexes = [
+            # Fenêtres de dates du calendrier de planification (dashboard/planning.py)
+            models.Index(fields=['delivery_date', 'status']),
+        ]
+    
     def __str__(self):
         return self.order_number
     
@@ -105,20 +122,45 @@ class Order(models.Model):
     def is_delayed(self):
         return self.delivery_date < timezone.now().date() and self.status not in ['shipped', 'delivered', 'cancelled']
     
-    def update_stock_on_confirm(self):
-        """Diminue le stock quand une commande est confirmée"""
-        for item in self.items.all():
-            if item.product.current_stock >= item.quantity:
-                item.product.current_stock -= item.quantity
-                item.product.save()
-            else:
-                raise ValueError(f"Stock insuffisant pour {item.product.reference}")
-    
-    def restore_stock_on_cancel(self):
-        """Restaure le stock quand une commande est annulée"""
-        for item in self.items.all():
-            item.product.current_stock += item.quantity
-            item.product.save()
+    def update_stock_on_confirm(self, user=None):
+        """Diminue le stock quand une commande devient ouverte (via le journal de stock, lots affectés en FEFO)"""
+        from .ledger import allocate_lines
+
+        # Prélevé sur l'emplacement d'expédition puis sur les autres emplacements
+        allocate_lines(self.items.all(), user=user)
+    
+    def restore_stock_on_cancel(self, user=None):
+        """Restaure le stock quand une commande est annulée (via le journal de stock, lots compris) ;
+        les lignes réservées n'ont pas été prélevées"""
+        from .ledger import release_lines
+
+        release_lines(self.items.filter(reservation__isnull=True).select_related('product'), user=user)
+
+    @classmethod
+    def confirm_orders(cls, orders, user=None):
+        """Confirme des commandes brouillon en une transaction : toutes leurs lignes sont prélevées
+        par un seul appel à ledger.allocate_lines (par date de livraison, pour l'ordre des lots),
+        sans réservation puisque leur stock est sorti.
+        ValueError si le stock manque : aucune commande n'est confirmée. Retourne les commandes confirmées."""
+        from .data_versions import bump_versions
+        from .ledger import allocate_lines
+        from .outbox import emit, order_status_event
+
+        with transaction.atomic():
+            pending = list(cls.objects.select_for_update().filter(
+                pk__in=[order.pk for order in orders], status='draft',
+            ).order_by('delivery_date', 'pk'))
+            items = list(OrderItem.objects.filter(order__in=pending).select_related('order').order_by(
+                'order__delivery_date', 'order_id', 'pk',
+            ))
+            allocate_lines(items, user=user)
+            cls.objects.filter(pk__in=[order.pk for order in pending]).update(status='confirmed')
+            for order in pending:
+                order.status = 'confirmed'
+            OrderStatusTransition.record([(order, 'draft') for order in pending], user=user)
+            emit(*[order_status_event(order, 'draft') for order in pending])
+            transaction.on_commit(lambda: bump_versions('order'))
+        return pending
     
     def save(self, *args, **kwargs):
         """Override save pour gérer automatiquement les stocks"""
@@ -129,20 +171,31 @@ class Order(models.Model):
             except Order.DoesNotExist:
                 old_status = None
         
-        super().save(*args, **kwargs)
-        
-        # Gestion automatique des stocks - NE PAS créer de StockMovement ici
+        # Gestion automatique des stocks - chaque variation passe par le journal (StockMovement)
+        # L'utilisateur à l'origine du changement peut être fourni via `order.changed_by`
+        user = getattr(self, 'changed_by', None)
         try:
-            if old_status != self.status:
-                if self.status == 'confirmed' and old_status != 'confirmed':
-                    self.update_stock_on_confirm()
-                elif self.status == 'cancelled' and old_status in ['confirmed', 'in_production']:
-                    self.restore_stock_on_cancel()
-        except Exception as e:
-            # En cas d'erreur, on revert le statut
-            self.status = old_status
-            self.save()
-            raise e
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if old_status != self.status:
+                    from .outbox import emit, order_status_event
+                    from .reservations import OPEN_STATUSES, on_status_change
+
+                    # Le stock sort à l'ouverture de la commande (confirmée ou en production), une seule fois
+                    if self.status in OPEN_STATUSES and old_status not in OPEN_STATUSES:
+                        self.update_stock_on_confirm(user=user)
+                    elif self.status == 'cancelled' and old_status in OPEN_STATUSES:
+                        self.restore_stock_on_cancel(user=user)
+                    # Réservations des lignes ajoutées depuis l'ouverture : libérées à la sortie
+                    on_status_change(self, old_status)
+                    OrderStatusTransition.record([(self, old_status)], user=user)
+                    # Publié avec la modification (outbox transactionnelle)
+                    emit(order_status_event(self, old_status))
+        except Exception:
+            # En cas d'erreur, la transaction est annulée (statut, stock, réservations) : on revert l'instance
+            if old_status is not None:
+                self.status = old_status
+            raise
         
     @property
     def tva_amount(self):
@@ -185,25 +238,232 @@ class OrderItem(models.Model):
         """Calcule le total TTC"""
         return round(float(self.total_amount) * 1.20, 2)
 
+
+class OrderStatusTransition(models.Model):
+    """Historique des statuts d'une commande, écrit dans la transaction du changement.
+
+    `duration` est le temps passé dans `from_status` (depuis la transition
+    précédente) : les durées d'étapes s'agrègent sans fonction de fenêtre ni
+    calcul de dates ligne à ligne. Elle est nulle à la création de la commande
+    et pour la première transition d'une commande antérieure à l'historique.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='transitions')
+    from_status = models.CharField(max_length=20, blank=True)  # Vide à la création
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+    duration = models.DurationField(null=True, blank=True)
+    changed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            # Fenêtres des analyses de livraison (dashboard/analytics/delivery.py)
+            models.Index(fields=['to_status', 'changed_at'], name='order_transition_to_status'),
+            models.Index(fields=['changed_at'], name='order_transition_changed_at'),
+            # Dernière transition d'une commande (`duration` de la suivante)
+            models.Index(fields=['order', 'changed_at'], name='order_transition_order'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.from_status or '-'} → {self.to_status}"
+
+    @classmethod
+    def record(cls, changes, user=None):
+        """Enregistre les transitions [(commande, ancien statut ou None)] vers leur statut courant,
+        en deux requêtes ; à appeler dans la transaction du changement"""
+        now = timezone.now()
+        previous = dict(cls.objects.filter(
+            order__in=[order.pk for order, old_status in changes if old_status is not None],
+        ).values('order').annotate(last=models.Max('changed_at')).values_list('order', 'last'))
+        return cls.objects.bulk_create([
+            cls(
+                order=order, from_status=old_status or '', to_status=order.status, changed_at=now,
+                duration=now - previous[order.pk] if order.pk in previous else None, changed_by=user if getattr(user, 'pk', None) else None,
+            )
+            for order, old_status in changes
+        ])
+
+
 class StockMovement(models.Model):
+    """Journal de stock en ajout seul : source de vérité des niveaux de stock.
+
+    `quantity` est la valeur saisie (niveau cible pour un ajustement),
+    `delta` la variation signée effectivement appliquée au stock de
+    l'emplacement. Un transfert est une paire de mouvements (sortie à
+    l'origine, entrée à destination) dont les deltas s'annulent.
+    """
     MOVEMENT_TYPES = [
         ('in', 'Entrée'),
         ('out', 'Sortie'),
         ('adjustment', 'Ajustement'),
+        ('transfer', 'Transfert'),
     ]
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    location = models.ForeignKey('StockLocation', on_delete=models.PROTECT, related_name='movements')
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField()
+    delta = models.IntegerField(default=0)
     reason = models.CharField(max_length=100)
-    created_at = models.DateTimeField(auto_now_add=True)
-    # Garder l'utilisateur comme champ principal
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='dashboard_stock_movements')
+    # Transfert : l'entrée à destination pointe vers la sortie de l'emplacement d'origine
+    transfer_source = models.OneToOneField(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='transfer_destination'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Garder l'utilisateur comme champ principal (vide pour les mouvements système)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_stock_movements')
     # Ajouter optionnellement un champ pour le customer
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
+    
     def __str__(self):
         return f"{self.product.reference} - {self.movement_type} - {self.quantity}"
+
+
+class StockSnapshot(models.Model):
+    """Photo périodique du stock d'un produit, calculée à partir du journal"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    quantity = models.IntegerField()
+    taken_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['product', 'taken_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.reference} - {self.quantity} ({self.taken_at:%d/%m/%Y %H:%M})"
+
+
+class StockLocation(models.Model):
+    """Emplacement de stock : entrepôt ou stock bord de ligne"""
+    KINDS = [
+        ('warehouse', 'Entrepôt'),
+        ('line_side', 'Bord de ligne'),
+    ]
+
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KINDS, default='warehouse')
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['code']
+
+    def __str__(self):
+        return f"{self.code} - {self.name}"
+
+
+class StockBalance(models.Model):
+    """Stock d'un produit sur un emplacement : projection du journal, mise à jour par ledger.py"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='balances')
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, related_name='balances')
+    quantity = models.IntegerField(default=0)
+    min_quantity = models.IntegerField(default=0)  # Seuil d'alerte de l'emplacement (0 = aucun)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location'], name='unique_stock_balance'),
+        ]
+        indexes = [
+            models.Index(fields=['location', 'product']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.reference} @ {self.location.code} : {self.quantity}"
+
+    @property
+    def is_low(self):
+        return self.min_quantity > 0 and self.quantity <= self.min_quantity
+
+
+class StockReservation(models.Model):
+    """Réservation ferme d'une ligne de commande ouverte (confirmée ou en production) dont le stock
+    n'est pas encore sorti.
+
+    Créée pour une ligne ajoutée à une commande déjà ouverte (les lignes présentes à l'ouverture
+    sont prélevées), supprimée quand la commande ne l'est plus (expédition, livraison,
+    annulation) ; `Product.reserved` en est la somme.
+    """
+    order_item = models.OneToOneField('OrderItem', on_delete=models.CASCADE, related_name='reservation')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.reference} x{self.quantity} ({self.order_item_id})"
+
+
+class StockLot(models.Model):
+    """Lot reçu sur un emplacement ; `remaining` est consommé en FEFO par ledger.py.
+
+    La somme des lots ouverts d'un emplacement ne dépasse jamais son solde :
+    le reste du solde est du stock non suivi par lot (antérieur au suivi).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='lots')
+    location = models.ForeignKey(StockLocation, on_delete=models.PROTECT, related_name='lots')
+    lot_number = models.CharField(max_length=50)
+    received_at = models.DateTimeField(default=timezone.now)
+    expiry_date = models.DateField(null=True, blank=True)  # Vide : non périssable, consommé après les lots datés
+    quantity = models.IntegerField()  # Quantité reçue
+    remaining = models.IntegerField()
+
+    # Ordre de consommation : péremption la plus proche, puis premier reçu (FIFO)
+    FEFO = (F('expiry_date').asc(nulls_last=True), 'received_at', 'id')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'location', 'lot_number'], name='unique_stock_lot'),
+            models.CheckConstraint(condition=Q(remaining__gte=0), name='stock_lot_remaining_gte_0'),
+        ]
+        indexes = [
+            # Lots ouverts seulement, dans l'ordre FEFO : une allocation lit le début de l'index
+            models.Index(
+                fields=['product', 'location', 'expiry_date', 'received_at', 'id'],
+                condition=Q(remaining__gt=0), name='stock_lot_open_fefo',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product.reference} lot {self.lot_number} @ {self.location.code} : {self.remaining}"
+
+
+class LotAllocation(models.Model):
+    """Quantité d'un lot prélevée pour une ligne de commande (traçabilité des expéditions)"""
+    lot = models.ForeignKey(StockLot, on_delete=models.CASCADE, related_name='allocations')
+    order_item = models.ForeignKey('OrderItem', on_delete=models.CASCADE, related_name='lot_allocations')
+    quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.order_item} <- {self.lot.lot_number} x{self.quantity}"
+
+
+class InventoryMetrics(models.Model):
+    """Indicateurs de stock par produit, recalculés chaque nuit (refresh_inventory_metrics)"""
+    ABC_CLASSES = [
+        ('A', 'A - Forte valeur'),
+        ('B', 'B - Valeur moyenne'),
+        ('C', 'C - Faible valeur'),
+    ]
+    
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='inventory_metrics')
+    units_out = models.IntegerField(default=0)  # Sorties sur la période analysée
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    average_stock = models.FloatField(default=0)
+    turnover = models.FloatField(null=True, blank=True)  # Rotations annualisées
+    days_of_coverage = models.FloatField(null=True, blank=True)  # Vide si aucune demande
+    last_out_at = models.DateTimeField(null=True, blank=True)
+    is_dead_stock = models.BooleanField(default=False, db_index=True)
+    abc_class = models.CharField(max_length=1, choices=ABC_CLASSES, default='C', db_index=True)
+    refreshed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.product.reference} - {self.abc_class}"
     
 class PlanningEvent(models.Model):
     EVENT_TYPES = [
@@ -222,41 +482,263 @@ class PlanningEvent(models.Model):
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Chevauchement d'une fenêtre : start_date <= fin et end_date >= début
+            models.Index(fields=['start_date', 'end_date']),
+        ]
+    
     def __str__(self):
         return f"{self.title} ({self.start_date} - {self.end_date})"
     
+    def save(self, *args, **kwargs):
+        """Un nouvel événement est publié dans l'outbox, dans la même transaction"""
+        from .outbox import emit, planning_event_created
+
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if created:
+                emit(planning_event_created(self))
+    
     @property
     def duration(self):
-        return (self.end_date - self.start_date).days + 1    
-    
+        return (self.end_date - self.start_date).days + 1
+
+
+class WorkCenter(models.Model):
+    """Poste de charge (machine, ligne, cellule) : ressource de capacité de l'ordonnancement"""
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    capacity_minutes_per_day = models.PositiveIntegerField(default=480)
+    # Rendement : 0.85 = 85 % du temps d'ouverture réellement productif
+    efficiency = models.DecimalField(max_digits=4, decimal_places=2, default=1)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['code']
+
+    def __str__(self):
+        return f"{self.code} - {self.name}"
+
+    @property
+    def effective_minutes_per_day(self):
+        return self.capacity_minutes_per_day * float(self.efficiency)
+
+
+class RoutingStep(models.Model):
+    """Opération de la gamme de fabrication d'un produit"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='routing_steps')
+    sequence = models.PositiveIntegerField()
+    operation = models.CharField(max_length=100)
+    setup_minutes = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    run_minutes = models.DecimalField(max_digits=8, decimal_places=3, help_text="Temps opératoire par unité")
+    # Postes capables de réaliser l'opération (le premier par code est le poste préféré)
+    work_centers = models.ManyToManyField(WorkCenter, related_name='routing_steps')
+
+    class Meta:
+        ordering = ['product', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'sequence'], name='unique_routing_step_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.reference} - {self.sequence} {self.operation}"
+
+    def processing_minutes(self, quantity):
+        return float(self.setup_minutes) + float(self.run_minutes) * quantity
+
+
+class BOMLine(models.Model):
+    """Ligne de nomenclature : `quantity_per` unités de `component` par unité de `parent`"""
+    parent = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bom_lines')
+    component = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='used_in')
+    quantity_per = models.DecimalField(max_digits=10, decimal_places=4)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['parent', 'component'], name='unique_bom_line'),
+            models.CheckConstraint(condition=~models.Q(parent=models.F('component')), name='bom_line_not_self'),
+        ]
+
+    def __str__(self):
+        return f"{self.parent.reference} <- {self.quantity_per} x {self.component.reference}"
+
+    def clean(self):
+        from .bom import get_bom_structure
+
+        if self.parent_id and self.component_id and get_bom_structure().is_descendant(self.parent_id, self.component_id):
+            raise ValidationError("Cette ligne créerait une boucle dans la nomenclature")
+
+
 class AIAnalysis(models.Model):
+    """Résultat d'analyse calculé périodiquement (voir dashboard/analysis_scheduler.py).
+
+    Une seule ligne active par type : c'est elle que les vues servent tant que
+    `valid_until` n'est pas dépassé, puis elle est recalculée en arrière-plan.
+    """
     ANALYSIS_TYPES = [
         ('stock', 'Analyse Stock'),
         ('production', 'Analyse Production'),
         ('sales', 'Analyse Ventes'),
         ('efficiency', 'Analyse Efficacité'),
+        ('alerts', 'Analyse Alertes'),
+        ('financial', 'Analyse Financière'),
+        ('optimization', 'Opportunités d\'optimisation'),
+        ('overview', 'Vue d\'ensemble'),
     ]
     
     analysis_type = models.CharField(max_length=20, choices=ANALYSIS_TYPES)
     title = models.CharField(max_length=200)
     insights = models.JSONField()  # Stocke les insights sous forme JSON
     recommendations = models.JSONField()  # Recommandations sous forme JSON
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)  # Résultat complet de l'analyse
+    duration_ms = models.IntegerField(default=0)  # Temps de calcul
+    valid_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['analysis_type', 'is_active', '-created_at']),
+        ]
+    
     def __str__(self):
         return f"{self.get_analysis_type_display()} - {self.created_at.date()}"
+    
+    @property
+    def is_stale(self):
+        return self.valid_until is None or self.valid_until <= timezone.now()
+
+class ContextSnapshot(models.Model):
+    """Contexte métier stocké une seule fois, compressé, adressé par son empreinte SHA-256"""
+    hash = models.CharField(max_length=64, primary_key=True)
+    data = models.BinaryField()  # JSON canonique compressé (zlib)
+    raw_size = models.IntegerField(default=0)  # Taille du JSON non compressé, pour le suivi
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.hash[:12]
+    
+    @staticmethod
+    def serialize(context):
+        """JSON canonique (clés triées, dates ISO) : même contexte => mêmes octets"""
+        return json.dumps(context, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    
+    @classmethod
+    def digest(cls, context):
+        return hashlib.sha256(cls.serialize(context)).hexdigest()
+    
+    @classmethod
+    def store(cls, context):
+        """Retourne le snapshot de ce contexte, en le créant s'il n'existe pas encore"""
+        payload = cls.serialize(context)
+        snapshot, _ = cls.objects.get_or_create(
+            hash=hashlib.sha256(payload).hexdigest(),
+            defaults={'data': zlib.compress(payload, 9), 'raw_size': len(payload)},
+        )
+        return snapshot
+    
+    def load(self):
+        return json.loads(zlib.decompress(bytes(self.data)))
 
 class AIConversation(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     question = models.TextField()
     answer = models.TextField()
-    context = models.JSONField(default=dict)  # Contexte des données au moment de la question
+    # Contexte des données au moment de la question, partagé entre conversations
+    context_snapshot = models.ForeignKey(ContextSnapshot, on_delete=models.PROTECT, null=True, blank=True, related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.user.username} - {self.created_at.date()}"    
     
+    @property
+    def context(self):
+        return self.context_snapshot.load() if self.context_snapshot_id else {}
+    
+class Job(models.Model):
+    """Tâche de fond en file d'attente, exécutée par `manage.py run_worker` (voir dashboard/jobs.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'En attente'),
+        ('running', 'En cours'),
+        ('succeeded', 'Terminée'),
+        ('failed', 'Échouée'),
+    ]
+    
+    name = models.CharField(max_length=50)  # Nom du traitement enregistré dans jobs.HANDLERS
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # Reporté en cas de nouvel essai
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # Purge du résultat après ce délai
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+    
+class OutboxEvent(models.Model):
+    """Événement métier écrit dans la transaction de la modification, livré par `manage.py run_dispatcher`
+    (voir dashboard/outbox.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'À livrer'),
+        ('dispatched', 'Livré'),
+        ('failed', 'Échec'),
+    ]
+
+    event_type = models.CharField(max_length=50)  # ex. 'order.status_changed'
+    aggregate_type = models.CharField(max_length=50)
+    aggregate_id = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    delivered_to = models.JSONField(default=list)  # Puits ayant déjà reçu l'événement
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)  # Reporté en cas d'échec d'un puits
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Événements à livrer seulement : la table des événements livrés peut grossir sans ralentir l'envoi
+            models.Index(fields=['id'], condition=Q(status='pending'), name='outbox_pending'),
+            models.Index(fields=['dispatched_at']),
+            models.Index(fields=['aggregate_type', 'aggregate_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.aggregate_type}#{self.aggregate_id} ({self.get_status_display()})"
+
+
+class DataVersion(models.Model):
+    """Version d'une famille de données (voir dashboard/data_versions.py), partagée par tous les processus"""
+    name = models.CharField(max_length=100, primary_key=True)  # ex. 'order', 'notifications:12'
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} = {self.version}"
+
+
 class Notification(models.Model):
     TYPE_CHOICES = [
         ('delayed_order', 'Commande en retard'),
@@ -345,10 +827,8 @@ class NotificationManager:
     @staticmethod
     def check_low_stock(user):
         """Vérifie les stocks faibles"""
-        low_stock_products = []
-        for product in Product.objects.all():
-            if product.needs_reorder():
-                low_stock_products.append(product)
+        # Filtre sur les compteurs maintenus (total et emplacements), sans parcourir tout le catalogue
+        low_stock_products = list(Product.objects.filter(LOW_STOCK).only('reference'))
         
         if low_stock_products:
             product_names = ", ".join([p.reference for p in low_stock_products[:3]])  # Limiter à 3
@@ -0,0 +1,187 @@
+"""
+Optimisation de la séquence des commandes ouvertes (recuit simulé, anytime).
+
+Objectif : retard pondéré total, le poids d'une commande étant sa valeur
+(`Order.total_amount`, normalisée). La recherche locale travaille sur un
+modèle agrégé de l'atelier (`SequenceModel`) : chaque commande consomme sa
+charge totale (gammes x quantités) sur la capacité cumulée de l'atelier, en
+séquence. Dans ce modèle un mouvement s'évalue sans recalcul complet :
+
+- échange de deux commandes voisines : O(1), seules leurs deux fins changent ;
+- déplacement d'une commande de k positions : O(k), seules les fins des
+  commandes traversées changent.
+
+Le recuit part de la séquence EDD, s'arrête au bout du budget de temps et
+retourne la meilleure séquence trouvée. Elle est ensuite évaluée, comme la
+séquence EDD, par l'ordonnancement complet à capacité finie
+(scheduling.evaluate) pour comparer des indicateurs réels.
+"""
+import bisect
+import math
+import random
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .scheduling import edd_sequence, evaluate, get_snapshot
+
+MAX_SECONDS = getattr(settings, 'OPTIMIZER_MAX_SECONDS', 60)
+MAX_SHIFT = 50  # Distance maximale d'un déplacement (coût O(k))
+CHECK_EVERY = 256  # Itérations entre deux lectures de l'horloge
+
+
+class SequenceModel:
+    """Modèle agrégé : charge de chaque commande consommée sur la capacité cumulée de l'atelier"""
+
+    def __init__(self, snapshot):
+        routing = snapshot.routing
+        line_minutes = np.nan_to_num(routing.processing_times(snapshot.line_product, snapshot.line_quantity))
+        self.processing = np.bincount(snapshot.line_order, weights=line_minutes, minlength=snapshot.order_count).tolist()
+        self.due = snapshot.due.tolist()
+        self.weights = snapshot.weights.tolist()
+
+        daily = snapshot.capacity.sum(axis=0)
+        self.cumulative_capacity = np.cumsum(daily).tolist()
+        # Au-delà de l'horizon : capacité journalière moyenne
+        self.overflow_rate = float(daily.mean()) if len(daily) and daily.mean() > 0 else 1.0
+        self.horizon = len(daily)
+
+    def finish_day(self, minutes):
+        """Jour où la charge cumulée `minutes` est terminée"""
+        if minutes <= 0:
+            return 0
+        capacity = self.cumulative_capacity
+        if capacity and minutes <= capacity[-1]:
+            return bisect.bisect_left(capacity, minutes - 1e-9)
+        beyond = minutes - (capacity[-1] if capacity else 0)
+        return self.horizon + math.ceil(beyond / self.overflow_rate) - 1
+
+    def cost(self, order, finish):
+        """Retard pondéré d'une commande terminée à la charge cumulée `finish`"""
+        late = self.finish_day(finish) - self.due[order]
+        return self.weights[order] * late if late > 0 else 0.0
+
+    def completions(self, sequence):
+        """Charge cumulée à la fin de chaque position de la séquence"""
+        return np.cumsum([self.processing[order] for order in sequence]).tolist()
+
+    def total_cost(self, sequence):
+        return sum(self.cost(order, finish) for order, finish in zip(sequence, self.completions(sequence)))
+
+
+def anneal(model, sequence, seconds, seed=None, max_shift=MAX_SHIFT):
+    """Recuit simulé sur la séquence ; retourne (meilleure séquence, coût, statistiques)"""
+    rng = random.Random(seed)
+    sequence = list(sequence)
+    n = len(sequence)
+    finish = model.completions(sequence)
+    current = best_cost = sum(model.cost(order, f) for order, f in zip(sequence, finish))
+    best = list(sequence)
+    stats = {'iterations': 0, 'accepted': 0, 'improvements': 0}
+    if n < 2 or seconds <= 0:
+        return best, best_cost, stats
+
+    processing, cost = model.processing, model.cost
+    # Température initiale : de l'ordre du coût moyen par commande ; refroidissement géométrique sur le budget
+    initial_temperature = max(current / n, 1.0)
+    final_temperature = initial_temperature * 1e-4
+    started = time.perf_counter()
+    deadline = started + seconds
+    temperature = initial_temperature
+
+    while True:
+        stats['iterations'] += 1
+        if stats['iterations'] % CHECK_EVERY == 0:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            progress = (now - started) / seconds
+            temperature = initial_temperature * (final_temperature / initial_temperature) ** progress
+
+        i = rng.randrange(n - 1)
+        if rng.random() < 0.5:
+            # Échange de i et i + 1 : O(1)
+            a, b = sequence[i], sequence[i + 1]
+            new_b = finish[i] - processing[a] + processing[b]
+            delta = cost(b, new_b) + cost(a, finish[i + 1]) - cost(a, finish[i]) - cost(b, finish[i + 1])
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                sequence[i], sequence[i + 1] = b, a
+                finish[i] = new_b
+                current += delta
+                stats['accepted'] += 1
+            else:
+                continue
+        else:
+            # Déplacement de la commande en i vers j : O(|i - j|)
+            j = min(max(i + rng.randint(-max_shift, max_shift), 0), n - 1)
+            if j == i:
+                continue
+            moved = sequence[i]
+            p = processing[moved]
+            if j > i:
+                # Les commandes i+1..j avancent de p, la commande déplacée finit en finish[j]
+                delta = cost(moved, finish[j]) - cost(moved, finish[i])
+                for k in range(i + 1, j + 1):
+                    delta += cost(sequence[k], finish[k] - p) - cost(sequence[k], finish[k])
+            else:
+                # Les commandes j..i-1 reculent de p, la commande déplacée finit en finish[j-1] + p
+                start = finish[j - 1] if j > 0 else 0.0
+                delta = cost(moved, start + p) - cost(moved, finish[i])
+                for k in range(j, i):
+                    delta += cost(sequence[k], finish[k] + p) - cost(sequence[k], finish[k])
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                if j > i:
+                    for k in range(i + 1, j + 1):
+                        finish[k - 1] = finish[k] - p
+                else:
+                    for k in range(i, j, -1):
+                        finish[k] = finish[k - 1] + p
+                    finish[j] = (finish[j - 1] if j > 0 else 0.0) + p
+                sequence.insert(j, sequence.pop(i))
+                current += delta
+                stats['accepted'] += 1
+            else:
+                continue
+
+        if current < best_cost - 1e-9:
+            best_cost = current
+            best = list(sequence)
+            stats['improvements'] += 1
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return best, best_cost, stats
+
+
+def optimize_schedule(seconds=10, seed=None, top=50):
+    """Tâche de fond `optimize_schedule` : séquence optimisée en `seconds` secondes, comparée à EDD"""
+    seconds = min(max(float(seconds), 0.0), MAX_SECONDS)
+    snapshot = get_snapshot()
+    model = SequenceModel(snapshot)
+    edd = edd_sequence(snapshot)
+
+    best, best_cost, stats = anneal(model, edd.tolist(), seconds, seed=seed)
+    best = np.array(best, dtype=np.int64)
+
+    baseline = evaluate(snapshot, edd)
+    optimized = evaluate(snapshot, best)
+    # Garde-fou : le modèle agrégé n'est qu'une approximation de l'atelier
+    kept = 'optimized' if optimized['weighted_tardiness'] <= baseline['weighted_tardiness'] else 'edd'
+    sequence = best if kept == 'optimized' else edd
+    return {
+        'date': snapshot.today.isoformat(),
+        'seconds': seconds,
+        'search': {**stats, 'edd_cost': round(model.total_cost(edd.tolist()), 2), 'best_cost': round(best_cost, 2)},
+        'edd': baseline,
+        'optimized': optimized,
+        'kept': kept,
+        'sequence': [
+            {
+                'order_number': snapshot.order_numbers[order],
+                'delivery_date': (snapshot.today + timedelta(days=int(snapshot.due[order]))).isoformat(),
+                'weight': round(float(snapshot.weights[order]), 2),
+            }
+            for order in sequence[:top].tolist()
+        ],
+    }
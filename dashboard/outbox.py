@@ -0,0 +1,309 @@
+"""
+Outbox transactionnelle des événements métier.
+
+Les changements de statut des commandes, les mouvements de stock et les
+nouveaux événements de planning écrivent un `OutboxEvent` dans la même
+transaction que la modification : un événement existe si et seulement si la
+modification a été validée. Les intégrations (MES, comptabilité, webhooks)
+n'ont plus à scruter la base.
+
+`manage.py run_dispatcher` réclame les événements à livrer par lots (UPDATE
+conditionnel avec bail, comme la file de tâches de jobs.py) et les envoie à
+chaque puits configuré dans `settings.OUTBOX['SINKS']` :
+
+    OUTBOX = {'SINKS': {
+        'mes': {'BACKEND': 'webhook', 'OPTIONS': {'url': 'http://mes.local/events', 'secret': '...'}},
+        'archive': {'BACKEND': 'jsonl', 'OPTIONS': {'path': '/var/log/erp/events.jsonl'}},
+    }}
+
+Un puits reçoit un lot en un appel (`Sink.send`) ; s'il échoue, seuls les
+puits qui n'ont pas encore reçu l'événement sont retentés, avec un délai
+exponentiel, jusqu'à `MAX_ATTEMPTS` (l'événement passe alors en échec).
+La livraison est « au moins une fois » : les destinataires dédoublonnent sur
+l'identifiant de l'événement. L'ordre est celui des identifiants au sein
+d'un lot ; un événement en attente de nouvel essai peut être dépassé.
+
+Les insertions en masse du jeu de démonstration (seeding.py) ne publient pas
+d'événements.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import socket
+import time
+import urllib.request
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'OUTBOX', {})
+BATCH_SIZE = _config.get('BATCH_SIZE', 200)
+MAX_ATTEMPTS = _config.get('MAX_ATTEMPTS', 10)
+RETRY_BACKOFF = _config.get('RETRY_BACKOFF', 5)  # secondes, doublé à chaque essai
+MAX_BACKOFF = _config.get('MAX_BACKOFF', 3600)
+LEASE = _config.get('LEASE', 120)  # Lot réclamé puis abandonné (dispatcher tué) : repris après ce délai
+POLL_INTERVAL = _config.get('POLL_INTERVAL', 1.0)
+RETENTION_DAYS = _config.get('RETENTION_DAYS', 7)  # Conservation des événements livrés
+MAINTENANCE_INTERVAL = _config.get('MAINTENANCE_INTERVAL', 300)  # Purge des événements livrés par le dispatcher (s)
+
+
+# ========== ÉCRITURE DES ÉVÉNEMENTS ==========
+
+def build_event(event_type, aggregate, payload):
+    """Événement non enregistré sur l'agrégat `aggregate` (instance de modèle)"""
+    return OutboxEvent(
+        event_type=event_type,
+        aggregate_type=aggregate._meta.model_name,
+        aggregate_id=str(aggregate.pk),
+        payload=payload,
+    )
+
+
+def emit(*events):
+    """Écrit des événements construits par les fonctions ci-dessous, en une requête ;
+    à appeler dans la transaction de la modification"""
+    return OutboxEvent.objects.bulk_create(events)
+
+
+def order_status_event(order, old_status):
+    return build_event('order.status_changed', order, {
+        'order_number': order.order_number,
+        'customer_id': order.customer_id,
+        'from': old_status,
+        'to': order.status,
+        'delivery_date': order.delivery_date,
+        'total_amount': order.total_amount,
+    })
+
+
+def stock_movement_event(movement):
+    """Événement d'un mouvement de stock (produit et emplacement déjà chargés)"""
+    return build_event('stock.movement_recorded', movement.product, {
+        'movement_id': movement.pk,
+        'product': movement.product.reference,
+        'location': movement.location.code,
+        'movement_type': movement.movement_type,
+        'quantity': movement.quantity,
+        'delta': movement.delta,
+        'reason': movement.reason,
+        'customer_id': movement.customer_id,
+    })
+
+
+def planning_event_created(event):
+    return build_event('planning.event_created', event, {
+        'title': event.title,
+        'event_type': event.event_type,
+        'start_date': event.start_date,
+        'end_date': event.end_date,
+        'created_by': event.created_by_id,
+    })
+
+
+def serialize(event):
+    """Représentation envoyée aux puits"""
+    return {
+        'id': event.pk,
+        'type': event.event_type,
+        'aggregate_type': event.aggregate_type,
+        'aggregate_id': event.aggregate_id,
+        'occurred_at': event.occurred_at,
+        'payload': event.payload,
+    }
+
+
+# ========== PUITS ==========
+
+class Sink:
+    """Destination des événements : `send` reçoit un lot et lève une exception en cas d'échec"""
+    name = 'base'
+
+    def send(self, events):
+        raise NotImplementedError
+
+
+class WebhookSink(Sink):
+    """POST JSON {"events": [...]} ; signature HMAC-SHA256 du corps dans X-Outbox-Signature si `secret`"""
+    name = 'webhook'
+
+    def __init__(self, url, timeout=10, secret='', headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.secret = secret
+        self.headers = headers or {}
+
+    def send(self, events):
+        body = json.dumps({'events': events}, cls=DjangoJSONEncoder).encode('utf-8')
+        headers = {'Content-Type': 'application/json', **self.headers}
+        if self.secret:
+            headers['X-Outbox-Signature'] = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        # Un statut >= 400 lève HTTPError : le lot est retenté
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class JsonlSink(Sink):
+    """Ajoute un événement JSON par ligne à un fichier"""
+    name = 'jsonl'
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def send(self, events):
+        lines = ''.join(json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for event in events)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('a', encoding='utf-8') as output:
+            output.write(lines)
+            output.flush()
+            os.fsync(output.fileno())
+
+
+SINKS = {
+    'webhook': WebhookSink,
+    'jsonl': JsonlSink,
+}
+
+
+def build_sinks(config):
+    """Puits nommés à partir de {nom: {'BACKEND': ..., 'OPTIONS': {...}}}"""
+    sinks = {}
+    for name, options in config.items():
+        backend = options.get('BACKEND', 'webhook')
+        sink_class = SINKS[backend] if backend in SINKS else import_string(backend)
+        sinks[name] = sink_class(**options.get('OPTIONS', {}))
+    return sinks
+
+
+def get_sinks():
+    return build_sinks(_config.get('SINKS', {}))
+
+
+# ========== DISPATCHER ==========
+
+def dispatcher_id(index=0):
+    return f'{socket.gethostname()}:{os.getpid()}:outbox:{index}'
+
+
+def _claimable(now):
+    return OutboxEvent.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        status='pending', next_attempt_at__lte=now,
+    )
+
+
+def claim_batch(me, size=BATCH_SIZE):
+    """Réclame jusqu'à `size` événements à livrer, par identifiant croissant"""
+    now = timezone.now()
+    ids = list(_claimable(now).order_by('id').values_list('id', flat=True)[:size])
+    if not ids:
+        return []
+    # Les événements pris entre-temps par un autre dispatcher ne sont plus réclamables
+    _claimable(now).filter(pk__in=ids).update(
+        locked_by=me, locked_until=now + timedelta(seconds=LEASE), attempts=F('attempts') + 1,
+    )
+    return list(OutboxEvent.objects.filter(pk__in=ids, locked_by=me, status='pending').order_by('id'))
+
+
+def backoff(attempts):
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def deliver(events, sinks):
+    """Envoie un lot réclamé aux puits qui ne l'ont pas encore reçu et enregistre le résultat"""
+    errors = {}
+    for name, sink in sinks.items():
+        pending = [event for event in events if name not in event.delivered_to]
+        if not pending:
+            continue
+        try:
+            sink.send([serialize(event) for event in pending])
+        except Exception as e:
+            errors[name] = f'{name}: {type(e).__name__}: {e}'
+            logger.warning("Puits %s en échec pour %s événement(s) : %s", name, len(pending), e)
+        else:
+            for event in pending:
+                event.delivered_to.append(name)
+
+    # Un UPDATE par résultat distinct (en général un seul : tout livré) plutôt qu'un bulk_update
+    # ligne à ligne, dont la compilation domine le temps de livraison
+    now = timezone.now()
+    outcomes = {}
+    for event in events:
+        missing = [name for name in sinks if name not in event.delivered_to]
+        if not missing:
+            event.status = 'dispatched'
+            changes = {'status': 'dispatched', 'dispatched_at': now, 'last_error': ''}
+        else:
+            error = '\n'.join(errors[name] for name in missing if name in errors)
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = 'failed'
+                changes = {'status': 'failed', 'last_error': error}
+            else:
+                changes = {'next_attempt_at': now + timedelta(seconds=backoff(event.attempts)), 'last_error': error}
+        key = (tuple(event.delivered_to), *sorted(changes.items()))
+        outcomes.setdefault(key, (changes, []))[1].append(event.pk)
+    for (delivered_to, *_), (changes, ids) in outcomes.items():
+        OutboxEvent.objects.filter(pk__in=ids).update(
+            delivered_to=list(delivered_to), locked_by='', locked_until=None, **changes,
+        )
+    return sum(event.status == 'dispatched' for event in events)
+
+
+def dispatch(sinks=None, stop_event=None, poll_interval=POLL_INTERVAL, burst=False, batch_size=BATCH_SIZE,
+             index=0):
+    """Boucle du dispatcher : réclame et livre les lots jusqu'à l'arrêt ; retourne le nombre d'événements livrés.
+
+    En mode `burst`, le dispatcher s'arrête dès qu'aucun événement n'est livrable.
+    Les événements livrés sont purgés toutes les MAINTENANCE_INTERVAL secondes.
+    ValueError sans puits : les événements resteraient sinon « livrés » à personne, puis purgés.
+    """
+    sinks = get_sinks() if sinks is None else sinks
+    if not sinks:
+        raise ValueError("Aucun puits configuré (settings.OUTBOX['SINKS'])")
+    me = dispatcher_id(index)
+    delivered = 0
+    next_maintenance = 0.0
+    while not (stop_event and stop_event.is_set()):
+        close_old_connections()
+        if time.monotonic() >= next_maintenance:
+            purged = purge_dispatched()
+            if purged:
+                logger.info("%s événement(s) livré(s) purgé(s)", purged)
+            next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        events = claim_batch(me, batch_size)
+        if not events:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        delivered += deliver(events, sinks)
+    close_old_connections()
+    return delivered
+
+
+def retry_failed():
+    """Remet à livrer les événements en échec (après correction d'un puits)"""
+    return OutboxEvent.objects.filter(status='failed').update(
+        status='pending', attempts=0, next_attempt_at=timezone.now(),
+    )
+
+
+def purge_dispatched(days=RETENTION_DAYS):
+    """Supprime les événements livrés depuis plus de `days` jours"""
+    deleted, _ = OutboxEvent.objects.filter(
+        status='dispatched', dispatched_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
@@ -0,0 +1,81 @@
+"""
+Données du calendrier de planification, par fenêtre de dates.
+
+Le calendrier ne charge que la fenêtre visible (six semaines) via l'API
+`planning/calendar/?start=...&end=...` au lieu d'embarquer dans la page
+toutes les commandes et tous les événements. Les requêtes sont des
+intervalles indexés (`Order(delivery_date, status)`) qui ne lisent que les
+colonnes affichées ; les événements viennent de l'arbre d'intervalles en
+mémoire (intervals.py).
+"""
+from datetime import date
+
+from django.utils import timezone
+
+from .intervals import event_index
+from .models import Order
+
+CALENDAR_ORDER_STATUSES = ['confirmed', 'in_production', 'shipped']
+CLOSED_STATUSES = ('shipped', 'delivered', 'cancelled')
+CALENDAR_MAX_DAYS = 366
+
+
+def parse_window(start, end):
+    """Fenêtre [start, end] à partir de dates ISO ; ValueError si invalide ou trop large"""
+    if not start or not end:
+        raise ValueError("Paramètres start et end requis (AAAA-MM-JJ)")
+    start, end = date.fromisoformat(start), date.fromisoformat(end)
+    if end < start:
+        raise ValueError("end doit être postérieure ou égale à start")
+    if (end - start).days >= CALENDAR_MAX_DAYS:
+        raise ValueError(f"Fenêtre limitée à {CALENDAR_MAX_DAYS} jours")
+    return start, end
+
+
+def parse_event_dates(start, end):
+    """Dates [start, end] d'un événement de planification à partir de dates ISO ; ValueError si absentes,
+    invalides ou inversées. Sans limite de durée, contrairement à la fenêtre du calendrier."""
+    if not start or not end:
+        raise ValueError("Dates de début et de fin requises (AAAA-MM-JJ)")
+    try:
+        start, end = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        raise ValueError("Dates attendues au format AAAA-MM-JJ")
+    if end < start:
+        raise ValueError("La date de fin précède la date de début")
+    return start, end
+
+
+def calendar_window(start, end):
+    """Commandes livrables et événements qui chevauchent la fenêtre [start, end]"""
+    today = timezone.now().date()
+
+    orders = Order.objects.filter(
+        delivery_date__range=(start, end), status__in=CALENDAR_ORDER_STATUSES
+    ).order_by('delivery_date').values_list('order_number', 'customer__name', 'delivery_date', 'status')
+
+    events = event_index.overlapping(start, end)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'orders': [
+            {
+                'order_number': order_number,
+                'customer': customer,
+                'delivery_date': delivery_date.isoformat(),
+                'status': status,
+                'is_delayed': delivery_date < today and status not in CLOSED_STATUSES,
+            }
+            for order_number, customer, delivery_date, status in orders
+        ],
+        'events': [
+            {
+                'title': event.title,
+                'start_date': event.start_date.isoformat(),
+                'end_date': event.end_date.isoformat(),
+                'event_type': event.event_type,
+            }
+            for event in events
+        ],
+    }
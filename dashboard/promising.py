@@ -0,0 +1,139 @@
+"""
+Promesse de livraison à la saisie d'une commande (ATP / CTP).
+
+Pour un ensemble de lignes candidates, `promise` donne la première date de
+livraison tenable :
+
+- ATP (disponible à la vente) : stock courant moins la demande des commandes
+  ouvertes dont le stock n'est pas encore sorti (même convention que
+  `Product.available_stock`), partagé entre les lignes de la demande ;
+- CTP (capable de produire) : le manque d'un produit qui a une gamme est
+  fabriqué, sous-ensembles compris, sur la capacité que l'ordonnancement des
+  commandes ouvertes (scheduling.schedule) laisse libre ; les composants
+  achetés manquants retardent le début de fabrication du délai d'achat du
+  MRP. Un produit sans gamme est acheté.
+
+Le profil (`PromiseProfile`) est calculé une fois par état de planification
+(même clé de version que `get_snapshot`) : ATP par produit et capacité libre
+cumulée par poste et par jour. Une demande ne coûte qu'une recherche
+dichotomique par poste chargé.
+"""
+import threading
+from datetime import timedelta
+
+import numpy as np
+
+from .bom import PURCHASE_LEAD_TIME_DAYS, get_bom_structure
+from .scheduling import get_snapshot, schedule
+
+
+class PromiseProfile:
+    """ATP par produit et capacité libre cumulée (postes x jours) après les commandes ouvertes"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        product_idx = np.searchsorted(snapshot.product_ids, snapshot.line_product)
+        # `current_stock` exclut déjà les lignes prélevées à l'ouverture de leur commande
+        reserved = np.bincount(product_idx, weights=snapshot.line_pending, minlength=len(snapshot.product_ids))
+        self.atp = np.maximum(snapshot.stock - reserved, 0.0)
+
+        capacity = snapshot.capacity.copy()
+        schedule(snapshot, capacity=capacity)  # Consomme la capacité des commandes ouvertes
+        self.free_cumulative = np.cumsum(np.maximum(capacity, 0.0), axis=1)
+        self.references = {product_id: reference for reference, product_id in snapshot.product_references.items()}
+
+    @property
+    def today(self):
+        return self.snapshot.today
+
+    @property
+    def horizon(self):
+        return self.snapshot.horizon
+
+    def production_day(self, load, start=0):
+        """Jour où la charge `load` (minutes par poste) est terminée en commençant au jour `start` (None hors horizon)"""
+        day = start
+        for center in np.flatnonzero(load > 1e-9).tolist():
+            cumulative = self.free_cumulative[center]
+            already = cumulative[start - 1] if start > 0 else 0.0
+            end = int(np.searchsorted(cumulative, already + load[center] - 1e-9))
+            if end >= self.horizon:
+                return None
+            day = max(day, end)
+        return day
+
+
+_lock = threading.Lock()
+_profile = None
+
+
+def get_profile():
+    """Profil du processus, recalculé quand le snapshot de planification change"""
+    global _profile
+    snapshot = get_snapshot()
+    with _lock:
+        if _profile is None or _profile.snapshot is not snapshot:
+            _profile = PromiseProfile(snapshot)
+        return _profile
+
+
+def promise(lines, profile=None):
+    """Première date de livraison tenable pour des lignes [(product_id, quantité)] ; ValueError si produit inconnu"""
+    profile = profile or get_profile()
+    snapshot, routing = profile.snapshot, profile.snapshot.routing
+    structure = get_bom_structure()
+    remaining = {}
+
+    def take(product_id, quantity):
+        """Quantité prise sur l'ATP restant (partagé entre lignes et composants)"""
+        index = snapshot.product_index(product_id)
+        available = remaining.get(index, profile.atp[index])
+        taken = min(available, quantity)
+        remaining[index] = available - taken
+        return float(taken)
+
+    details = []
+    make_products, make_quantities = [], []
+    materials_day = purchase_day = 0
+    for product_id, quantity in lines:
+        from_stock = take(product_id, quantity)
+        shortfall = quantity - from_stock
+        line = {
+            'product': profile.references.get(product_id),
+            'quantity': quantity,
+            'from_stock': from_stock,
+            'to_make': 0.0,
+            'to_buy': 0.0,
+            'source': 'stock',
+        }
+        if shortfall > 0 and routing.row(product_id) is not None:
+            line.update(to_make=shortfall, source='production')
+            make_products.append(product_id)
+            make_quantities.append(shortfall)
+            for component_id, per_unit in structure.explosion(product_id).items():
+                needed = per_unit * shortfall
+                if routing.row(component_id) is not None:
+                    # Sous-ensemble : fabriqué avec le produit
+                    make_products.append(component_id)
+                    make_quantities.append(needed)
+                elif take(component_id, needed) < needed:
+                    materials_day = PURCHASE_LEAD_TIME_DAYS
+        elif shortfall > 0:
+            line.update(to_buy=shortfall, source='purchase')
+            purchase_day = PURCHASE_LEAD_TIME_DAYS
+        details.append(line)
+
+    day = purchase_day
+    if make_products:
+        production_day = profile.production_day(
+            routing.work_center_load(make_products, make_quantities), start=materials_day,
+        )
+        day = None if production_day is None else max(day, production_day)
+
+    return {
+        'date': profile.today.isoformat(),
+        'capable': day is not None,
+        'earliest_delivery_date': None if day is None else (profile.today + timedelta(days=day)).isoformat(),
+        'horizon_days': profile.horizon,
+        'lines': details,
+    }
@@ -0,0 +1,151 @@
+"""
+Réservations fermes de stock pour les commandes ouvertes.
+
+Une `StockReservation` porte la quantité d'une ligne de commande ouverte
+(confirmée ou en production) dont le stock n'est pas encore sorti ;
+`Product.reserved` en est la somme, maintenue par des UPDATE en F() dans la
+même transaction que les réservations. La disponibilité
+(`Product.available_stock`) se lit donc dans deux colonnes, sans agrégation
+des lignes de commande.
+
+Le stock des lignes présentes à l'ouverture de la commande sort du journal
+à ce moment-là (`Order.update_stock_on_confirm`) : `current_stock` ne les
+contient déjà plus, elles ne sont pas réservées. Les réservations suivent :
+
+- les lignes créées, modifiées ou supprimées sur une commande déjà ouverte
+  (signaux post_save / pre_delete de `OrderItem`), suppressions en cascade
+  comprises : leur stock n'a pas été prélevé ;
+- les changements de statut (`on_status_change`, appelé par `Order.save`) :
+  libération à la sortie d'un statut ouvert (expédition, livraison,
+  annulation).
+
+Les insertions en masse (bulk_create) n'émettent pas de signal : appeler
+`rebuild` après coup.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, pre_delete
+
+from .data_versions import bump_versions
+from .models import OrderItem, Product, StockReservation
+
+OPEN_STATUSES = ('confirmed', 'in_production')
+
+
+def _add_reserved(totals):
+    """Ajoute {product_id: quantité} à `Product.reserved` en une requête (produits verrouillés par identifiant)"""
+    totals = {product_id: quantity for product_id, quantity in totals.items() if quantity}
+    if not totals:
+        return
+    # Même ordre de verrouillage que le journal de stock (ledger.allocate_lines)
+    list(Product.objects.select_for_update().filter(pk__in=totals).order_by('pk').values_list('pk', flat=True))
+    Product.objects.filter(pk__in=totals).update(reserved=F('reserved') + Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in totals.items()],
+        default=Value(0), output_field=IntegerField(),
+    ))
+    # UPDATE sans signal : disponibilité affichée et snapshots de planification
+    transaction.on_commit(lambda: bump_versions('product'))
+
+
+def reserve(items):
+    """Réserve les lignes qui ne le sont pas encore ; retourne le nombre de réservations créées"""
+    items = [item for item in items if item.quantity > 0]
+    with transaction.atomic():
+        existing = set(StockReservation.objects.filter(order_item__in=items).values_list('order_item_id', flat=True))
+        created = StockReservation.objects.bulk_create([
+            StockReservation(order_item=item, product_id=item.product_id, quantity=item.quantity)
+            for item in items if item.pk not in existing
+        ])
+        totals = defaultdict(int)
+        for reservation in created:
+            totals[reservation.product_id] += reservation.quantity
+        _add_reserved(totals)
+    return len(created)
+
+
+def release(items):
+    """Supprime les réservations des lignes ; retourne le nombre de réservations libérées"""
+    with transaction.atomic():
+        reservations = list(StockReservation.objects.select_for_update().filter(
+            order_item__in=items,
+        ).values_list('pk', 'product_id', 'quantity'))
+        totals = defaultdict(int)
+        for _, product_id, quantity in reservations:
+            totals[product_id] -= quantity
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in reservations]).delete()
+        _add_reserved(totals)
+    return len(reservations)
+
+
+def on_status_change(order, old_status):
+    """Libère les lignes quand la commande sort d'un statut ouvert (à l'entrée, leur stock est prélevé)"""
+    if old_status in OPEN_STATUSES and order.status not in OPEN_STATUSES:
+        release(order.items.all())
+
+
+# ========== LIGNES MODIFIÉES SUR UNE COMMANDE OUVERTE ==========
+
+def _on_item_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.order.status not in OPEN_STATUSES:
+        return
+    with transaction.atomic():
+        reservation = StockReservation.objects.select_for_update().filter(order_item=instance).first()
+        if reservation is None:
+            # Ligne existante sans réservation : son stock est sorti à l'ouverture de la commande
+            if created:
+                reserve([instance])
+        elif (reservation.product_id, reservation.quantity) != (instance.product_id, instance.quantity):
+            # Produit ou quantité modifiés : la réservation est refaite
+            release([instance])
+            reserve([instance])
+
+
+def _on_item_deleted(sender, instance, **kwargs):
+    release([instance])
+
+
+def connect_signals():
+    post_save.connect(_on_item_saved, sender=OrderItem, dispatch_uid='reservation_item_save')
+    pre_delete.connect(_on_item_deleted, sender=OrderItem, dispatch_uid='reservation_item_delete')
+
+
+# ========== CONTRÔLE ==========
+
+def detect_drift():
+    """Produits dont `reserved` diffère de la somme de leurs réservations"""
+    totals = StockReservation.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return list(Product.objects.annotate(
+        reservations_total=Coalesce(Subquery(totals), 0),
+    ).exclude(reserved=F('reservations_total')).order_by('reference').values(
+        'id', 'reference', 'reserved', 'reservations_total',
+    ))
+
+
+def rebuild(product_ids=None):
+    """Libère les réservations des commandes fermées, aligne les autres sur leur ligne et
+    recalcule `Product.reserved` depuis les réservations (après une insertion en masse).
+
+    Une ligne ouverte sans réservation a eu son stock prélevé : elle n'est pas réservée.
+    """
+    with transaction.atomic():
+        reservations = StockReservation.objects.all()
+        if product_ids is not None:
+            reservations = reservations.filter(product_id__in=product_ids)
+        reservations.exclude(order_item__order__status__in=OPEN_STATUSES).delete()
+        reservations.exclude(order_item__quantity__gt=0).delete()
+        # Ligne modifiée depuis la réservation : produit et quantité de la ligne
+        line = OrderItem.objects.filter(pk=OuterRef('order_item'))
+        reservations.exclude(product=F('order_item__product'), quantity=F('order_item__quantity')).update(
+            product=Subquery(line.values('product')), quantity=Subquery(line.values('quantity')),
+        )
+        totals = StockReservation.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+            total=Sum('quantity')
+        ).values('total')
+        products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+        transaction.on_commit(lambda: bump_versions('product'))
+        return products.update(reserved=Coalesce(Subquery(totals), 0))
@@ -0,0 +1,187 @@
+"""
+Table des gammes compilée, modèle de capacité de l'ordonnancement.
+
+Les gammes (`RoutingStep`) et les postes de charge (`WorkCenter`) sont chargés
+en trois requêtes puis aplatis en tableaux NumPy contigus au format CSR :
+
+- `offsets[p]:offsets[p + 1]` délimite les opérations du produit d'indice `p`,
+  triées par séquence, dans `setup` / `run` / `step_ids` ;
+- `wc_offsets[s]:wc_offsets[s + 1]` délimite les postes éligibles de
+  l'opération `s` dans `wc_indices` (indices dans `work_center_ids`, le premier
+  étant le poste préféré) ;
+- `total_setup` / `total_run` cumulent les temps de chaque produit.
+
+Le temps de fabrication d'une ligne de commande est donc
+`total_setup[p] + total_run[p] * quantité`, en O(1) et sans requête, et se
+calcule pour des milliers de lignes d'un seul coup (`processing_times`). La
+table est gardée en mémoire par processus et reconstruite quand la version
+`routing` (voir data_versions.py) change.
+"""
+import threading
+
+import numpy as np
+
+from .data_versions import get_versions
+from .models import RoutingStep, WorkCenter
+
+
+class RoutingTable:
+    """Gammes de tous les produits, aplaties en tableaux (temps en minutes)"""
+
+    def __init__(self, product_ids, offsets, step_ids, sequence, setup, run, wc_offsets, wc_indices,
+                 work_center_ids, work_center_codes, work_center_capacity):
+        self.product_ids = product_ids
+        self.offsets = offsets
+        self.step_ids = step_ids
+        self.sequence = sequence
+        self.setup = setup
+        self.run = run
+        self.wc_offsets = wc_offsets
+        self.wc_indices = wc_indices
+        self.work_center_ids = work_center_ids
+        self.work_center_codes = work_center_codes
+        # Minutes productives par jour (capacité x rendement)
+        self.work_center_capacity = work_center_capacity
+
+        # Poste préféré de chaque opération (-1 si aucun poste éligible)
+        self.primary_center = np.full(len(step_ids), -1, dtype=np.int64)
+        has_center = wc_offsets[1:] > wc_offsets[:-1]
+        self.primary_center[has_center] = wc_indices[wc_offsets[:-1][has_center]]
+
+        step_rows = np.repeat(np.arange(len(product_ids)), np.diff(offsets))
+        self.total_setup = np.bincount(step_rows, weights=setup, minlength=len(product_ids))
+        self.total_run = np.bincount(step_rows, weights=run, minlength=len(product_ids))
+        self._index = {pid: i for i, pid in enumerate(product_ids.tolist())}
+        self._center_index = {wid: i for i, wid in enumerate(work_center_ids.tolist())}
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    @property
+    def step_count(self):
+        return len(self.step_ids)
+
+    def row(self, product_id):
+        """Indice d'un produit dans la table, ou None s'il n'a pas de gamme"""
+        return self._index.get(product_id)
+
+    def rows(self, product_ids):
+        """Indices d'un tableau de produits (-1 pour les produits sans gamme)"""
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        if not len(self.product_ids):
+            return np.full(len(product_ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.product_ids, product_ids), len(self.product_ids) - 1)
+        return np.where(self.product_ids[positions] == product_ids, positions, -1)
+
+    def steps(self, product_id):
+        """Tranche des opérations d'un produit (vide s'il n'a pas de gamme)"""
+        i = self._index.get(product_id)
+        if i is None:
+            return slice(0, 0)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def eligible_centers(self, step):
+        """Indices des postes éligibles pour l'opération d'indice `step`"""
+        return self.wc_indices[self.wc_offsets[step]:self.wc_offsets[step + 1]]
+
+    def center_index(self, work_center_id):
+        return self._center_index.get(work_center_id)
+
+    def processing_time(self, product_id, quantity):
+        """Temps total de fabrication (minutes) de `quantity` unités, ou None sans gamme"""
+        i = self.row(product_id)
+        if i is None:
+            return None
+        return float(self.total_setup[i] + self.total_run[i] * quantity)
+
+    def processing_times(self, product_ids, quantities):
+        """Temps de fabrication de chaque ligne (minutes, NaN pour les produits sans gamme)"""
+        rows = self.rows(product_ids)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        times = np.full(len(rows), np.nan)
+        found = rows >= 0
+        times[found] = self.total_setup[rows[found]] + self.total_run[rows[found]] * quantities[found]
+        return times
+
+    def work_center_load(self, product_ids, quantities):
+        """Charge (minutes) par poste, chaque opération étant affectée à son poste préféré"""
+        rows = self.rows(product_ids)
+        quantities = np.asarray(quantities, dtype=np.float64)
+        keep = rows >= 0
+        rows, quantities = rows[keep], quantities[keep]
+        load = np.zeros(len(self.work_center_ids))
+        if not len(rows):
+            return load
+
+        # Indices des opérations de chaque ligne, sans boucle Python
+        counts = self.offsets[rows + 1] - self.offsets[rows]
+        line = np.repeat(np.arange(len(rows)), counts)
+        line_start = np.cumsum(counts) - counts  # position de la 1re opération de chaque ligne dans `steps`
+        steps = np.repeat(self.offsets[rows], counts) + np.arange(len(line)) - np.repeat(line_start, counts)
+        minutes = self.setup[steps] + self.run[steps] * quantities[line]
+        centers = self.primary_center[steps]
+        assigned = centers >= 0
+        np.add.at(load, centers[assigned], minutes[assigned])
+        return load
+
+
+def build_routing_table():
+    """Charge gammes et postes en trois requêtes et compile la table"""
+    centers = list(WorkCenter.objects.filter(is_active=True).order_by('code').values_list(
+        'id', 'code', 'capacity_minutes_per_day', 'efficiency'
+    ))
+    work_center_ids = np.fromiter((c[0] for c in centers), dtype=np.int64, count=len(centers))
+    center_position = {c[0]: i for i, c in enumerate(centers)}
+
+    steps = list(RoutingStep.objects.order_by('product_id', 'sequence').values_list(
+        'id', 'product_id', 'sequence', 'setup_minutes', 'run_minutes'
+    ))
+    eligible = {}
+    # Ordre des postes = ordre des codes : le premier éligible est le poste préféré
+    links = RoutingStep.work_centers.through.objects.values_list('routingstep_id', 'workcenter_id')
+    for step_id, center_id in links:
+        if center_id in center_position:
+            eligible.setdefault(step_id, []).append(center_position[center_id])
+
+    n_steps = len(steps)
+    step_ids = np.fromiter((s[0] for s in steps), dtype=np.int64, count=n_steps)
+    step_products = np.fromiter((s[1] for s in steps), dtype=np.int64, count=n_steps)
+    product_ids, counts = np.unique(step_products, return_counts=True)
+    offsets = np.zeros(len(product_ids) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    wc_lists = [sorted(eligible.get(step_id, ())) for step_id in step_ids.tolist()]
+    wc_offsets = np.zeros(n_steps + 1, dtype=np.int64)
+    np.cumsum([len(positions) for positions in wc_lists], out=wc_offsets[1:])
+
+    return RoutingTable(
+        product_ids=product_ids,
+        offsets=offsets,
+        step_ids=step_ids,
+        sequence=np.fromiter((s[2] for s in steps), dtype=np.int64, count=n_steps),
+        setup=np.fromiter((float(s[3]) for s in steps), dtype=np.float64, count=n_steps),
+        run=np.fromiter((float(s[4]) for s in steps), dtype=np.float64, count=n_steps),
+        wc_offsets=wc_offsets,
+        wc_indices=np.fromiter((i for positions in wc_lists for i in positions), dtype=np.int64,
+                               count=int(wc_offsets[-1])),
+        work_center_ids=work_center_ids,
+        work_center_codes=[c[1] for c in centers],
+        work_center_capacity=np.fromiter((c[2] * float(c[3]) for c in centers), dtype=np.float64,
+                                         count=len(centers)),
+    )
+
+
+_lock = threading.Lock()
+_table = None
+_table_version = None
+
+
+def get_routing_table():
+    """Table des gammes du processus, recompilée quand une gamme ou un poste a changé"""
+    global _table, _table_version
+    version = get_versions(('routing',))['routing']
+    with _lock:
+        if _table is None or _table_version != version:
+            _table = build_routing_table()
+            _table_version = version
+        return _table
@@ -0,0 +1,240 @@
+"""
+Simulation de scénarios « et si » sur le planning, sans écriture en base.
+
+Un scénario est une liste de modifications hypothétiques appliquées à une
+copie du `PlanningSnapshot` (voir scheduling.py) :
+
+    {"name": "Panne ligne 2 mardi", "changes": [
+        {"type": "work_center_down", "work_center": "WC-02", "start": "2026-10-20", "end": "2026-10-20"}]}
+    {"name": "Grosse commande", "changes": [
+        {"type": "add_order", "delivery_date": "2026-11-15", "lines": [{"product": "P-001", "quantity": 500}]}]}
+
+`parse_scenarios` valide la demande et résout les références (postes,
+produits, commandes) ; `evaluate_scenarios` charge le snapshot une fois,
+évalue la référence et chaque scénario en parallèle dans un pool de
+processus (le snapshot est transmis une seule fois à chaque processus) et
+retourne les indicateurs comparés à la référence.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from .scheduling import evaluate, get_snapshot
+
+MAX_SCENARIOS = getattr(settings, 'SCENARIO_MAX', 20)
+WORKERS = getattr(settings, 'SCENARIO_WORKERS', min(4, os.cpu_count() or 1))
+
+
+def _date(change, key):
+    try:
+        return date.fromisoformat(str(change[key])).isoformat()
+    except (KeyError, ValueError):
+        raise ValueError(f"{change['type']} : date '{key}' manquante ou invalide (AAAA-MM-JJ)")
+
+
+def _window(change):
+    start, end = _date(change, 'start'), _date(change, 'end')
+    if end < start:
+        raise ValueError(f"{change['type']} : la fin précède le début")
+    return start, end
+
+
+def _number(change, key, minimum=None):
+    try:
+        value = float(change[key])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{change['type']} : '{key}' doit être un nombre")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{change['type']} : '{key}' doit être supérieur ou égal à {minimum}")
+    return value
+
+
+# ---------- Modifications : validation (données JSON) puis application sur une copie du snapshot ----------
+
+def _parse_work_center_down(change, snapshot):
+    start, end = _window(change)
+    return {'type': 'work_center_down', 'work_center': _center(change, snapshot), 'start': start, 'end': end}
+
+
+def _apply_work_center_down(state, change):
+    center = state.routing.work_center_codes.index(change['work_center'])
+    state.capacity[center, state.days(change['start'], change['end'])] = 0
+
+
+def _parse_capacity(change, snapshot):
+    start, end = _window(change)
+    return {'type': 'capacity', 'work_center': _center(change, snapshot), 'start': start, 'end': end,
+            'factor': _number(change, 'factor', minimum=0)}
+
+
+def _apply_capacity(state, change):
+    center = state.routing.work_center_codes.index(change['work_center'])
+    state.capacity[center, state.days(change['start'], change['end'])] *= change['factor']
+
+
+def _parse_plant_closure(change, snapshot):
+    start, end = _window(change)
+    return {'type': 'plant_closure', 'start': start, 'end': end}
+
+
+def _apply_plant_closure(state, change):
+    state.capacity[:, state.days(change['start'], change['end'])] = 0
+
+
+def _parse_add_order(change, snapshot):
+    lines = change.get('lines')
+    if not isinstance(lines, list) or not lines:
+        raise ValueError("add_order : 'lines' doit être une liste non vide")
+    parsed = []
+    for line in lines:
+        if not isinstance(line, dict):
+            raise ValueError("add_order : chaque ligne doit être un objet {product, quantity}")
+        reference = line.get('product')
+        if reference not in snapshot.product_references:
+            raise ValueError(f"add_order : produit inconnu '{reference}'")
+        parsed.append((snapshot.product_references[reference], _number(dict(line, type='add_order'), 'quantity', 1)))
+    return {'type': 'add_order', 'delivery_date': _date(change, 'delivery_date'), 'lines': parsed,
+            'label': str(change.get('label', 'Commande simulée'))[:50]}
+
+
+def _apply_add_order(state, change):
+    index = state.order_count
+    state.order_ids = np.append(state.order_ids, -(index + 1))
+    state.order_numbers.append(change['label'])
+    state.due = np.append(state.due, state.day(date.fromisoformat(change['delivery_date'])))
+    state.weights = np.append(state.weights, 1.0)  # Valeur inconnue : poids moyen
+    state.line_order = np.append(state.line_order, [index] * len(change['lines']))
+    state.line_product = np.append(state.line_product, [product for product, _ in change['lines']])
+    state.line_quantity = np.append(state.line_quantity, [quantity for _, quantity in change['lines']])
+    # Commande hypothétique : rien n'est encore prélevé
+    state.line_pending = np.append(state.line_pending, [quantity for _, quantity in change['lines']])
+
+
+def _parse_stock(change, snapshot):
+    reference = change.get('product')
+    if reference not in snapshot.product_references:
+        raise ValueError(f"stock : produit inconnu '{reference}'")
+    return {'type': 'stock', 'product': snapshot.product_references[reference],
+            'quantity': _number(change, 'quantity')}
+
+
+def _apply_stock(state, change):
+    state.stock[state.product_index(change['product'])] += change['quantity']
+
+
+def _parse_reschedule(change, snapshot):
+    number = change.get('order')
+    if number not in snapshot.order_numbers:
+        raise ValueError(f"reschedule : commande ouverte inconnue '{number}'")
+    return {'type': 'reschedule', 'order': number, 'delivery_date': _date(change, 'delivery_date')}
+
+
+def _apply_reschedule(state, change):
+    state.due[state.order_numbers.index(change['order'])] = state.day(date.fromisoformat(change['delivery_date']))
+
+
+def _center(change, snapshot):
+    if change.get('work_center') not in snapshot.routing.work_center_codes:
+        raise ValueError(f"{change['type']} : poste de charge actif inconnu '{change.get('work_center')}'")
+    return change['work_center']
+
+
+# type -> (validation, application)
+CHANGES = {
+    'work_center_down': (_parse_work_center_down, _apply_work_center_down),
+    'capacity': (_parse_capacity, _apply_capacity),
+    'plant_closure': (_parse_plant_closure, _apply_plant_closure),
+    'add_order': (_parse_add_order, _apply_add_order),
+    'stock': (_parse_stock, _apply_stock),
+    'reschedule': (_parse_reschedule, _apply_reschedule),
+}
+
+
+def parse_scenarios(spec, snapshot=None):
+    """Valide une liste de scénarios et résout ses références ; ValueError si invalide"""
+    snapshot = snapshot or get_snapshot()
+    if not isinstance(spec, list) or not spec:
+        raise ValueError("'scenarios' doit être une liste non vide")
+    if len(spec) > MAX_SCENARIOS:
+        raise ValueError(f"{MAX_SCENARIOS} scénarios au maximum")
+
+    scenarios = []
+    for position, scenario in enumerate(spec, start=1):
+        if not isinstance(scenario, dict) or not isinstance(scenario.get('changes'), list):
+            raise ValueError(f"Scénario {position} : objet {{name, changes: [...]}} attendu")
+        changes = []
+        for change in scenario['changes']:
+            if not isinstance(change, dict) or change.get('type') not in CHANGES:
+                raise ValueError(
+                    f"Scénario {position} : type de modification inconnu (disponibles : {', '.join(CHANGES)})"
+                )
+            changes.append(CHANGES[change['type']][0](change, snapshot))
+        scenarios.append({'name': str(scenario.get('name') or f'Scénario {position}')[:100], 'changes': changes})
+    return scenarios
+
+
+def apply_changes(snapshot, changes):
+    """Copie du snapshot avec les modifications appliquées"""
+    state = snapshot.copy()
+    for change in changes:
+        CHANGES[change['type']][1](state, change)
+    return state
+
+
+def evaluate_scenario(snapshot, scenario):
+    return evaluate(apply_changes(snapshot, scenario['changes']))
+
+
+# ---------- Pool de processus : le snapshot est transmis une fois par processus ----------
+
+_worker_snapshot = None
+
+
+def _init_worker(snapshot):
+    global _worker_snapshot
+    import django
+    django.setup()  # Sans effet sous fork ; nécessaire sous spawn
+    _worker_snapshot = snapshot
+
+
+def _evaluate_in_worker(scenario):
+    return evaluate_scenario(_worker_snapshot, scenario)
+
+
+def evaluate_scenarios(scenarios, snapshot=None, workers=WORKERS):
+    """Indicateurs de la référence et de chaque scénario, avec les écarts à la référence"""
+    snapshot = snapshot or get_snapshot()
+    if workers > 1 and len(scenarios) > 1:
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus fils
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(workers, len(scenarios) + 1), initializer=_init_worker,
+                                 initargs=(snapshot,)) as pool:
+            baseline = pool.submit(_evaluate_in_worker, {'changes': []})
+            results = list(pool.map(_evaluate_in_worker, scenarios))
+            baseline = baseline.result()
+    else:
+        baseline = evaluate(snapshot)
+        results = [evaluate_scenario(snapshot, scenario) for scenario in scenarios]
+
+    return {
+        'date': snapshot.today.isoformat(),
+        'horizon_days': snapshot.horizon,
+        'baseline': baseline,
+        'scenarios': [
+            {
+                'name': scenario['name'],
+                'kpis': kpis,
+                'delta': {name: kpis[name] - baseline[name] for name in baseline},
+            }
+            for scenario, kpis in zip(scenarios, results)
+        ],
+    }
+
+
+def run_scenarios(scenarios=()):
+    """Tâche de fond `scenarios` (voir jobs.HANDLERS) : scénarios déjà validés par `parse_scenarios`"""
+    return evaluate_scenarios(list(scenarios))
@@ -0,0 +1,239 @@
+"""
+Ordonnancement à capacité finie des commandes ouvertes.
+
+Les commandes confirmées ou en production, le stock, les gammes et les
+événements bloquants sont chargés une fois dans un `PlanningSnapshot` en
+mémoire (tableaux NumPy, sérialisable pour un pool de processus). Aucune
+écriture en base : les simulations travaillent sur des copies.
+
+`schedule` place les commandes dans l'ordre donné (par défaut EDD : date de
+livraison la plus proche d'abord). Chaque opération de chaque ligne est
+placée au plus tôt, après l'opération précédente, sur celui de ses postes
+éligibles qui la termine le plus tôt ; la capacité journalière du poste est
+consommée (une somme cumulée par opération, sans boucle sur les jours).
+Les jours couverts par une maintenance, une panne ou un congé n'ont pas de
+capacité.
+
+`evaluate` en déduit les indicateurs : retards (bruts et pondérés par la
+valeur des commandes), commandes en retard, ruptures de stock (demande
+ouverte servie par date de livraison). Le stock des lignes présentes à
+l'ouverture d'une commande est déjà sorti de `current_stock` : seule la
+quantité encore à prélever (`line_pending`, la réservation de la ligne)
+est confrontée au stock.
+"""
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+HORIZON_DAYS = getattr(settings, 'SCHEDULING_HORIZON_DAYS', 180)
+OPEN_STATUSES = ('confirmed', 'in_production')
+
+
+class PlanningSnapshot:
+    """Données de planification figées ; `copy` donne un état modifiable indépendant"""
+
+    def __init__(self, today, horizon, order_ids, order_numbers, due, weights, line_order, line_product,
+                 line_quantity, line_pending, product_ids, stock, product_references, routing, capacity):
+        self.today = today
+        self.horizon = horizon
+        self.order_ids = order_ids          # identifiants (négatifs pour les commandes hypothétiques)
+        self.order_numbers = order_numbers
+        self.due = due                      # date de livraison, en jours depuis `today` (négatif = déjà en retard)
+        self.weights = weights              # poids du retard : valeur de la commande / valeur moyenne
+        self.line_order = line_order        # indice de commande de chaque ligne
+        self.line_product = line_product    # identifiant produit de chaque ligne
+        self.line_quantity = line_quantity
+        self.line_pending = line_pending    # quantité de la ligne dont le stock n'est pas encore sorti
+        self.product_ids = product_ids      # triés
+        self.stock = stock
+        self.product_references = product_references
+        self.routing = routing
+        self.capacity = capacity            # minutes disponibles (postes x jours)
+
+    def copy(self):
+        """Copie des tableaux modifiables par un scénario ; la gamme reste partagée"""
+        return PlanningSnapshot(
+            self.today, self.horizon, self.order_ids.copy(), list(self.order_numbers), self.due.copy(),
+            self.weights.copy(), self.line_order.copy(), self.line_product.copy(), self.line_quantity.copy(),
+            self.line_pending.copy(), self.product_ids, self.stock.copy(), self.product_references, self.routing, self.capacity.copy(),
+        )
+
+    @property
+    def order_count(self):
+        return len(self.order_ids)
+
+    def day(self, value):
+        """Jour (décalage depuis `today`) d'une date ou d'une chaîne ISO"""
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        return (value - self.today).days
+
+    def days(self, start, end):
+        """Tranche de jours [start, end] bornée à l'horizon"""
+        return slice(max(self.day(start), 0), max(min(self.day(end) + 1, self.horizon), 0))
+
+    def product_index(self, product_id):
+        i = int(np.searchsorted(self.product_ids, product_id))
+        if i >= len(self.product_ids) or self.product_ids[i] != product_id:
+            raise ValueError(f"Produit inconnu : {product_id}")
+        return i
+
+
+def load_snapshot(today=None, horizon=HORIZON_DAYS):
+    """Charge commandes ouvertes, stock, gammes et événements bloquants"""
+    from .intervals import BLOCKING_TYPES, event_index
+    from .models import Order, OrderItem, Product
+    from .routing import get_routing_table
+
+    today = today or timezone.localdate()
+    orders = list(Order.objects.filter(status__in=OPEN_STATUSES).order_by('id').values_list(
+        'id', 'order_number', 'delivery_date', 'total_amount'
+    ))
+    order_ids = np.fromiter((o[0] for o in orders), dtype=np.int64, count=len(orders))
+    # Ligne sans réservation : stock prélevé à l'ouverture de la commande (reservations.py)
+    lines = list(OrderItem.objects.filter(order__status__in=OPEN_STATUSES).values_list(
+        'order_id', 'product_id', 'quantity', 'reservation__quantity'
+    ))
+    products = list(Product.objects.order_by('id').values_list('id', 'reference', 'current_stock'))
+
+    values = np.fromiter((max(float(o[3]), 1.0) for o in orders), dtype=np.float64, count=len(orders))
+
+    routing = get_routing_table()
+    capacity = np.repeat(routing.work_center_capacity[:, None], horizon, axis=1)
+    for event in event_index.overlapping(today, today + timedelta(days=horizon - 1), BLOCKING_TYPES):
+        capacity[:, max((event.start_date - today).days, 0):(event.end_date - today).days + 1] = 0
+
+    return PlanningSnapshot(
+        today=today,
+        horizon=horizon,
+        order_ids=order_ids,
+        order_numbers=[o[1] for o in orders],
+        due=np.fromiter(((o[2] - today).days for o in orders), dtype=np.int64, count=len(orders)),
+        weights=values / values.mean() if len(values) else values,
+        line_order=np.searchsorted(order_ids, np.fromiter((l[0] for l in lines), dtype=np.int64, count=len(lines))),
+        line_product=np.fromiter((l[1] for l in lines), dtype=np.int64, count=len(lines)),
+        line_quantity=np.fromiter((l[2] for l in lines), dtype=np.float64, count=len(lines)),
+        line_pending=np.fromiter((l[3] or 0 for l in lines), dtype=np.float64, count=len(lines)),
+        product_ids=np.fromiter((p[0] for p in products), dtype=np.int64, count=len(products)),
+        stock=np.fromiter((p[2] for p in products), dtype=np.float64, count=len(products)),
+        product_references={p[1]: p[0] for p in products},
+        routing=routing,
+        capacity=capacity,
+    )
+
+
+_lock = threading.Lock()
+_snapshot = None
+_snapshot_key = None
+
+
+def get_snapshot():
+    """Snapshot du processus, rechargé quand commandes, stock, gammes ou planning ont changé, y compris
+    dans un autre processus (versions partagées en base, voir data_versions.py)"""
+    from .data_versions import get_versions
+
+    global _snapshot, _snapshot_key
+    today = timezone.localdate()
+    key = (today, tuple(sorted(get_versions(('order', 'product', 'stock', 'planning', 'routing')).items())))
+    with _lock:
+        if _snapshot is None or _snapshot_key != key:
+            _snapshot = load_snapshot(today)
+            _snapshot_key = key
+        return _snapshot
+
+
+def edd_sequence(snapshot):
+    """Ordre EDD : date de livraison croissante, puis identifiant"""
+    return np.lexsort((snapshot.order_ids, snapshot.due))
+
+
+def _place(capacity, center, start, minutes):
+    """Jour de fin d'une opération placée au plus tôt à partir de `start`, sans consommer (None si hors horizon)"""
+    available = np.cumsum(capacity[center, start:])
+    k = int(np.searchsorted(available, minutes - 1e-9))
+    return None if k >= len(available) else start + k
+
+
+def _consume(capacity, center, start, end, minutes):
+    used = capacity[center, start:end].sum()
+    capacity[center, start:end] = 0
+    capacity[center, end] -= minutes - used
+
+
+def schedule(snapshot, sequence=None, capacity=None):
+    """Jour de fin de chaque commande (décalage depuis `today`, `horizon` si non planifiable).
+
+    `capacity` est consommée sur place (copie de `snapshot.capacity` par défaut).
+    """
+    routing = snapshot.routing
+    capacity = snapshot.capacity.copy() if capacity is None else capacity
+    sequence = edd_sequence(snapshot) if sequence is None else sequence
+    completion = np.zeros(snapshot.order_count, dtype=np.int64)
+
+    rows = routing.rows(snapshot.line_product)
+    lines_by_order = np.argsort(snapshot.line_order, kind='stable')
+    line_offsets = np.searchsorted(snapshot.line_order[lines_by_order], np.arange(snapshot.order_count + 1))
+
+    for order in sequence.tolist():
+        finish_order = 0
+        for line in lines_by_order[line_offsets[order]:line_offsets[order + 1]].tolist():
+            row = rows[line]
+            if row < 0:
+                continue  # Produit sans gamme : pas de fabrication
+            day = 0
+            quantity = snapshot.line_quantity[line]
+            for step in range(routing.offsets[row], routing.offsets[row + 1]):
+                minutes = routing.setup[step] + routing.run[step] * quantity
+                if minutes <= 0:
+                    continue
+                best = None
+                for center in routing.eligible_centers(step).tolist():
+                    end = _place(capacity, center, day, minutes)
+                    if end is not None and (best is None or end < best[1]):
+                        best = (center, end)
+                if best is None:
+                    day = snapshot.horizon
+                    break
+                _consume(capacity, best[0], day, best[1], minutes)
+                day = best[1]
+            finish_order = max(finish_order, day)
+        completion[order] = finish_order
+    return completion
+
+
+def stockouts(snapshot):
+    """Lignes non couvertes par le stock quand la demande encore à prélever est servie par date de livraison"""
+    product_idx = np.searchsorted(snapshot.product_ids, snapshot.line_product)
+    order = np.lexsort((snapshot.line_order, snapshot.due[snapshot.line_order], product_idx))
+    sorted_products = product_idx[order]
+    cumulative = np.cumsum(snapshot.line_pending[order])
+    group_start = np.searchsorted(sorted_products, sorted_products)
+    # Demande cumulée par produit (remise à zéro au premier élément de chaque produit)
+    previous = np.where(group_start > 0, cumulative[group_start - 1], 0.0)
+    short = (snapshot.line_pending[order] > 0) & ((cumulative - previous) > snapshot.stock[sorted_products])
+    short_lines = np.zeros(len(product_idx), dtype=bool)
+    short_lines[order] = short
+    return short_lines
+
+
+def evaluate(snapshot, sequence=None):
+    """Indicateurs d'un état de planification (aucune écriture en base)"""
+    completion = schedule(snapshot, sequence)
+    # Une commande déjà en retard (due < 0) l'est au moins depuis sa date de livraison
+    tardiness = np.maximum(completion - snapshot.due, 0)
+    short_lines = stockouts(snapshot)
+    return {
+        'orders': int(snapshot.order_count),
+        'delayed_orders': int(np.count_nonzero(tardiness)),
+        'total_tardiness_days': int(tardiness.sum()),
+        'weighted_tardiness': round(float(np.sum(snapshot.weights * tardiness)), 2),
+        'max_tardiness_days': int(tardiness.max()) if len(tardiness) else 0,
+        'unscheduled_orders': int(np.count_nonzero(completion >= snapshot.horizon)),
+        'makespan_days': int(completion.max()) if len(completion) else 0,
+        'stockout_lines': int(np.count_nonzero(short_lines)),
+        'stockout_orders': int(len(np.unique(snapshot.line_order[short_lines]))),
+        'stockout_products': int(len(np.unique(snapshot.line_product[short_lines]))),
+    }
@@ -0,0 +1,465 @@
+"""
+Génération de données synthétiques à l'échelle de la production.
+
+Base commune de la commande `seed_scale` et des bancs d'essai. Les volumes
+sont configurables et le résultat est déterministe pour une graine et une
+date de fin données :
+
+- saisonnalité des commandes : creux le week-end, pic annuel en fin d'année
+  et croissance légère sur la période ;
+- clients et produits suivent une loi de Zipf (environ 20 % des clients font
+  80 % des commandes) ;
+- l'historique des statuts suit le cycle de vie de chaque commande ; environ
+  une expédition sur cinq part après la date de livraison prévue ;
+- les réceptions fournisseurs suivent la consommation : à chaque revue de
+  stock, un produit arrivé à son point de commande (`min_stock`) est
+  recomplété jusqu'à `max_stock` (ou de sa quantité minimale de commande,
+  supérieure pour quelques produits), après un délai fournisseur ; le stock
+  final va de la rupture au surstock ;
+- le journal de stock est cohérent : `current_stock` est exactement la somme
+  des `delta`, comme le vérifie `reconcile_stock`.
+
+Toutes les insertions passent par `bulk_create` par lots.
+"""
+import heapq
+import math
+import random
+from contextlib import contextmanager
+from itertools import accumulate
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .ledger import compute_delta, default_location
+from .models import (
+    BOMLine, Customer, CustomUser, Notification, Order, OrderItem, OrderStatusTransition, PlanningEvent, Product,
+    RoutingStep, StockBalance, StockMovement, StockSnapshot, WorkCenter,
+)
+
+PREFIX = 'SEED'
+ROLES = ['admin', 'manager', 'supervisor', 'operator']
+ZIPF_EXPONENT = 1.1  # ~80/20 sur quelques milliers de clients
+BATCH_SIZE = 2000
+
+DEFAULT_VOLUMES = {
+    'customers': 2_000,
+    'products': 5_000,
+    'orders': 50_000,
+    'movements': 20_000,  # Revues de stock fournisseur (réception si besoin), en plus des sorties des commandes
+    'events': 500,
+    'notifications': 5_000,
+    'work_centers': 12,  # Chaque produit reçoit une gamme de 1 à 5 opérations sur ces postes
+    'bom_levels': 5,  # Nomenclatures : la moitié des produits de chaque niveau sauf le dernier sont des assemblages
+    'days': 730,
+}
+OPERATIONS = ['Découpe', 'Usinage', 'Soudure', 'Assemblage', 'Peinture', 'Contrôle', 'Emballage']
+
+
+def zipf_weights(n, exponent=ZIPF_EXPONENT):
+    """Poids décroissants 1/rang^s : quelques éléments concentrent l'essentiel de l'activité"""
+    return [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def daily_weights(start, days):
+    """Poids de chaque jour : semaine, saison (pic en novembre-décembre) et tendance"""
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weekly = 0.25 if day.weekday() >= 5 else 1.0
+        seasonal = 1.0 + 0.35 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 335) / 365.25)
+        trend = 1.0 + 0.3 * offset / max(days - 1, 1)
+        weights.append(weekly * seasonal * trend)
+    return weights
+
+
+@contextmanager
+def preserve_timestamps(*models):
+    """Désactive temporairement `auto_now_add` sur `created_at` pour insérer un historique daté"""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _random_time(rng, day, tz, now):
+    """Heure ouvrée aléatoire du jour `day`, jamais postérieure à `now` (le dernier jour est aujourd'hui)"""
+    moment = datetime.combine(day, time(hour=rng.randint(7, 18), minute=rng.randint(0, 59)))
+    return min(timezone.make_aware(moment, tz), now)
+
+
+def _order_status(rng, delivery_date, end):
+    """Statut plausible selon la date de livraison prévue"""
+    if delivery_date < end - timedelta(days=7):
+        choices, weights = ['delivered', 'shipped', 'cancelled', 'in_production'], [85, 5, 7, 3]
+    elif delivery_date < end:
+        choices, weights = ['shipped', 'delivered', 'in_production', 'confirmed', 'cancelled'], [40, 30, 20, 5, 5]
+    else:
+        choices, weights = ['draft', 'confirmed', 'in_production', 'cancelled'], [20, 40, 35, 5]
+    return rng.choices(choices, weights)[0]
+
+
+# Statuts traversés pour atteindre le statut final (à partir de 'draft')
+STATUS_PATHS = {
+    'draft': [],
+    'confirmed': ['confirmed'],
+    'in_production': ['confirmed', 'in_production'],
+    'shipped': ['confirmed', 'in_production', 'shipped'],
+    'delivered': ['confirmed', 'in_production', 'shipped', 'delivered'],
+    'cancelled': ['cancelled'],
+}
+
+
+def _status_history(rng, status, created_at, confirmed_at, delivery_date, tz, now):
+    """Transitions datées [(ancien statut, nouveau statut, horodatage)] jusqu'au statut final"""
+    history = [('', 'draft', created_at)]
+    at = created_at
+    for new_status in STATUS_PATHS[status]:
+        if new_status == 'confirmed':
+            moment = confirmed_at
+        elif new_status == 'in_production':
+            moment = at + timedelta(hours=rng.randint(4, 72))
+        elif new_status == 'shipped':
+            # Expédition autour de la date prévue : en avance ou à l'heure le plus souvent
+            moment = _random_time(rng, delivery_date + timedelta(days=rng.choices(
+                [-3, -2, -1, 0, 1, 2, 5, 10], [15, 20, 25, 23, 7, 5, 3, 2],
+            )[0]), tz, now)
+        elif new_status == 'delivered':
+            moment = at + timedelta(hours=rng.randint(12, 96))
+        else:
+            moment = at + timedelta(hours=rng.randint(1, 120))
+        at = min(max(moment, at), now)
+        history.append((history[-1][1], new_status, at))
+    return history
+
+
+def clear_seeded_data(prefix=PREFIX):
+    """Supprime les données générées précédemment avec ce préfixe"""
+    with transaction.atomic():
+        Order.objects.filter(order_number__startswith=f'{prefix}-').delete()
+        # Les composants sont protégés (on_delete=PROTECT) : supprimer les nomenclatures d'abord
+        BOMLine.objects.filter(parent__reference__startswith=f'{prefix}-').delete()
+        Product.objects.filter(reference__startswith=f'{prefix}-').delete()
+        Customer.objects.filter(email__endswith=f'@{prefix.lower()}.example.com').delete()
+        PlanningEvent.objects.filter(title__startswith=f'[{prefix}]').delete()
+        WorkCenter.objects.filter(code__startswith=f'{prefix}-').delete()
+        CustomUser.objects.filter(username__startswith=f'{prefix.lower()}_').delete()
+
+
+def seed_scale(customers=DEFAULT_VOLUMES['customers'], products=DEFAULT_VOLUMES['products'],
+               orders=DEFAULT_VOLUMES['orders'], movements=DEFAULT_VOLUMES['movements'],
+               events=DEFAULT_VOLUMES['events'], notifications=DEFAULT_VOLUMES['notifications'],
+               work_centers=DEFAULT_VOLUMES['work_centers'], bom_levels=DEFAULT_VOLUMES['bom_levels'], days=DEFAULT_VOLUMES['days'], seed=42, end=None, password='password123',
+               prefix=PREFIX, batch_size=BATCH_SIZE, log=None):
+    """Génère un jeu de données complet et retourne le nombre de lignes créées par table"""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    tz = timezone.get_current_timezone()
+    now = timezone.now()
+    end = end or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    counts = {}
+
+    # ---------- Utilisateurs (un par rôle) ----------
+    password_hash = make_password(password)
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'{prefix.lower()}_{role}', email=f'{role}@{prefix.lower()}.example.com', role=role,
+            password=password_hash, is_staff=role == 'admin', is_superuser=role == 'admin',
+        )
+        for role in ROLES
+    ])
+    users = {user.role: user for user in CustomUser.objects.filter(username__startswith=f'{prefix.lower()}_')}
+    counts['users'] = len(users)
+
+    # ---------- Clients ----------
+    Customer.objects.bulk_create([
+        Customer(
+            name=f'Client {i:06d}', email=f'client{i}@{prefix.lower()}.example.com',
+            phone=f'06{rng.randint(0, 99_999_999):08d}', address=f'{rng.randint(1, 200)} rue du Commerce',
+        )
+        for i in range(customers)
+    ], batch_size=batch_size)
+    customer_ids = list(Customer.objects.filter(
+        email__endswith=f'@{prefix.lower()}.example.com'
+    ).order_by('id').values_list('id', flat=True))
+    counts['customers'] = len(customer_ids)
+    log(f"{len(customer_ids)} clients")
+
+    # ---------- Produits ----------
+    product_rows = []
+    for i in range(products):
+        price = Decimal(str(round(rng.lognormvariate(3.5, 1.0), 2))).quantize(Decimal('0.01'))
+        min_stock = rng.randint(5, 50)
+        product_rows.append(Product(
+            reference=f'{prefix}-P{i:06d}', name=f'Produit {i:06d}', price=max(price, Decimal('0.50')),
+            min_stock=min_stock, max_stock=min_stock * rng.randint(4, 10), current_stock=0,
+        ))
+    Product.objects.bulk_create(product_rows, batch_size=batch_size)
+    product_list = list(Product.objects.filter(
+        reference__startswith=f'{prefix}-'
+    ).order_by('reference').values_list('id', 'price', 'min_stock', 'max_stock'))
+    product_ids = [p[0] for p in product_list]
+    product_prices = [p[1] for p in product_list]
+    counts['products'] = len(product_ids)
+    log(f"{len(product_ids)} produits")
+
+    # Popularité : rang aléatoire (sinon les premiers produits créés seraient toujours les meilleurs)
+    product_popularity = zipf_weights(len(product_ids))
+    rng.shuffle(product_popularity)
+    customer_popularity = zipf_weights(len(customer_ids))
+    rng.shuffle(customer_popularity)
+    # Poids cumulés calculés une fois : random.choices les recalculerait à chaque tirage
+    product_cum = list(accumulate(product_popularity))
+    customer_cum = list(accumulate(customer_popularity))
+
+    # ---------- Commandes et lignes ----------
+    order_days = sorted(rng.choices(range(days), daily_weights(start, days), k=orders))
+    history_rng = random.Random(seed + 1)  # Tirages séparés : les commandes restent celles des versions précédentes
+    stock_events = []  # (horodatage, index produit, type, quantité, client, motif)
+    counts['orders'] = counts['order_items'] = counts['order_transitions'] = 0
+
+    with preserve_timestamps(Order, StockMovement, Notification):
+        for batch_start in range(0, orders, batch_size):
+            batch = []
+            batch_items = []
+            batch_history = []
+            for n in range(batch_start, min(batch_start + batch_size, orders)):
+                created_day = start + timedelta(days=order_days[n])
+                created_at = _random_time(rng, created_day, tz, now)
+                delivery_date = created_day + timedelta(days=rng.randint(3, 30))
+                customer_id = rng.choices(customer_ids, cum_weights=customer_cum)[0]
+                order_number = f'{prefix}-{n:08d}'
+
+                lines = []
+                for product_idx in set(rng.choices(range(len(product_ids)), cum_weights=product_cum, k=rng.randint(1, 5))):
+                    lines.append((product_idx, rng.randint(1, 20)))
+                total = sum(product_prices[idx] * qty for idx, qty in lines)
+
+                status = _order_status(rng, delivery_date, end)
+                batch.append(Order(
+                    order_number=order_number, customer_id=customer_id, status=status,
+                    created_at=created_at, delivery_date=delivery_date, total_amount=total,
+                ))
+                batch_items.append(lines)
+
+                # Le stock sort à la confirmation (voir Order.update_stock_on_confirm) : pas de réservation
+                confirmed_at = None
+                if status not in ('draft', 'cancelled'):
+                    confirmed_at = min(created_at + timedelta(hours=rng.randint(1, 48)), now)
+                    for idx, qty in lines:
+                        stock_events.append((confirmed_at, idx, 'out', qty, customer_id, f'Commande {order_number}'))
+                batch_history.append(_status_history(
+                    history_rng, status, created_at, confirmed_at, delivery_date, tz, now,
+                ))
+
+            Order.objects.bulk_create(batch, batch_size=batch_size)
+            if batch[0].pk is None:  # Bases sans RETURNING : on relit les identifiants
+                ids = dict(Order.objects.filter(
+                    order_number__in=[o.order_number for o in batch]
+                ).values_list('order_number', 'id'))
+                for order in batch:
+                    order.pk = order.id = ids[order.order_number]
+
+            items = [
+                OrderItem(order_id=order.pk, product_id=product_ids[idx], quantity=qty, unit_price=product_prices[idx])
+                for order, lines in zip(batch, batch_items)
+                for idx, qty in lines
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=batch_size)
+            transitions = [
+                OrderStatusTransition(
+                    order_id=order.pk, from_status=old_status, to_status=new_status, changed_at=changed_at,
+                    duration=changed_at - history[i - 1][2] if i else None,
+                )
+                for order, history in zip(batch, batch_history)
+                for i, (old_status, new_status, changed_at) in enumerate(history)
+            ]
+            OrderStatusTransition.objects.bulk_create(transitions, batch_size=batch_size)
+            counts['orders'] += len(batch)
+            counts['order_items'] += len(items)
+            counts['order_transitions'] += len(transitions)
+        log(f"{counts['orders']} commandes, {counts['order_items']} lignes")
+
+        # ---------- Journal de stock ----------
+        # Stock d'ouverture (au plus max_stock), puis revues de stock tirées selon la popularité : un
+        # produit au point de commande est recommandé jusqu'à max_stock (position à la commande), ou de
+        # sa quantité minimale de commande si elle est supérieure, et reçu après le délai fournisseur.
+        # Une réception attendue après `now` est une commande encore en cours : pas de mouvement.
+        opening = min(timezone.make_aware(datetime.combine(start, time(hour=6)), tz), now)
+        supply_rng = random.Random(seed + 3)  # Tirages séparés pour la politique d'approvisionnement
+        receipt = 'Réception fournisseur'
+        minimum_order = [
+            supply_rng.randint(max_stock // 2, 2 * max_stock) if supply_rng.random() < 0.15 else 0
+            for _, _, _, max_stock in product_list
+        ]
+        for idx, (_, _, min_stock, max_stock) in enumerate(product_list):
+            stock_events.append((opening, idx, 'in', min(min_stock * rng.randint(2, 6), max_stock), None, 'Stock initial'))
+        for product_idx, day in zip(
+            rng.choices(range(len(product_ids)), cum_weights=product_cum, k=movements),
+            rng.choices(range(days), k=movements),
+        ):
+            stock_events.append((
+                _random_time(rng, start + timedelta(days=day), tz, now), product_idx, 'review', 0, None, receipt,
+            ))
+        # File par horodatage ; le rang départage les égalités et conserve l'ordre d'insertion
+        queue = [(event[0], rank, *event[1:]) for rank, event in enumerate(stock_events)]
+        heapq.heapify(queue)
+        rank = len(queue)
+
+        # Les photos de stock existantes doivent couvrir aussi les produits générés, sinon
+        # l'historique antidaté serait ignoré par stock_levels_at (voir ledger.py)
+        snapshot_times = list(StockSnapshot.objects.filter(
+            taken_at__gte=opening
+        ).order_by('taken_at').values_list('taken_at', flat=True).distinct())
+        snapshot_rows = []
+
+        def photograph(taken_at):
+            snapshot_rows.extend(
+                StockSnapshot(product_id=pid, quantity=qty, taken_at=taken_at) for pid, qty in zip(product_ids, stock)
+            )
+
+        stock = [0] * len(product_ids)
+        on_order = [False] * len(product_ids)
+        manager = users['manager']
+        location = default_location()  # Tout le stock généré est à l'emplacement par défaut
+        rows = []
+        counts['stock_movements'] = 0
+        while queue:
+            at, _, idx, movement_type, quantity, customer_id, reason = heapq.heappop(queue)
+            _, _, min_stock, max_stock = product_list[idx]
+            if movement_type == 'review':
+                if not on_order[idx] and stock[idx] <= min_stock:
+                    on_order[idx] = True
+                    arrival = at + timedelta(days=supply_rng.randint(2, 10))
+                    if arrival <= now:
+                        quantity = max(max_stock - stock[idx], minimum_order[idx])
+                        heapq.heappush(queue, (arrival, rank, idx, 'in', quantity, None, reason))
+                        rank += 1
+                continue
+            if reason == receipt:
+                on_order[idx] = False
+            while snapshot_times and snapshot_times[0] < at:
+                photograph(snapshot_times.pop(0))
+            delta = compute_delta(movement_type, quantity, stock[idx])
+            stock[idx] += delta
+            rows.append(StockMovement(
+                product_id=product_ids[idx], location=location, movement_type=movement_type, quantity=quantity,
+                delta=delta, reason=reason, created_at=at, user=manager, customer_id=customer_id,
+            ))
+            counts['stock_movements'] += 1
+            if len(rows) >= batch_size:
+                StockMovement.objects.bulk_create(rows)
+                rows = []
+        StockMovement.objects.bulk_create(rows)
+        for taken_at in snapshot_times:
+            photograph(taken_at)
+        StockSnapshot.objects.bulk_create(snapshot_rows, batch_size=batch_size)
+
+        # current_stock et soldes par emplacement = projections exactes du journal
+        Product.objects.bulk_update(
+            [Product(id=pid, current_stock=qty) for pid, qty in zip(product_ids, stock)],
+            ['current_stock'], batch_size=batch_size,
+        )
+        StockBalance.objects.bulk_create(
+            [StockBalance(product_id=pid, location=location, quantity=qty) for pid, qty in zip(product_ids, stock)],
+            batch_size=batch_size,
+        )
+        log(f"{counts['stock_movements']} mouvements de stock")
+
+        # ---------- Planning ----------
+        event_types = ['production', 'maintenance', 'meeting', 'breakdown', 'holiday']
+        event_weights = [50, 20, 15, 5, 10]
+        planning = []
+        for i in range(events):
+            event_type = rng.choices(event_types, event_weights)[0]
+            event_start = start + timedelta(days=rng.randrange(days + 60))
+            planning.append(PlanningEvent(
+                title=f'[{prefix}] {event_type.capitalize()} {i:05d}', description='',
+                event_type=event_type, start_date=event_start,
+                end_date=event_start + timedelta(days=rng.randint(0, 4)),
+                created_by=users[rng.choice(['admin', 'manager', 'supervisor'])],
+            ))
+        PlanningEvent.objects.bulk_create(planning, batch_size=batch_size)
+        counts['planning_events'] = len(planning)
+
+        # ---------- Notifications (les plus anciennes sont lues) ----------
+        notification_types = ['delayed_order', 'upcoming_delivery', 'low_stock', 'system', 'info']
+        user_list = list(users.values())
+        rows = []
+        for _ in range(notifications):
+            day = rng.randrange(days)
+            rows.append(Notification(
+                user=rng.choice(user_list), title='Notification générée',
+                message='Message généré pour les tests de charge',
+                notification_type=rng.choice(notification_types),
+                is_read=day < days - 7 or rng.random() < 0.3,
+                created_at=_random_time(rng, start + timedelta(days=day), tz, now),
+            ))
+        Notification.objects.bulk_create(rows, batch_size=batch_size)
+        counts['notifications'] = len(rows)
+
+    # ---------- Postes de charge et gammes ----------
+    # Générateur distinct : ajouter les gammes ne modifie pas les données générées ci-dessus
+    routing_rng = random.Random(seed + 1)
+    WorkCenter.objects.bulk_create([
+        WorkCenter(
+            code=f'{prefix}-WC{i:03d}', name=f'Poste {i:03d}',
+            capacity_minutes_per_day=routing_rng.choice([480, 960, 1440]),
+            efficiency=Decimal(str(routing_rng.choice([0.75, 0.85, 0.9, 0.95]))),
+        )
+        for i in range(work_centers)
+    ])
+    center_ids = list(WorkCenter.objects.filter(
+        code__startswith=f'{prefix}-'
+    ).order_by('code').values_list('id', flat=True))
+    counts['work_centers'] = len(center_ids)
+
+    if center_ids:
+        steps = []
+        for pid in product_ids:
+            for sequence, operation in enumerate(
+                sorted(routing_rng.sample(range(len(OPERATIONS)), routing_rng.randint(1, 5))), start=1
+            ):
+                steps.append(RoutingStep(
+                    product_id=pid, sequence=sequence * 10, operation=OPERATIONS[operation],
+                    setup_minutes=Decimal(routing_rng.choice([0, 10, 15, 30, 60])),
+                    run_minutes=Decimal(str(round(routing_rng.lognormvariate(0.5, 0.8), 3))),
+                ))
+        RoutingStep.objects.bulk_create(steps, batch_size=batch_size)
+        step_ids = RoutingStep.objects.filter(
+            product__reference__startswith=f'{prefix}-'
+        ).order_by('id').values_list('id', flat=True)
+        Link = RoutingStep.work_centers.through
+        Link.objects.bulk_create([
+            Link(routingstep_id=step_id, workcenter_id=center_id)
+            for step_id in step_ids.iterator(chunk_size=batch_size)
+            for center_id in routing_rng.sample(center_ids, min(len(center_ids), routing_rng.randint(1, 3)))
+        ], batch_size=batch_size)
+        counts['routing_steps'] = len(steps)
+        log(f"{len(center_ids)} postes de charge, {len(steps)} opérations de gamme")
+
+    # ---------- Nomenclatures (acycliques : composants pris dans les niveaux inférieurs) ----------
+    bom_rng = random.Random(seed + 2)
+    tiers = [product_ids[i::bom_levels] for i in range(bom_levels)] if bom_levels > 1 else []
+    lines = []
+    for tier, parents in enumerate(tiers[:-1]):
+        lower = [pid for below in tiers[tier + 1:] for pid in below]
+        for parent in parents:
+            if bom_rng.random() < 0.5:
+                for component in bom_rng.sample(lower, min(len(lower), bom_rng.randint(2, 4))):
+                    lines.append(BOMLine(
+                        parent_id=parent, component_id=component,
+                        quantity_per=Decimal(bom_rng.choice(['1', '1', '2', '4', '0.5'])),
+                    ))
+    BOMLine.objects.bulk_create(lines, batch_size=batch_size)
+    counts['bom_lines'] = len(lines)
+    log(f"{len(lines)} lignes de nomenclature")
+
+    return counts
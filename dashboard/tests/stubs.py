@@ -0,0 +1,93 @@
+"""Serveurs HTTP locaux simulés pour les tests et les bancs d'essai"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubModelServer:
+    """Serveur /v1/chat/completions local qui répond `reply` après `delay` secondes (503 si `fail`)
+    et enregistre les requêtes.
+
+        with StubModelServer(reply='Stock OK') as server:
+            LocalModelEngine(url=server.url).answer(question, context)
+    """
+
+    def __init__(self, reply='Réponse du modèle', fail=False, delay=0):
+        self.reply = reply
+        self.fail = fail
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                with stub._lock:
+                    stub.requests.append(body)
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                content = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': stub.reply}}]})
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(content.encode('utf-8'))
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}/v1/chat/completions'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class StubWebhookServer:
+    """Serveur HTTP local qui enregistre les lots reçus ; `fail_first` requêtes répondent 503.
+
+        with StubWebhookServer() as server:
+            dispatch(sinks={'hook': WebhookSink(server.url)}, burst=True)
+            server.events  # événements reçus
+    """
+
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.requests = 0
+        self.events = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                    if not failing:
+                        stub.events.extend(json.loads(body)['events'])
+                self.send_response(503 if failing else 204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}/events'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
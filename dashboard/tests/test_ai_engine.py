@@ -0,0 +1,105 @@
+import threading
+import urllib.error
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from dashboard import ai_engine
+from dashboard.ai_engine import LocalModelEngine, RuleEngine, answer_question
+from dashboard.analytics import get_current_business_context
+from dashboard.tests.stubs import StubModelServer
+
+
+class AnswerEngineTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.context = get_current_business_context()
+
+    def ask_concurrently(self, engine, question, count=10):
+        """Pose `count` fois la même question en parallèle ; retourne (réponses, erreurs)"""
+        answers, errors = [], []
+
+        def ask():
+            try:
+                answers.append(answer_question(question, self.context, engine=engine))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=ask) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return answers, errors
+
+
+class AnswerCacheTests(AnswerEngineTestCase):
+    """Réponses servies par le cache tant que la question normalisée et le contexte sont identiques"""
+
+    def test_normalized_question_is_served_from_cache(self):
+        with StubModelServer(reply='Stock OK') as server:
+            engine = LocalModelEngine(url=server.url, timeout=5)
+            self.assertEqual(answer_question('État du stock ?', self.context, engine=engine), 'Stock OK')
+            self.assertEqual(answer_question('  état du STOCK ?  ', self.context, engine=engine), 'Stock OK')
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0]['messages'][-1]['content'], 'état du stock ?')
+
+    def test_context_change_misses_cache(self):
+        with StubModelServer(reply='Stock OK') as server:
+            engine = LocalModelEngine(url=server.url, timeout=5)
+            answer_question('État du stock ?', self.context, engine=engine)
+            answer_question('État du stock ?', {**self.context, 'total_products': 99}, engine=engine)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_accents_are_distinct_keys(self):
+        rules = RuleEngine()
+        self.assertNotEqual(
+            answer_question('problème', self.context, engine=rules),
+            answer_question('probleme', self.context, engine=rules),
+        )
+
+
+class CoalescingTests(AnswerEngineTestCase):
+    """Les questions identiques simultanées partagent un seul appel au modèle"""
+
+    def test_identical_questions_share_one_model_call(self):
+        # La réponse lente garantit que toutes les questions arrivent pendant le calcul en cours
+        with StubModelServer(reply='Deux retards', delay=0.5) as server:
+            engine = LocalModelEngine(url=server.url, timeout=5)
+            answers, errors = self.ask_concurrently(engine, 'Retards de production ?')
+        self.assertEqual(errors, [])
+        self.assertEqual(answers, ['Deux retards'] * 10)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(ai_engine._inflight, {})
+
+
+class ModelErrorTests(AnswerEngineTestCase):
+    """Modèle indisponible : repli sur les règles, ou erreur propagée et jamais mise en cache"""
+
+    def test_unavailable_model_falls_back_to_rules(self):
+        with StubModelServer(fail=True) as server:
+            engine = LocalModelEngine(url=server.url, timeout=5)
+            with self.assertLogs('dashboard.ai_engine', level='ERROR'):
+                answer = answer_question('Alerte problème', self.context, engine=engine)
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(answer, RuleEngine().answer('alerte problème', self.context))
+
+    def test_error_without_fallback_is_raised_and_not_cached(self):
+        with StubModelServer(fail=True) as server:
+            engine = LocalModelEngine(url=server.url, timeout=5, fallback=False)
+            with self.assertRaises(urllib.error.HTTPError):
+                answer_question('État du stock ?', self.context, engine=engine)
+            server.fail = False
+            self.assertEqual(answer_question('État du stock ?', self.context, engine=engine), 'Réponse du modèle')
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(ai_engine._inflight, {})
+
+    def test_waiting_questions_retry_when_the_shared_call_fails(self):
+        with StubModelServer(fail=True, delay=0.5) as server:
+            engine = LocalModelEngine(url=server.url, timeout=5, fallback=False)
+            answers, errors = self.ask_concurrently(engine, 'État du stock ?', count=3)
+        # Chaque question en attente relance son propre appel après l'échec du calcul partagé
+        self.assertEqual(answers, [])
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(len(server.requests), 3)
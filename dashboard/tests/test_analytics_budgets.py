@@ -0,0 +1,45 @@
+import time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from dashboard import analytics
+from dashboard.benchmarks import ANALYTICS_MAX_MS, ANALYTICS_QUERY_BUDGETS
+from dashboard.seeding import seed_scale
+
+
+class AnalyticsBudgetTests(TestCase):
+    """Chaque analyse reste dans son budget de requêtes et de durée sur un jeu de données réaliste"""
+
+    REPEAT = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_scale(
+            customers=200, products=1_000, orders=5_000, movements=5_000,
+            events=0, notifications=0, days=365, seed=42, prefix='BENCH',
+        )
+
+    def test_query_budgets(self):
+        for name, budget in ANALYTICS_QUERY_BUDGETS.items():
+            with self.subTest(name):
+                with CaptureQueriesContext(connection) as captured:
+                    getattr(analytics, name)()
+                self.assertLessEqual(
+                    len(captured), budget,
+                    f"{name} : {len(captured)} requêtes (budget {budget})\n"
+                    + '\n'.join(query['sql'] for query in captured.captured_queries),
+                )
+
+    def test_runtime_budgets(self):
+        for name in ANALYTICS_QUERY_BUDGETS:
+            with self.subTest(name):
+                func = getattr(analytics, name)
+                durations = []
+                for _ in range(self.REPEAT):
+                    start = time.perf_counter()
+                    func()
+                    durations.append(time.perf_counter() - start)
+                best_ms = min(durations) * 1000
+                self.assertLessEqual(best_ms, ANALYTICS_MAX_MS, f"{name} : {best_ms:.1f} ms (max {ANALYTICS_MAX_MS} ms)")
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from dashboard import ledger
+from dashboard.bom import run_mrp
+from dashboard.models import Customer, Order, OrderItem, Product
+
+
+class MRPDemandTests(TestCase):
+    """Les lignes déjà prélevées ne sont pas des besoins bruts"""
+
+    def setUp(self):
+        customer = Customer.objects.create(name='Client', email='client@example.com', phone='0600000000', address='-')
+        self.product = Product.objects.create(reference='P-1', name='Produit', price=10, min_stock=20)
+        ledger.record_movement(self.product, 'in', 100)
+        self.order = Order.objects.create(
+            order_number='CMD-1', customer=customer, delivery_date=timezone.localdate() + timedelta(days=7),
+        )
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=60, unit_price=10)
+        self.order.status = 'confirmed'
+        self.order.save()
+
+    def test_taken_out_lines_plan_nothing(self):
+        self.assertEqual(run_mrp().shortages(), {})
+
+    def test_pending_lines_are_netted_against_stock(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=30, unit_price=10)
+        # 30 à prélever sur 40 en stock, stock de sécurité 20 : 10 à acheter
+        self.assertEqual(run_mrp().shortages(), {self.product.pk: 10})
@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from dashboard.data_versions import bump_versions
+from dashboard.models import CustomUser, Product
+
+OTHER_PROCESS_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other'}}
+
+
+class ETagInvalidationTests(TestCase):
+    """Une modification faite hors du serveur web (worker, commande de gestion) invalide ses ETags"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username='manager', password='password123', role='manager')
+        self.client.force_login(user)
+        Product.objects.create(reference='P-1', name='Produit', price=10)
+
+    def etag(self, path):
+        self.client.get(path)  # Premier rendu : pose le cookie CSRF, qui entre dans l'ETag
+        response = self.client.get(path)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        return response['ETag']
+
+    def test_command_in_another_process_invalidates_product_list(self):
+        etag = self.etag('/products/')
+        # Cache distinct, comme celui d'un autre processus : seule la base est partagée
+        with override_settings(CACHES=OTHER_PROCESS_CACHE):
+            call_command('refresh_inventory_metrics', stdout=StringIO())
+        self.assertEqual(self.client.get('/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bulk_update_bumped_elsewhere_invalidates_product_list(self):
+        etag = self.etag('/products/')
+        with override_settings(CACHES=OTHER_PROCESS_CACHE):
+            Product.objects.update(min_stock=10)
+            bump_versions('product')
+        self.assertEqual(self.client.get('/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,160 @@
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from dashboard import outbox
+from dashboard.models import OutboxEvent
+from dashboard.outbox import Sink, WebhookSink, backoff, claim_batch, deliver, dispatch, retry_failed
+from dashboard.tests.stubs import StubWebhookServer
+
+
+class RecordingSink(Sink):
+    """Puits qui enregistre les identifiants reçus, ou échoue tant que `fail` est vrai"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.received = []
+
+    def send(self, events):
+        if self.fail:
+            raise ConnectionError('hors ligne')
+        self.received.extend(event['id'] for event in events)
+
+
+def make_events(count, **fields):
+    return outbox.emit(*[
+        OutboxEvent(event_type='test.event', aggregate_type='test', aggregate_id=str(i), payload={'n': i}, **fields)
+        for i in range(count)
+    ])
+
+
+class ClaimBatchTests(TestCase):
+    """Réclamation des événements à livrer par lots, avec bail"""
+
+    def test_claims_due_events_in_id_order(self):
+        events = make_events(3)
+        make_events(1, next_attempt_at=timezone.now() + timedelta(minutes=5))
+        make_events(1, status='dispatched')
+
+        claimed = claim_batch('d1', size=2)
+
+        self.assertEqual([event.pk for event in claimed], [events[0].pk, events[1].pk])
+        self.assertTrue(all(event.locked_by == 'd1' and event.attempts == 1 for event in claimed))
+        self.assertEqual([event.pk for event in claim_batch('d1')], [events[2].pk])
+        self.assertEqual(claim_batch('d1'), [])
+
+    def test_leased_events_are_not_claimed_twice(self):
+        make_events(2)
+        self.assertEqual(len(claim_batch('d1')), 2)
+        self.assertEqual(claim_batch('d2'), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        make_events(1)
+        claim_batch('d1')
+        OutboxEvent.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        claimed = claim_batch('d2')
+
+        self.assertEqual([(event.locked_by, event.attempts) for event in claimed], [('d2', 2)])
+
+
+class DeliverTests(TestCase):
+    """Résultat d'une livraison : livré, nouvel essai différé ou échec définitif"""
+
+    def deliver_pending(self, sinks):
+        return deliver(claim_batch('d1'), sinks)
+
+    def make_due(self):
+        OutboxEvent.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+
+    def test_delivered_to_every_sink(self):
+        events = make_events(2)
+        archive, hook = RecordingSink(), RecordingSink()
+
+        self.assertEqual(self.deliver_pending({'archive': archive, 'hook': hook}), 2)
+
+        ids = [event.pk for event in events]
+        self.assertEqual(archive.received, ids)
+        self.assertEqual(hook.received, ids)
+        for event in OutboxEvent.objects.all():
+            self.assertEqual(event.status, 'dispatched')
+            self.assertEqual(sorted(event.delivered_to), ['archive', 'hook'])
+            self.assertIsNotNone(event.dispatched_at)
+            self.assertEqual((event.locked_by, event.locked_until), ('', None))
+
+    def test_failed_sink_is_retried_alone_after_backoff(self):
+        event, = make_events(1)
+        archive, hook = RecordingSink(), RecordingSink(fail=True)
+        sinks = {'archive': archive, 'hook': hook}
+
+        before = timezone.now()
+        with self.assertLogs('dashboard.outbox', 'WARNING'):
+            self.assertEqual(self.deliver_pending(sinks), 0)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.delivered_to), ('pending', 1, ['archive']))
+        self.assertIn('hook: ConnectionError: hors ligne', event.last_error)
+        self.assertGreaterEqual(event.next_attempt_at, before + timedelta(seconds=backoff(1)))
+        # Pas encore livrable : le délai court toujours
+        self.assertEqual(claim_batch('d1'), [])
+
+        self.make_due()
+        hook.fail = False
+        self.assertEqual(self.deliver_pending(sinks), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('dispatched', 2, ''))
+        # Le puits déjà servi ne reçoit pas l'événement une seconde fois
+        self.assertEqual(archive.received, [event.pk])
+        self.assertEqual(hook.received, [event.pk])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertEqual(backoff(1), outbox.RETRY_BACKOFF)
+        self.assertEqual(backoff(2), outbox.RETRY_BACKOFF * 2)
+        self.assertEqual(backoff(4), outbox.RETRY_BACKOFF * 8)
+        self.assertEqual(backoff(100), outbox.MAX_BACKOFF)
+
+    def test_failed_after_max_attempts_until_retried(self):
+        event, = make_events(1)
+        sinks = {'hook': RecordingSink(fail=True)}
+        with self.assertLogs('dashboard.outbox', 'WARNING'):
+            for _ in range(outbox.MAX_ATTEMPTS):
+                self.make_due()
+                self.deliver_pending(sinks)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', outbox.MAX_ATTEMPTS))
+        self.make_due()
+        self.assertEqual(claim_batch('d1'), [])
+
+        self.assertEqual(retry_failed(), 1)
+        sinks['hook'].fail = False
+        self.assertEqual(self.deliver_pending(sinks), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('dispatched', 1))
+
+
+class DispatchTests(TransactionTestCase):
+    """Boucle du dispatcher contre un webhook local (chaque lot est validé comme en production)"""
+
+    def test_burst_dispatch_retries_failed_webhook(self):
+        events = make_events(5)
+        with StubWebhookServer(fail_first=1) as server:
+            sinks = {'hook': WebhookSink(server.url, timeout=5)}
+            with self.assertLogs('dashboard.outbox', 'WARNING'):
+                self.assertEqual(dispatch(sinks=sinks, burst=True, batch_size=3), 2)
+            # Premier lot refusé (503) et différé ; le second lot passe
+            self.assertEqual(OutboxEvent.objects.filter(status='pending').count(), 3)
+            self.assertEqual(OutboxEvent.objects.filter(status='dispatched').count(), 2)
+
+            OutboxEvent.objects.filter(status='pending').update(next_attempt_at=timezone.now())
+            self.assertEqual(dispatch(sinks=sinks, burst=True, batch_size=3), 3)
+
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(sorted(event['id'] for event in server.events), sorted(event.pk for event in events))
+        self.assertFalse(OutboxEvent.objects.exclude(status='dispatched').exists())
+
+    def test_dispatch_without_sinks_is_refused(self):
+        make_events(1)
+        with self.assertRaises(ValueError):
+            dispatch(sinks={}, burst=True)
+        self.assertEqual(OutboxEvent.objects.get().status, 'pending')
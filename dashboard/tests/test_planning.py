@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+
+from dashboard.models import CustomUser, PlanningEvent
+
+OTHER_PROCESS_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other'}}
+
+
+class AddPlanningEventTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='manager', password='password123', role='manager')
+        self.client.force_login(self.user)
+
+    def post(self, start, end, event_type='breakdown'):
+        response = self.client.post('/planning/add-event/', {
+            'title': 'Panne', 'description': '', 'event_type': event_type, 'start_date': start, 'end_date': end,
+        })
+        messages = [str(message) for message in get_messages(response.wsgi_request)]
+        self.client.cookies.pop('messages', None)  # Le planning n'affiche pas les messages : on les consomme ici
+        return messages
+
+    def test_event_longer_than_calendar_window_is_accepted(self):
+        self.assertEqual(self.post('2026-01-01', '2027-06-30', 'holiday'), ['Événement ajouté au planning!'])
+        self.assertEqual(PlanningEvent.objects.get().duration, 546)
+
+    def test_invalid_dates_are_rejected_with_event_message(self):
+        self.assertEqual(self.post('2026-03-10', '2026-03-01'),
+                         ['Dates invalides : La date de fin précède la date de début'])
+        self.assertEqual(self.post('', '2026-03-01'),
+                         ['Dates invalides : Dates de début et de fin requises (AAAA-MM-JJ)'])
+        self.assertFalse(PlanningEvent.objects.exists())
+
+    def test_overlap_with_breakdown_created_by_another_process(self):
+        self.post('2026-03-01', '2026-03-02')  # Index construit dans ce processus
+        with override_settings(CACHES=OTHER_PROCESS_CACHE), self.captureOnCommitCallbacks(execute=True):
+            PlanningEvent.objects.create(
+                title='Panne WC-2', event_type='breakdown', start_date=date(2026, 3, 10), end_date=date(2026, 3, 12),
+                created_by=self.user,
+            )
+        messages = self.post('2026-03-11', '2026-03-15')
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith('Chevauchement avec : Panne WC-2'))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from dashboard import ledger
+from dashboard.models import Customer, Order, OrderItem, Product
+from dashboard.promising import PromiseProfile, promise
+from dashboard.scheduling import load_snapshot
+
+
+class AvailableToPromiseTests(TestCase):
+    """L'ATP ne retire du stock que la demande encore à prélever"""
+
+    def setUp(self):
+        customer = Customer.objects.create(name='Client', email='client@example.com', phone='0600000000', address='-')
+        self.product = Product.objects.create(reference='P-1', name='Produit', price=10)
+        ledger.record_movement(self.product, 'in', 100)
+        self.order = Order.objects.create(
+            order_number='CMD-1', customer=customer, delivery_date=timezone.localdate() + timedelta(days=7),
+        )
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=60, unit_price=10)
+        self.order.status = 'confirmed'
+        self.order.save()
+
+    def promise(self, quantity):
+        return promise([(self.product.pk, quantity)], profile=PromiseProfile(load_snapshot()))
+
+    def test_stock_on_the_shelf_is_promised_today(self):
+        result = self.promise(40)
+        self.assertEqual(result['lines'][0]['source'], 'stock')
+        self.assertEqual(result['earliest_delivery_date'], timezone.localdate().isoformat())
+
+    def test_pending_lines_reduce_atp(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=15, unit_price=10)
+        line = self.promise(40)['lines'][0]
+        self.assertEqual((line['from_stock'], line['to_buy'], line['source']), (25.0, 15.0, 'purchase'))
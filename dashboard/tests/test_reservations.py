@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from dashboard import ledger, reservations
+from dashboard.data_versions import get_versions
+from dashboard.models import Customer, Order, OrderItem, Product
+
+
+class AvailableStockTests(TestCase):
+    """Le stock d'une commande ouverte n'est compté qu'une fois : prélevé ou réservé"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Client', email='client@example.com', phone='0600000000', address='-')
+        self.product = Product.objects.create(reference='P-1', name='Produit', price=10)
+        ledger.record_movement(self.product, 'in', 100)
+
+    def order(self, quantity, status='draft'):
+        order = Order.objects.create(
+            order_number=f'CMD-{Order.objects.count() + 1}', customer=self.customer,
+            delivery_date=timezone.localdate() + timedelta(days=7), status=status,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, unit_price=10)
+        return order
+
+    def set_status(self, order, status):
+        order.status = status
+        order.save()
+        self.product.refresh_from_db()
+
+    def test_confirmed_order_is_taken_out_once(self):
+        order = self.order(60)
+        self.set_status(order, 'confirmed')
+        self.assertEqual((self.product.current_stock, self.product.reserved), (40, 0))
+        self.assertEqual(self.product.available_stock, 40)
+
+        self.set_status(order, 'in_production')
+        self.assertEqual(self.product.available_stock, 40)
+
+        self.set_status(order, 'shipped')
+        self.assertEqual((self.product.current_stock, self.product.reserved), (40, 0))
+        self.assertEqual(self.product.available_stock, 40)
+
+    def test_bulk_confirmation_is_taken_out_once(self):
+        Order.confirm_orders([self.order(60)])
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.current_stock, self.product.available_stock), (40, 40))
+
+    def test_line_added_to_open_order_is_reserved_until_ship(self):
+        order = self.order(60)
+        self.set_status(order, 'confirmed')
+        OrderItem.objects.create(order=order, product=self.product, quantity=15, unit_price=10)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.current_stock, self.product.reserved), (40, 15))
+        self.assertEqual(self.product.available_stock, 25)
+
+        self.set_status(order, 'shipped')
+        self.assertEqual((self.product.reserved, self.product.available_stock), (0, 40))
+
+    def test_cancel_returns_only_taken_out_lines(self):
+        order = self.order(60)
+        self.set_status(order, 'confirmed')
+        OrderItem.objects.create(order=order, product=self.product, quantity=15, unit_price=10)
+        self.set_status(order, 'cancelled')
+        self.assertEqual((self.product.current_stock, self.product.reserved), (100, 0))
+
+    def test_rebuild_does_not_reserve_taken_out_lines(self):
+        self.set_status(self.order(60), 'confirmed')
+        reservations.rebuild()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.product.available_stock), (0, 40))
+        self.assertEqual(reservations.detect_drift(), [])
+
+    def test_added_line_invalidates_product_version(self):
+        order = self.order(60)
+        self.set_status(order, 'confirmed')
+        before = get_versions(('product',))['product']
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product=self.product, quantity=15, unit_price=10)
+        self.assertNotEqual(get_versions(('product',))['product'], before)
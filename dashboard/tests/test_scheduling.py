@@ -0,0 +1,66 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from dashboard import ledger
+from dashboard.models import Customer, Order, OrderItem, Product
+from dashboard.scenarios import _apply_add_order
+from dashboard.scheduling import evaluate, get_snapshot, load_snapshot
+
+OTHER_PROCESS_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'other'}}
+
+
+class OpenOrderTestCase(TestCase):
+    """Stock de 100 et une commande confirmée de 60"""
+
+    def setUp(self):
+        self.customer = Customer.objects.create(
+            name='Client', email='client@example.com', phone='0600000000', address='-',
+        )
+        self.product = Product.objects.create(reference='P-1', name='Produit', price=10)
+        ledger.record_movement(self.product, 'in', 100)
+        self.order = Order.objects.create(
+            order_number='CMD-1', customer=self.customer, delivery_date=timezone.localdate() + timedelta(days=7),
+        )
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=60, unit_price=10)
+        self.order.status = 'confirmed'
+        self.order.save()
+
+
+class StockoutTests(OpenOrderTestCase):
+    """Ruptures : seule la quantité encore à prélever est confrontée au stock"""
+
+    def test_taken_out_lines_are_not_stockouts(self):
+        self.assertEqual(evaluate(load_snapshot())['stockout_lines'], 0)
+
+    def test_pending_lines_are_served_from_remaining_stock(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=50, unit_price=10)
+        self.assertEqual(evaluate(load_snapshot())['stockout_lines'], 1)
+
+    def test_hypothetical_order_is_pending(self):
+        snapshot = load_snapshot()
+        state = snapshot.copy()
+        _apply_add_order(state, {
+            'delivery_date': (snapshot.today + timedelta(days=10)).isoformat(),
+            'lines': [(self.product.pk, 30.0)], 'label': 'Simulée',
+        })
+        self.assertEqual(evaluate(state)['stockout_lines'], 0)
+        state.stock[state.product_index(self.product.pk)] = 20
+        self.assertEqual(evaluate(state)['stockout_lines'], 1)
+
+
+class SnapshotReloadTests(OpenOrderTestCase):
+    """Le snapshot d'un processus (worker) suit les modifications faites par les autres"""
+
+    def test_snapshot_reloads_after_change_in_another_process(self):
+        snapshot = get_snapshot()
+        self.assertIs(get_snapshot(), snapshot)
+        with override_settings(CACHES=OTHER_PROCESS_CACHE), self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(
+                order_number='CMD-2', customer=self.customer, delivery_date=timezone.localdate() + timedelta(days=3),
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=10, unit_price=10)
+            order.status = 'confirmed'
+            order.save()
+        self.assertEqual(get_snapshot().order_count, 2)
@@ -19,6 +19,7 @@ urlpatterns = [
 
     path('orders/', views.order_list, name='order_list'),
     path('orders/new/', views.create_order, name='create_order'),
+    path('orders/promise/', views.order_promise, name='order_promise'),
     path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('orders/<int:order_id>/edit/', views.edit_order, name='edit_order'),
     path('orders/<int:order_id>/delete/', views.delete_order, name='delete_order'),
@@ -31,18 +32,24 @@ urlpatterns = [
     path('products/<int:product_id>/edit/', views.edit_product, name='edit_product'),
     path('products/<int:product_id>/delete/', views.delete_product, name='delete_product'),
     path('products/<int:product_id>/adjust-stock/', views.adjust_stock, name='adjust_stock'),
+    path('products/<int:product_id>/transfer-stock/', views.transfer_stock, name='transfer_stock'),
     path('products/<int:product_id>/archive/', views.archive_product, name='archive_product'),
     path('stock/movements/', views.stock_movements, name='stock_movements'),
     
     # Planning
     path('planning/', views.planning_dashboard, name='planning_dashboard'),
     path('planning/add-event/', views.add_planning_event, name='add_planning_event'),
+    path('planning/calendar/', views.planning_calendar, name='planning_calendar'),
+    path('planning/scenarios/', views.planning_scenarios, name='planning_scenarios'),
+    path('planning/optimize/', views.planning_optimize, name='planning_optimize'),
+    path('analytics/delivery/', views.delivery_analytics, name='delivery_analytics'),
     
    # Assistant IA
     path('erp-copilot/', views.erp_copilot, name='erp_copilot'),
     path('copilot/analyze/', views.copilot_analyze, name='copilot_analyze'),
     path('copilot/suggest-action/', views.copilot_suggest_action, name='copilot_suggest_action'),
     path('copilot/execute-action/', views.copilot_execute_action, name='copilot_execute_action'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
     
     # URLs Assistant AI (existantes)
     path('ai-assistant/', views.ai_assistant, name='ai_assistant'),
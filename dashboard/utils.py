@@ -1,7 +1,16 @@
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
 from datetime import timedelta
 from .models import Order, PlanningEvent
 
+logger = logging.getLogger(__name__)
+
+SECTION_TIMEOUT = getattr(settings, 'COPILOT_SECTION_TIMEOUT', 5.0)
+
 def calculate_detailed_trs():
     """Calcule le TRS détaillé"""
     today = timezone.now().date()
@@ -28,4 +37,41 @@ def get_production_trends():
                 created_at__date=date
             ).count()
         })
-    return trends
\ No newline at end of file
+    return trends
+
+
+def _run_section(func):
+    """Exécute une section dans un thread du pool avec sa propre connexion DB"""
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather_sections(sections, timeout=SECTION_TIMEOUT):
+    """Lance des analyses indépendantes en parallèle et rassemble leurs résultats.
+
+    `sections` associe un nom à une fonction synchrone sans argument. Une section
+    qui dépasse `timeout` secondes ou lève une exception vaut None et son nom est
+    ajouté à la liste `missing` : la latence totale est celle de la section la
+    plus lente, bornée par le timeout. Les dépassements sont journalisés en
+    avertissement, les exceptions en erreur avec leur trace.
+    """
+    names = list(sections)
+    results = await asyncio.gather(*(
+        asyncio.wait_for(sync_to_async(_run_section, thread_sensitive=False)(sections[name]), timeout)
+        for name in names
+    ), return_exceptions=True)
+
+    data, missing = {}, []
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning("Section %s : délai de %s s dépassé", name, timeout)
+            else:
+                logger.error("Section %s en échec", name, exc_info=result)
+            data[name] = None
+            missing.append(name)
+        else:
+            data[name] = result
+    return data, missing
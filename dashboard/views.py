@@ -1,15 +1,36 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, F, Sum, Count
+from django.db.models import Q, Count
 from django.utils import timezone
 from django.db import models
-from .models import Order, Product, Customer, StockMovement, OrderItem, PlanningEvent, AIConversation, AIAnalysis, Notification, NotificationManager
-from .forms import ProductForm, OrderForm, StockMovementForm, CustomerForm
+from .models import LOW_STOCK, Order, OrderStatusTransition, Product, Customer, StockLot, StockMovement, OrderItem, PlanningEvent, AIConversation, AIAnalysis, Notification, NotificationManager, ContextSnapshot, Job
+from .forms import ProductForm, OrderForm, StockMovementForm, StockTransferForm, CustomerForm
 from .decorators import role_required
+from .utils import gather_sections
+from .analysis_scheduler import analysis_etag, analysis_payload, get_analysis, get_analysis_data
+from .analytics import calculate_on_time_rate, delivery_performance, get_current_business_context
+from .jobs import HANDLERS as JOB_HANDLERS, enqueue
+from .ai_engine import answer_question
+from .ledger import default_location, issue, receive_lot, record_movement, transfer
+from .planning import calendar_window, parse_event_dates, parse_window
+from .intervals import event_index
+from .scenarios import parse_scenarios
+from .optimizer import MAX_SECONDS as OPTIMIZER_MAX_SECONDS
+from .promising import promise
+from .data_versions import FRAGMENT_CACHE_TTL, bump_versions, etag_for, fragment_is_cached, get_versions, user_version_name
+from .forecasting import get_catalog_forecast, get_product_forecast
 from django.http import JsonResponse, HttpResponse
+from django.core.cache import cache
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+import asyncio
+import functools
 import json
-from django.views.decorators.http import require_POST
+import time
+from django.views.decorators.http import condition, require_http_methods, require_POST
+from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.template.loader import get_template
 import io
 from reportlab.pdfgen import canvas
@@ -217,8 +238,13 @@ def home(request):
 
 @login_required
 def dashboard(request):
-    # Générer les notifications automatiques
-    NotificationManager.generate_all_notifications(request.user)
+    # Générer les notifications automatiques, seulement si les données ont changé depuis la dernière fois
+    versions = get_versions(('order', 'product'))
+    stamp = (versions['order'], versions['product'], timezone.localdate().isoformat())
+    stamp_key = f'notifications:generated:{request.user.pk}'
+    if cache.get(stamp_key) != stamp:
+        NotificationManager.generate_all_notifications(request.user)
+        cache.set(stamp_key, stamp, FRAGMENT_CACHE_TTL)
     
     # Récupérer les notifications non lues
     notifications = Notification.objects.filter(
@@ -226,30 +252,17 @@ def dashboard(request):
         is_read=False
     ).order_by('-created_at')[:10]  # Limiter à 10
     
-    # KPIs
-    active_orders = Order.objects.filter(status__in=['confirmed', 'in_production']).count()
-    
-    low_stock_products = []
-    for product in Product.objects.all():
-        if product.needs_reorder():
-            low_stock_products.append(product)
-    
-    delayed_orders = Order.objects.filter(
-        delivery_date__lt=timezone.now().date(), 
-        status__in=['confirmed', 'in_production']
-    ).count()
-    
-    # Données réelles de la base de données
+    # Données réelles de la base de données, évaluées seulement si le fragment
+    # `dashboard_main` n'est pas en cache pour les versions courantes
+    low_stock = Product.objects.filter(LOW_STOCK)
     context = {
-        'active_orders': Order.objects.filter(status='in_production').count(),
-        'low_stock_alerts': Product.objects.filter(current_stock__lte=F('min_stock')).count(),
-        'delayed_orders': Order.objects.filter(
+        'active_orders': Order.objects.filter(status='in_production').count,
+        'low_stock_alerts': functools.cache(low_stock.count),
+        'delayed_orders': functools.cache(Order.objects.filter(
             delivery_date__lt=timezone.now().date(),
             status__in=['confirmed', 'in_production']
-        ).count(),
-        'low_stock_products': Product.objects.filter(
-            current_stock__lte=F('min_stock')
-        )[:5],
+        ).count),
+        'low_stock_products': low_stock[:5],
         'recent_orders': Order.objects.select_related('customer').order_by('-created_at')[:5]
     }
     return render(request, 'dashboard/dashboard.html', context)
@@ -270,6 +283,8 @@ def create_customer(request):
     return render(request, 'dashboard/customers/create_customer.html', {'form': form})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for('customer', 'order'))
 def customer_list(request):
     customers = Customer.objects.all().order_by('name')
     
@@ -346,6 +361,8 @@ def create_order_for_customer(request, customer_id):
     })    
     
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for('order', 'customer'))
 def order_list(request):
     orders = Order.objects.select_related('customer').all().order_by('-created_at')
     
@@ -448,9 +465,42 @@ def create_order(request):
         'recent_orders': Order.objects.select_related('customer').order_by('-created_at')[:5]
     })
 
+@login_required
+@role_required(['admin', 'manager', 'supervisor'])
+def order_promise(request):
+    """Première date de livraison tenable (ATP/CTP) pour les lignes en cours de saisie :
+    ?products=&quantities= (mêmes champs que le formulaire de commande), &delivery_date= facultatif"""
+    try:
+        lines = []
+        for product_id, quantity in zip(request.GET.getlist('products'), request.GET.getlist('quantities')):
+            if product_id and quantity:
+                lines.append((int(product_id), int(quantity)))
+        if not lines:
+            raise ValueError("Aucune ligne de commande")
+        if any(quantity <= 0 for _, quantity in lines):
+            raise ValueError("Les quantités doivent être positives")
+        requested = request.GET.get('delivery_date')
+        requested = datetime.strptime(requested, '%Y-%m-%d').date() if requested else None
+        result = promise(lines)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    earliest = result['earliest_delivery_date']
+    result['feasible'] = None if requested is None else bool(earliest and requested.isoformat() >= earliest)
+    return JsonResponse({'success': True, **result})
+
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
+    # Lots servis par ligne (traçabilité) et historique des statuts chargés avec la commande
+    order = get_object_or_404(
+        Order.objects.prefetch_related(
+            'items__product', 'items__lot_allocations__lot',
+            models.Prefetch('transitions', queryset=OrderStatusTransition.objects.select_related(
+                'changed_by',
+            ).order_by('changed_at', 'id')),
+        ),
+        id=order_id,
+    )
     return render(request, 'dashboard/orders/order_detail.html', {'order': order})
 
 @login_required
@@ -462,6 +512,7 @@ def edit_order(request, order_id):
         form = OrderForm(request.POST, instance=order)
         if form.is_valid():
             # Sauvegarder les modifications de base
+            form.instance.changed_by = request.user
             order = form.save()
             
             # Supprimer les anciens items
@@ -555,30 +606,15 @@ def update_order_status(request, order_id):
                     return redirect('order_detail', order_id=order.id)
             
             # Changer le statut de la commande
+            # Les mouvements de stock sont enregistrés par Order.save via le journal
             order.status = new_status
+            order.changed_by = request.user
             order.save()
             
-            # ========== ENREGISTRER LES MOUVEMENTS DE STOCK ==========
             if new_status == 'confirmed' and old_status != 'confirmed':
-                for item in order.items.all():
-                    StockMovement.objects.create(
-                        product=item.product,
-                        movement_type='out',
-                        quantity=item.quantity,
-                        reason=f'Commande {order.order_number}',
-                        user=request.user
-                    )
                 messages.success(request, f"✅ Commande confirmée et stock mis à jour pour {order.order_number}")
             
             elif new_status == 'cancelled' and old_status in ['confirmed', 'in_production']:
-                for item in order.items.all():
-                    StockMovement.objects.create(
-                        product=item.product,
-                        movement_type='in',
-                        quantity=item.quantity,
-                        reason=f'Annulation commande {order.order_number}',
-                        user=request.user
-                    )
                 messages.success(request, f"✅ Commande annulée et stock restauré pour {order.order_number}")
             
             else:
@@ -591,8 +627,10 @@ def update_order_status(request, order_id):
 
 # ========== PRODUITS & STOCK ==========
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for('product'))
 def product_list(request):
-    products = Product.objects.filter(is_active=True).order_by('reference')
+    products = Product.objects.filter(is_active=True).select_related('inventory_metrics').order_by('reference')
     
     # Filtrer par recherche
     search_query = request.GET.get('search', '')
@@ -605,7 +643,7 @@ def product_list(request):
     # Filtrer par stock faible
     low_stock = request.GET.get('low_stock', '')
     if low_stock == 'on':
-        products = products.filter(current_stock__lte=F('min_stock'))
+        products = products.filter(LOW_STOCK)
     
     return render(request, 'dashboard/products/product_list.html', {
         'products': products,
@@ -619,7 +657,13 @@ def create_product(request):
     if request.method == 'POST':
         form = ProductForm(request.POST)
         if form.is_valid():
-            product = form.save()
+            # Le stock initial est enregistré comme une entrée dans le journal
+            product = form.save(commit=False)
+            initial_stock = product.current_stock
+            product.current_stock = 0
+            product.save()
+            if initial_stock:
+                record_movement(product, 'in', initial_stock, user=request.user, reason='Stock initial')
             messages.success(request, f'Produit "{product.reference}" créé avec succès!')
             return redirect('product_list')
     else:
@@ -639,11 +683,33 @@ def edit_product(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     if request.method == 'POST':
+        old_stock = product.current_stock
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            form.save()
-            messages.success(request, f'Produit {product.reference} modifié avec succès!')
-            return redirect('product_list')
+            # Une modification du stock devient un ajustement dans le journal. Le stock saisi est le
+            # total : l'écart est porté par l'emplacement par défaut.
+            product = form.save(commit=False)
+            new_stock = product.current_stock
+            product.current_stock = old_stock
+            location = default_location()
+            elsewhere = old_stock - (
+                product.balances.filter(location=location).values_list('quantity', flat=True).first() or 0
+            )
+            if new_stock != old_stock and new_stock < elsewhere:
+                form.add_error('current_stock', (
+                    f"{elsewhere} unité(s) sont sur d'autres emplacements : "
+                    "les transférer ou les ajuster d'abord."
+                ))
+            else:
+                # Les compteurs de stock sont maintenus par le journal : ne pas les réécrire
+                product.save(update_fields=[name for name in form.Meta.fields if name != 'current_stock'])
+                if new_stock != old_stock:
+                    record_movement(
+                        product, 'adjustment', new_stock - elsewhere,
+                        user=request.user, reason='Modification fiche produit', location=location,
+                    )
+                messages.success(request, f'Produit {product.reference} modifié avec succès!')
+                return redirect('product_list')
     else:
         form = ProductForm(instance=product)
     
@@ -669,13 +735,7 @@ def delete_product(request, product_id):
         
         # OPTIONNEL : Créer un mouvement de stock pour mettre à zéro le stock restant
         if current_stock > 0:
-            StockMovement.objects.create(
-                product=product,
-                movement_type='out',
-                quantity=current_stock,
-                reason=f'Suppression produit - {reason}',
-                user=request.user
-            )
+            issue(product, current_stock, user=request.user, reason=f'Suppression produit - {reason}')
             stock_message = f" (stock de {current_stock} unités mis à zéro)"
         else:
             stock_message = ""
@@ -700,6 +760,9 @@ def delete_product(request, product_id):
         'order_items_count': order_items_count  # Maintenant juste pour information
     })
     
+LOTS_SHOWN = 20
+
+
 @login_required
 @role_required(['admin', 'manager'])
 def adjust_stock(request, product_id):
@@ -709,25 +772,35 @@ def adjust_stock(request, product_id):
         form = StockMovementForm(request.POST)
         if form.is_valid():
             stock_movement = form.save(commit=False)
-            stock_movement.product = product
-            stock_movement.user = request.user
-            
-            # Sauvegarder l'ancien stock pour l'affichage
-            old_stock = product.current_stock
             
-            # Mettre à jour le stock du produit
             if stock_movement.movement_type == 'in':
-                product.current_stock += stock_movement.quantity
                 message = f"+{stock_movement.quantity} unités (entrée)"
             elif stock_movement.movement_type == 'out':
-                product.current_stock = max(0, product.current_stock - stock_movement.quantity)
                 message = f"-{stock_movement.quantity} unités (sortie)"
             elif stock_movement.movement_type == 'adjustment':
-                product.current_stock = stock_movement.quantity
                 message = f"Ajustement à {stock_movement.quantity} unités"
             
-            product.save()
-            stock_movement.save()
+            # Mettre à jour le stock du produit via le journal
+            if form.cleaned_data['lot_number']:
+                receive_lot(
+                    product,
+                    form.cleaned_data['lot_number'],
+                    stock_movement.quantity,
+                    expiry_date=form.cleaned_data['expiry_date'],
+                    location=form.cleaned_data['location'],
+                    user=request.user,
+                    reason=stock_movement.reason,
+                )
+                message += f" lot {form.cleaned_data['lot_number']}"
+            else:
+                record_movement(
+                    product,
+                    stock_movement.movement_type,
+                    stock_movement.quantity,
+                    user=request.user,
+                    reason=stock_movement.reason,
+                    location=form.cleaned_data['location'],
+                )
             
             messages.success(request, f'Stock de {product.reference} ajusté : {message}. Nouveau stock : {product.current_stock} unités.')
             return redirect('product_list')
@@ -736,12 +809,50 @@ def adjust_stock(request, product_id):
     
     return render(request, 'dashboard/products/adjust_stock.html', {
         'form': form,
-        'product': product
+        'transfer_form': StockTransferForm(),
+        'product': product,
+        'balances': product.balances.select_related('location').order_by('location__code'),
+        # Prochains lots consommés (ordre FEFO) ; un produit peut avoir des milliers de lots ouverts
+        'lots': product.lots.filter(remaining__gt=0).select_related('location').order_by(
+            'location__code', *StockLot.FEFO
+        )[:LOTS_SHOWN],
+        'lots_shown': LOTS_SHOWN,
     })
 
+@require_POST
 @login_required
+@role_required(['admin', 'manager'])
+def transfer_stock(request, product_id):
+    """Transfert entre deux emplacements (paire de mouvements, voir ledger.transfer)"""
+    product = get_object_or_404(Product, id=product_id)
+    form = StockTransferForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, "Transfert invalide : " + " ".join(
+            error for errors in form.errors.values() for error in errors
+        ))
+        return redirect('adjust_stock', product_id=product.id)
+
+    source, destination = form.cleaned_data['source'], form.cleaned_data['destination']
+    try:
+        transfer(
+            product, source, destination, form.cleaned_data['quantity'],
+            user=request.user, reason=form.cleaned_data['reason'],
+        )
+    except ValueError as e:
+        messages.error(request, f"Transfert impossible : {e}")
+    else:
+        messages.success(
+            request,
+            f"{form.cleaned_data['quantity']} unité(s) de {product.reference} transférée(s) "
+            f"de {source.code} vers {destination.code}.",
+        )
+    return redirect('adjust_stock', product_id=product.id)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for('stock', 'product'))
 def stock_movements(request):
-    movements = StockMovement.objects.select_related('product', 'user').all().order_by('-created_at')
+    movements = StockMovement.objects.select_related('product', 'user', 'location').all().order_by('-created_at')
     
     # Filtres
     product_filter = request.GET.get('product', '')
@@ -760,56 +871,11 @@ def stock_movements(request):
 # ========== PLANNING & ASSISTANT ==========
 @login_required
 def planning_dashboard(request):
-    # Commandes pour le calendrier
-    orders = Order.objects.filter(
-        status__in=['confirmed', 'in_production']
-    ).order_by('delivery_date')
-    
-    # KPI calculés
-    total_orders = Order.objects.count()
-    in_production = Order.objects.filter(status='in_production').count()
-    confirmed_orders = Order.objects.filter(status='confirmed').count()
-    to_schedule = Order.objects.filter(status='draft').count()
-    delayed = Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    ).count()
-    completed = Order.objects.filter(status__in=['shipped', 'delivered']).count()
-    
-    # Calcul TRS simulé (Taux de Rendement Synthétique)
-    trs = calculate_trs()
-    
-    # Calcul charge de travail simulé
-    workload = calculate_workload()
-    
-    # Événements de planification
-    events = PlanningEvent.objects.all()
-    
-    context = {
-        'orders': orders,
-        'events': events,
-        'trs': trs,
-        'workload': workload,
-        'in_production': in_production,
-        'confirmed_orders': confirmed_orders,
-        'to_schedule': to_schedule,
-        'delayed': delayed,
-        'completed': completed,
-        'total_orders': total_orders,
-    }
-    return render(request, 'dashboard/planning/dashboard.html', context)
-
-
-@login_required
-def planning_dashboard(request):
-    from django.db.models import Count
-    import json
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
-    # Commandes pour le calendrier
-    orders = Order.objects.select_related('customer').filter(
-        status__in=['confirmed', 'in_production', 'shipped']
-    ).order_by('delivery_date')
+    # Le contexte est paresseux : requêtes non évaluées et fonctions, appelées par le gabarit
+    # seulement si les fragments {% cache %} ne sont pas à jour (voir data_versions.py).
+    # Le calendrier charge ses données par fenêtre via planning_calendar.
     
     # Commandes cette semaine
     today = timezone.now().date()
@@ -827,66 +893,102 @@ def planning_dashboard(request):
         status__in=['confirmed', 'in_production']
     ).select_related('customer')
     
-    # KPI calculés
-    total_orders = Order.objects.count()
-    in_production = Order.objects.filter(status='in_production').count()
-    confirmed_orders = Order.objects.filter(status='confirmed').count()
-    to_schedule = Order.objects.filter(status='draft').count()
-    delayed = delayed_orders.count()
-    completed = Order.objects.filter(status__in=['shipped', 'delivered']).count()
-    
-    # Commandes par statut
-    orders_by_status = Order.objects.values('status').annotate(count=Count('id'))
-    orders_status_dict = {item['status']: item['count'] for item in orders_by_status}
-    
-    # Calcul TRS simulé
-    trs = calculate_trs()
-    
-    # Calcul charge de travail
-    workload = calculate_workload()
-    
-    # Événements de planification
-    events = PlanningEvent.objects.all()
-    
-    # Préparer les données pour le calendrier
-    orders_data = []
-    for order in orders:
-        orders_data.append({
-            'order_number': order.order_number,
-            'customer': order.customer.name,
-            'delivery_date': order.delivery_date.isoformat(),
-            'status': order.status,
-            'is_delayed': order.is_delayed
-        })
-    
-    events_data = []
-    for event in events:
-        events_data.append({
-            'title': event.title,
-            'start_date': event.start_date.isoformat(),
-            'end_date': event.end_date.isoformat(),
-            'event_type': event.event_type
-        })
+    # Commandes par statut : une requête groupée dont on déduit tous les KPI
+    @functools.cache
+    def orders_status_dict():
+        orders_by_status = Order.objects.order_by().values('status').annotate(count=Count('id'))
+        return {item['status']: item['count'] for item in orders_by_status}
     
     context = {
-        'orders': orders,
         'this_week_orders': this_week_orders,
         'delayed_orders': delayed_orders,
-        'events': events,
-        'trs': trs,
-        'workload': workload,
-        'in_production': in_production,
-        'confirmed_orders': confirmed_orders,
-        'to_schedule': to_schedule,
-        'delayed': delayed,
-        'completed': completed,
-        'total_orders': total_orders,
+        # Calcul TRS simulé et charge de travail
+        'trs': functools.cache(calculate_trs),
+        'workload': functools.cache(calculate_workload),
+        # KPI calculés
+        'in_production': lambda: orders_status_dict().get('in_production', 0),
+        'confirmed_orders': lambda: orders_status_dict().get('confirmed', 0),
+        'to_schedule': lambda: orders_status_dict().get('draft', 0),
+        'delayed': functools.cache(delayed_orders.count),
+        'completed': lambda: orders_status_dict().get('shipped', 0) + orders_status_dict().get('delivered', 0),
+        'total_orders': lambda: sum(orders_status_dict().values()),
         'orders_by_status': orders_status_dict,
-        'orders_json': json.dumps(orders_data),
-        'events_json': json.dumps(events_data),
+        'optimizer_max_seconds': OPTIMIZER_MAX_SECONDS,
     }
     return render(request, 'dashboard/planning/dashboard.html', context)
 
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for('order', 'customer', 'planning'))
+def planning_calendar(request):
+    """API du calendrier : commandes et événements qui chevauchent la fenêtre ?start=&end="""
+    try:
+        start, end = parse_window(request.GET.get('start'), request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(calendar_window(start, end))
+
+@login_required
+@role_required(['admin', 'manager', 'supervisor'])
+def delivery_analytics(request):
+    """API : ponctualité, délais et durées des étapes sur la fenêtre ?start=&end= (90 derniers jours par défaut)"""
+    try:
+        performance = delivery_performance(request.GET.get('start') or None, request.GET.get('end') or None)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(performance)
+
+@require_POST
+@login_required
+@role_required(['admin', 'manager', 'supervisor'])
+def planning_scenarios(request):
+    """Simulation « et si » : JSON {"scenarios": [...]} (voir scenarios.py), exécutée en tâche de fond"""
+    try:
+        payload = json.loads(request.body or b'{}')
+        if not isinstance(payload, dict):
+            raise ValueError("Objet JSON attendu")
+        scenarios = parse_scenarios(payload.get('scenarios'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    # Résultat déterministe : pas de nouvel essai en cas d'échec
+    job = enqueue('scenarios', {'scenarios': scenarios}, user=request.user, max_attempts=1)
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('job_status', args=[job.pk]),
+    }, status=202)
+
+@require_POST
+@login_required
+@role_required(['admin', 'manager', 'supervisor'])
+def planning_optimize(request):
+    """Optimisation de la séquence des commandes ouvertes pendant `seconds` secondes (voir optimizer.py)"""
+    try:
+        if request.content_type == 'application/json':
+            payload = json.loads(request.body or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("Objet JSON attendu")
+        else:
+            payload = request.POST
+        try:
+            seconds = int(payload.get('seconds', 10))
+        except (TypeError, ValueError):
+            raise ValueError("'seconds' doit être un nombre entier de secondes")
+        if not 1 <= seconds <= OPTIMIZER_MAX_SECONDS:
+            raise ValueError(f"La durée doit être comprise entre 1 et {OPTIMIZER_MAX_SECONDS} secondes")
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    job = enqueue('optimize_schedule', {'seconds': seconds}, user=request.user, max_attempts=1)
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('job_status', args=[job.pk]),
+    }, status=202)
+
 @login_required
 @role_required(['admin', 'manager', 'supervisor'])
 def add_planning_event(request):
@@ -894,9 +996,22 @@ def add_planning_event(request):
         title = request.POST.get('title')
         description = request.POST.get('description')
         event_type = request.POST.get('event_type')
-        start_date = request.POST.get('start_date')
-        end_date = request.POST.get('end_date')
-        
+
+        try:
+            start_date, end_date = parse_event_dates(request.POST.get('start_date'), request.POST.get('end_date'))
+        except ValueError as e:
+            messages.error(request, f"Dates invalides : {e}")
+            return redirect('planning_dashboard')
+
+        # Deux pannes ne peuvent pas se chevaucher sur la même période (index rechargé si un autre
+        # processus a modifié le planning : version partagée, voir data_versions.py)
+        conflicts = event_index.conflicts(start_date, end_date, event_type)
+        if conflicts:
+            messages.error(request, "Chevauchement avec : " + ", ".join(
+                f"{event.title} ({event.start_date:%d/%m} - {event.end_date:%d/%m})" for event in conflicts
+            ))
+            return redirect('planning_dashboard')
+
         event = PlanningEvent(
             title=title,
             description=description,
@@ -927,14 +1042,10 @@ def calculate_workload():
 
 @login_required
 def ai_assistant(request):
-    return render(request, 'dashboard/assistant/assistant.html')
-
-@login_required
-def ai_assistant(request):
-    # Analyses automatiques
-    stock_analysis = analyze_stock_situation()
-    production_analysis = analyze_production_efficiency()
-    alert_analysis = analyze_alerts()
+    # Analyses automatiques (dernier résultat planifié, recalculé en arrière-plan si périmé)
+    stock_analysis = get_analysis_data('stock')
+    production_analysis = get_analysis_data('efficiency')
+    alert_analysis = get_analysis_data('alerts')
     
     # Conversations récentes
     recent_conversations = AIConversation.objects.filter(
@@ -958,15 +1069,15 @@ def ask_ai_assistant(request):
             # Analyser le contexte actuel
             context = get_current_business_context()
             
-            # Générer une réponse intelligente
-            answer = generate_ai_response(question, context)
+            # Générer une réponse via le moteur configuré (cache + regroupement)
+            answer = answer_question(question, context)
             
-            # Sauvegarder la conversation
+            # Sauvegarder la conversation (contexte dédupliqué et compressé)
             conversation = AIConversation(
                 user=request.user,
                 question=question,
                 answer=answer,
-                context=context
+                context_snapshot=ContextSnapshot.store(context)
             )
             conversation.save()
             
@@ -982,317 +1093,15 @@ def ask_ai_assistant(request):
 def run_ai_analysis(request):
     analysis_type = request.POST.get('analysis_type')
     
-    if analysis_type == 'stock':
-        result = analyze_stock_situation(detailed=True)
-    elif analysis_type == 'production':
-        result = analyze_production_efficiency(detailed=True)
-    elif analysis_type == 'alerts':
-        result = analyze_alerts(detailed=True)
+    # L'analyse "production" de l'assistant correspond à l'efficacité (ponctualité, retards)
+    stored_type = {'stock': 'stock', 'production': 'efficiency', 'alerts': 'alerts'}.get(analysis_type)
+    if stored_type:
+        result = get_analysis_data(stored_type)
     else:
         result = {'error': 'Type d\'analyse non reconnu'}
     
     return JsonResponse(result)
 
-# ========== FONCTIONS D'ANALYSE INTELLIGENTE ==========
-
-def get_current_business_context():
-    """Récupère le contexte métier actuel pour l'IA"""
-    return {
-        'low_stock_products': list(Product.objects.filter(
-            current_stock__lte=F('min_stock')
-        ).values('reference', 'name', 'current_stock', 'min_stock')),
-        
-        'delayed_orders': list(Order.objects.filter(
-            delivery_date__lt=timezone.now().date(),
-            status__in=['confirmed', 'in_production']
-        ).values('order_number', 'customer__name', 'delivery_date')),
-        
-        'active_orders_count': Order.objects.filter(status='in_production').count(),
-        'total_products': Product.objects.count(),
-        'total_customers': Customer.objects.count(),
-        
-        'recent_stock_movements': list(StockMovement.objects.select_related(
-            'product'
-        ).order_by('-created_at')[:10].values(
-            'product__reference', 'movement_type', 'quantity', 'reason', 'created_at'
-        ))
-    }
-
-def generate_ai_response(question, context):
-    """Génère une réponse intelligente basée sur les données"""
-    question_lower = question.lower()
-    
-    # Détection d'intention simple
-    if any(word in question_lower for word in ['stock', 'inventaire', 'niveau']):
-        return generate_stock_response(question, context)
-    elif any(word in question_lower for word in ['commande', 'production', 'retard']):
-        return generate_production_response(question, context)
-    elif any(word in question_lower for word in ['alerte', 'problème', 'urgence']):
-        return generate_alert_response(question, context)
-    elif any(word in question_lower for word in ['conseil', 'suggestion', 'optimiser']):
-        return generate_optimization_response(question, context)
-    else:
-        return generate_general_response(question, context)
-
-def generate_stock_response(question, context):
-    """Réponses intelligentes sur le stock"""
-    low_stock_count = len(context['low_stock_products'])
-    
-    if low_stock_count > 0:
-        products_list = "\n".join([
-            f"- {p['reference']} ({p['name']}) : {p['current_stock']} unités (min: {p['min_stock']})"
-            for p in context['low_stock_products'][:3]
-        ])
-        
-        return f"""🔴 **Alerte Stock** 
-
-J'ai détecté {low_stock_count} produits avec un stock faible :
-
-{products_list}
-
-**Recommandations :**
-• Planifier un réapprovisionnement urgent
-• Vérifier les commandes en cours pour ces produits
-• Contacter les fournisseurs prioritaires
-
-Voulez-vous que je génère une liste de réapprovisionnement ?"""
-    else:
-        return """✅ **État du Stock**
-
-Tous vos produits ont un niveau de stock satisfaisant ! 
-
-**Statistiques :**
-• Produits suivis : {total_products}
-• Aucune alerte stock active
-• Dernier mouvement : {last_movement}
-
-Tout semble sous contrôle ! 👍""".format(
-            total_products=context['total_products'],
-            last_movement=context['recent_stock_movements'][0]['created_at'].strftime('%d/%m/%Y') if context['recent_stock_movements'] else 'Aucun'
-        )
-
-def generate_production_response(question, context):
-    """Réponses intelligentes sur la production"""
-    delayed_count = len(context['delayed_orders'])
-    active_orders = context['active_orders_count']
-    
-    if delayed_count > 0:
-        orders_list = "\n".join([
-            f"- {o['order_number']} pour {o['customer__name']} (retard depuis {o['delivery_date']})"
-            for o in context['delayed_orders'][:3]
-        ])
-        
-        return f"""⚠️ **Retards de Production**
-
-{delayed_count} commande(s) sont en retard :
-
-{orders_list}
-
-**Actions recommandées :**
-• Contacter les clients pour les informer
-• Prioriser ces commandes en production
-• Vérifier la disponibilité des matières premières
-
-Voulez-vous que je génère des emails d'information pour ces clients ?"""
-    else:
-        return f"""🏭 **Production en Cours**
-
-**Tableau de bord production :**
-• Commandes en cours : {active_orders}
-• Commandes en retard : 0 ✅
-• Taux de service : Excellent
-
-Toutes les commandes respectent les délais ! 🎉"""
-
-def generate_alert_response(question, context):
-    """Réponses pour les alertes"""
-    alerts = []
-    
-    # Alertes stock
-    if context['low_stock_products']:
-        alerts.append(f"🔴 {len(context['low_stock_products'])} produits en stock faible")
-    
-    # Alertes retards
-    if context['delayed_orders']:
-        alerts.append(f"⚠️ {len(context['delayed_orders'])} commandes en retard")
-    
-    if alerts:
-        alerts_text = "\n".join([f"• {alert}" for alert in alerts])
-        return f"""🚨 **Alertes Actives**
-
-{alerts_text}
-
-**Priorités :**
-1. Traiter les stocks critiques
-2. Gérer les retards clients
-3. Planifier la production
-
-Que souhaitez-vous adresser en premier ?"""
-    else:
-        return """✅ **Aucune Alerte Critique**
-
-Aucune alerte nécessitant une attention immédiate. 
-
-**Statut :** Tout est sous contrôle 👍
-
-**Conseil :** Profitez-en pour optimiser vos processus !"""
-
-def generate_optimization_response(question, context):
-    """Recommandations d'optimisation"""
-    recommendations = [
-        "📊 **Analyser le TRS** : Vérifiez l'efficacité globale de vos équipements",
-        "🔄 **Optimiser les flux** : Réduisez les temps de changement de série",
-        "📦 **Automatiser les alertes** : Configurez des notifications proactives",
-        "🤖 **Planifier la maintenance** : Anticipez les arrêts techniques"
-    ]
-    
-    rec_text = "\n".join([f"• {rec}" for rec in recommendations])
-    
-    return f"""💡 **Recommandations d'Optimisation**
-
-{rec_text}
-
-**Question :** Sur quel aspect souhaitez-vous vous améliorer ?"""
-
-def generate_general_response(question, context):
-    """Réponses générales de l'assistant"""
-    return f"""🤖 **Assistant ERP Copilot**
-
-J'ai analysé votre question : "{question}"
-
-**Contexte actuel :**
-• {len(context['low_stock_products'])} produits en alerte stock
-• {len(context['delayed_orders'])} commandes en retard  
-• {context['active_orders_count']} commandes en production
-
-**Comment puis-vous vous aider ?**
-• Analyse détaillée du stock
-• Optimisation de la production
-• Gestion des alertes
-• Rapports de performance
-
-Dites-moi ce qui vous préoccupe ! 💪"""
-
-def analyze_stock_situation(detailed=False):
-    """Analyse intelligente du stock"""
-    low_stock_products = Product.objects.filter(current_stock__lte=F('min_stock'))
-    critical_products = Product.objects.filter(current_stock=0)
-    
-    analysis = {
-        'low_stock_count': low_stock_products.count(),
-        'critical_count': critical_products.count(),
-        'total_products': Product.objects.count(),
-        'insights': [],
-        'recommendations': []
-    }
-    
-    if detailed:
-        analysis['low_stock_products'] = list(low_stock_products.values(
-            'reference', 'name', 'current_stock', 'min_stock'
-        ))
-        analysis['critical_products'] = list(critical_products.values(
-            'reference', 'name'
-        ))
-    
-    # Insights
-    if analysis['critical_count'] > 0:
-        analysis['insights'].append(f"{analysis['critical_count']} produits en rupture de stock")
-    
-    if analysis['low_stock_count'] > 3:
-        analysis['insights'].append("Plusieurs produits nécessitent un réapprovisionnement urgent")
-    
-    # Recommandations
-    if analysis['critical_count'] > 0:
-        analysis['recommendations'].append("Commander d'urgence les produits en rupture")
-    
-    if analysis['low_stock_count'] > 0:
-        analysis['recommendations'].append("Réviser les niveaux de stock minimum")
-    
-    return analysis
-
-def analyze_production_efficiency(detailed=False):
-    """Analyse de l'efficacité production"""
-    delayed_orders = Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    )
-    
-    analysis = {
-        'delayed_orders_count': delayed_orders.count(),
-        'total_active_orders': Order.objects.filter(status='in_production').count(),
-        'on_time_rate': calculate_on_time_rate(),
-        'insights': [],
-        'recommendations': []
-    }
-    
-    if detailed:
-        analysis['delayed_orders'] = list(delayed_orders.values(
-            'order_number', 'customer__name', 'delivery_date'
-        ))
-    
-    # Insights
-    if analysis['delayed_orders_count'] > 0:
-        analysis['insights'].append(f"{analysis['delayed_orders_count']} commandes en retard")
-    
-    if analysis['on_time_rate'] < 90:
-        analysis['insights'].append("Taux de ponctualité inférieur à 90%")
-    
-    # Recommandations
-    if analysis['delayed_orders_count'] > 0:
-        analysis['recommendations'].append("Mettre en place un plan de rattrapage")
-    
-    analysis['recommendations'].append("Optimiser la planification de la production")
-    
-    return analysis
-
-def analyze_alerts(detailed=False):
-    """Analyse consolidée des alertes"""
-    alerts = {
-        'stock_alerts': Product.objects.filter(current_stock__lte=F('min_stock')).count(),
-        'delivery_alerts': Order.objects.filter(
-            delivery_date__lt=timezone.now().date(),
-            status__in=['confirmed', 'in_production']
-        ).count(),
-        'priority_alerts': [],
-        'insights': [],
-        'recommendations': []
-    }
-    
-    # Déterminer la priorité
-    if alerts['stock_alerts'] > 5:
-        alerts['priority_alerts'].append("STOCK: Plus de 5 produits en alerte")
-    
-    if alerts['delivery_alerts'] > 3:
-        alerts['priority_alerts'].append("LIVRAISON: Plusieurs retards clients")
-    
-    # Insights
-    if alerts['stock_alerts'] > 0:
-        alerts['insights'].append(f"{alerts['stock_alerts']} alertes stock à traiter")
-    
-    if alerts['delivery_alerts'] > 0:
-        alerts['insights'].append(f"{alerts['delivery_alerts']} retards de livraison")
-    
-    # Recommandations
-    if alerts['priority_alerts']:
-        alerts['recommendations'].append("Traiter les alertes prioritaires immédiatement")
-    
-    alerts['recommendations'].append("Mettre à jour le tableau de bord quotidien")
-    
-    return alerts
-
-def calculate_on_time_rate():
-    """Calcule le taux de ponctualité"""
-    total_delivered = Order.objects.filter(status__in=['shipped', 'delivered']).count()
-    on_time_delivered = Order.objects.filter(
-        status__in=['shipped', 'delivered'],
-        delivery_date__gte=models.F('created_at')
-    ).count()
-    
-    if total_delivered > 0:
-        return round((on_time_delivered / total_delivered) * 100, 1)
-    return 100.0
-
-
 @login_required
 @role_required(['admin', 'manager'])
 def archive_product(request, product_id):
@@ -1307,229 +1116,6 @@ def archive_product(request, product_id):
     return render(request, 'dashboard/products/archive_product.html', {'product': product})
 
 # ========== ERP COPILOT ==========
-@login_required
-def erp_copilot(request):
-    """Vue principale pour l'ERP Copilot - Assistant automatique contextuel"""
-    
-    # Récupérer le contexte métier actuel
-    business_context = get_current_business_context()
-    
-    # Générer des insights automatiques
-    automatic_insights = generate_automatic_insights(business_context)
-    
-    # Statistiques pour le dashboard copilot
-    copilot_stats = {
-        'total_insights': len(automatic_insights),
-        'critical_alerts': business_context['low_stock_products_count'] + business_context['delayed_orders_count'],
-        'optimization_opportunities': count_optimization_opportunities(business_context),
-        'recent_activities': get_recent_activities()
-    }
-    
-    context = {
-        'business_context': business_context,
-        'automatic_insights': automatic_insights,
-        'copilot_stats': copilot_stats,
-        'page_suggestions': get_page_specific_suggestions(request.path),
-    }
-    
-    return render(request, 'dashboard/copilot/erp_copilot.html', context)
-
-@login_required
-def copilot_analyze(request):
-    """Endpoint pour l'analyse en temps réel par le copilot"""
-    if request.method == 'POST':
-        analysis_type = request.POST.get('analysis_type', 'overview')
-        
-        if analysis_type == 'stock':
-            result = analyze_stock_situation(detailed=True)
-        elif analysis_type == 'production':
-            result = analyze_production_efficiency(detailed=True)
-        elif analysis_type == 'financial':
-            result = analyze_financial_performance()
-        elif analysis_type == 'optimization':
-            result = analyze_optimization_opportunities()
-        else:
-            result = get_business_overview()
-        
-        return JsonResponse({
-            'success': True,
-            'analysis_type': analysis_type,
-            'data': result,
-            'timestamp': timezone.now().strftime('%d/%m/%Y %H:%M')
-        })
-    
-    return JsonResponse({'success': False, 'error': 'Méthode non autorisée'})
-
-# ========== VUES CONCRETES POUR ACTIONS RAPIDES ==========
-
-@login_required
-def copilot_analyze(request):
-    """Endpoint pour l'analyse en temps réel par le copilot"""
-    if request.method == 'POST':
-        analysis_type = request.POST.get('analysis_type', 'overview')
-        
-        if analysis_type == 'stock':
-            result = analyze_stock_situation(detailed=True)
-        elif analysis_type == 'production':
-            result = analyze_production_efficiency(detailed=True)
-        elif analysis_type == 'financial':
-            result = analyze_financial_performance()
-        elif analysis_type == 'optimization':
-            result = analyze_optimization_opportunities()
-        else:
-            result = get_business_overview()
-        
-        return JsonResponse({
-            'success': True,
-            'analysis_type': analysis_type,
-            'data': result,
-            'timestamp': timezone.now().strftime('%d/%m/%Y %H:%M')
-        })
-    
-    return JsonResponse({'success': False, 'error': 'Méthode non autorisée'})
-
-@login_required
-def copilot_execute_action(request):
-    """Endpoint pour exécuter des actions concrètes"""
-    if request.method == 'POST':
-        action = request.POST.get('action')
-        
-        if action == 'stock_report':
-            # Générer un vrai rapport stock
-            low_stock_products = Product.objects.filter(current_stock__lte=F('min_stock'))
-            critical_products = Product.objects.filter(current_stock=0)
-            
-            result = {
-                'message': '📊 Rapport de Stock Généré',
-                'type': 'report',
-                'data': {
-                    'low_stock_count': low_stock_products.count(),
-                    'critical_count': critical_products.count(),
-                    'low_stock_products': list(low_stock_products.values('reference', 'name', 'current_stock', 'min_stock')),
-                    'critical_products': list(critical_products.values('reference', 'name', 'current_stock')),
-                    'generated_at': timezone.now().strftime('%d/%m/%Y %H:%M')
-                }
-            }
-            
-        elif action == 'production_plan':
-            # Générer un plan de production
-            delayed_orders = Order.objects.filter(
-                delivery_date__lt=timezone.now().date(),
-                status__in=['confirmed', 'in_production']
-            )
-            urgent_orders = Order.objects.filter(
-                delivery_date__lte=timezone.now().date() + timezone.timedelta(days=2),
-                status__in=['confirmed', 'in_production']
-            )
-            
-            result = {
-                'message': '📅 Plan de Production Généré',
-                'type': 'plan',
-                'data': {
-                    'delayed_orders_count': delayed_orders.count(),
-                    'urgent_orders_count': urgent_orders.count(),
-                    'delayed_orders': list(delayed_orders.values('order_number', 'customer__name', 'delivery_date')),
-                    'urgent_orders': list(urgent_orders.values('order_number', 'customer__name', 'delivery_date')),
-                    'priority_actions': [
-                        "Traiter les commandes en retard en priorité",
-                        "Contacter les clients des commandes retardées",
-                        "Réviser la planification de la semaine"
-                    ]
-                }
-            }
-            
-        elif action == 'customer_analysis':
-            # Analyse clients
-            top_customers = Customer.objects.annotate(
-                total_orders=Count('order'),
-                total_spent=Sum('order__total_amount')
-            ).order_by('-total_spent')[:5]
-            
-            result = {
-                'message': '👥 Analyse Clients Générée',
-                'type': 'analysis',
-                'data': {
-                    'total_customers': Customer.objects.count(),
-                    'top_customers': list(top_customers.values('name', 'email', 'total_orders', 'total_spent')),
-                    'insights': [
-                        f"{len(top_customers)} clients représentent 80% du chiffre d'affaires",
-                        "Opportunité de fidélisation des clients premium"
-                    ]
-                }
-            }
-            
-        elif action == 'alert_summary':
-            # Synthèse des alertes
-            stock_alerts = Product.objects.filter(current_stock__lte=F('min_stock')).count()
-            delivery_alerts = Order.objects.filter(
-                delivery_date__lt=timezone.now().date(),
-                status__in=['confirmed', 'in_production']
-            ).count()
-            
-            result = {
-                'message': '🚨 Synthèse des Alertes',
-                'type': 'alerts',
-                'data': {
-                    'stock_alerts': stock_alerts,
-                    'delivery_alerts': delivery_alerts,
-                    'critical_alerts': Product.objects.filter(current_stock=0).count(),
-                    'actions_required': [
-                        f"Réapprovisionner {stock_alerts} produits" if stock_alerts > 0 else "Aucune alerte stock",
-                        f"Traiter {delivery_alerts} retards" if delivery_alerts > 0 else "Aucun retard"
-                    ]
-                }
-            }
-            
-        elif action == 'reapprovisionner_urgence':
-            # Action concrète pour réapprovisionnement
-            critical_products = Product.objects.filter(current_stock=0)
-            if critical_products.exists():
-                product_list = ", ".join([p.reference for p in critical_products[:3]])
-                result = {
-                    'message': f'🔄 Réapprovisionnement Urgence',
-                    'type': 'action',
-                    'data': {
-                        'products': list(critical_products.values('reference', 'name')),
-                        'recommended_quantities': {p.reference: p.min_stock * 3 for p in critical_products},
-                        'next_steps': [
-                            f"Commander {len(critical_products)} produits en urgence",
-                            "Contacter les fournisseurs prioritaires",
-                            "Mettre à jour le planning de réception"
-                        ]
-                    }
-                }
-            else:
-                result = {'message': '✅ Aucun produit en rupture de stock'}
-                
-        elif action == 'gerer_retards':
-            # Action pour gérer les retards
-            delayed_orders = Order.objects.filter(
-                delivery_date__lt=timezone.now().date(),
-                status__in=['confirmed', 'in_production']
-            )
-            if delayed_orders.exists():
-                result = {
-                    'message': f'⏰ Gestion des Retards',
-                    'type': 'action',
-                    'data': {
-                        'delayed_orders_count': delayed_orders.count(),
-                        'orders': list(delayed_orders.values('order_number', 'customer__name', 'delivery_date')),
-                        'actions': [
-                            "Prioriser ces commandes en production",
-                            "Contacter les clients pour informer",
-                            "Réviser les délais de livraison"
-                        ]
-                    }
-                }
-            else:
-                result = {'message': '✅ Aucune commande en retard'}
-                
-        else:
-            result = {'message': f'Action "{action}" exécutée'}
-        
-        return JsonResponse({'success': True, 'result': result})
-    
-    return JsonResponse({'success': False, 'error': 'Méthode non autorisée'})
 
 @login_required
 def copilot_suggest_action(request):
@@ -1555,7 +1141,7 @@ def copilot_suggest_action(request):
 
 # ========== FONCTIONS SUPPORT ERP COPILOT ==========
 
-def generate_automatic_insights(business_context):
+def generate_automatic_insights(business_context, on_time_rate=None):
     """Génère des insights automatiques basés sur le contexte métier"""
     insights = []
     
@@ -1608,7 +1194,8 @@ def generate_automatic_insights(business_context):
         })
     
     # Insights sur les performances
-    on_time_rate = calculate_on_time_rate()
+    if on_time_rate is None:
+        on_time_rate = calculate_on_time_rate()
     if on_time_rate < 85:
         insights.append({
             'type': 'warning',
@@ -1628,7 +1215,7 @@ def count_optimization_opportunities(business_context):
     opportunities = 0
     
     # Opportunités stock
-    low_stock_ratio = len(business_context['low_stock_products']) / business_context['total_products']
+    low_stock_ratio = len(business_context['low_stock_products']) / max(business_context['total_products'], 1)
     if low_stock_ratio > 0.1:  # Plus de 10% des produits en stock faible
         opportunities += 1
     
@@ -1726,215 +1313,12 @@ def get_page_specific_suggestions(current_path):
     
     return suggestions
 
-def analyze_financial_performance():
-    """Analyse les performances financières"""
-    # Calcul du chiffre d'affaires des 30 derniers jours
-    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_orders = Order.objects.filter(
-        created_at__gte=thirty_days_ago,
-        status__in=['shipped', 'delivered']
-    )
-    
-    total_revenue = sum(order.total_amount for order in recent_orders)
-    average_order_value = total_revenue / len(recent_orders) if recent_orders else 0
-    
-    # Analyse de la rentabilité
-    high_value_orders = recent_orders.filter(total_amount__gt=average_order_value * 1.5)
-    
-    return {
-        'total_revenue_30d': total_revenue,
-        'average_order_value': round(average_order_value, 2),
-        'high_value_orders_count': high_value_orders.count(),
-        'orders_count_30d': len(recent_orders),
-        'insights': [
-            f"CA 30j : {total_revenue:,.2f}€" if total_revenue > 0 else "Aucune vente récente",
-            f"Commande moyenne : {average_order_value:.2f}€" if average_order_value > 0 else ""
-        ],
-        'recommendations': [
-            "Développer le portefeuille clients" if len(recent_orders) < 10 else "",
-            "Fidéliser les clients à forte valeur" if high_value_orders.count() > 0 else ""
-        ]
-    }
-
-def analyze_optimization_opportunities():
-    """Identifie les opportunités d'optimisation"""
-    opportunities = []
-    
-    # Optimisation stock
-    overstock_products = Product.objects.filter(current_stock__gt=F('max_stock') * 1.2)
-    if overstock_products.exists():
-        opportunities.append({
-            'category': 'stock',
-            'title': 'Surstock détecté',
-            'description': f'{overstock_products.count()} produits au-dessus du stock max',
-            'impact': 'medium',
-            'action': 'reduire_stock'
-        })
-    
-    # Optimisation production
-    long_production_orders = Order.objects.filter(
-        status='in_production',
-        created_at__lte=timezone.now() - timezone.timedelta(days=7)
-    )
-    if long_production_orders.exists():
-        opportunities.append({
-            'category': 'production',
-            'title': 'Temps de production longs',
-            'description': f'{long_production_orders.count()} commandes en production depuis +7j',
-            'impact': 'high',
-            'action': 'accelerer_production'
-        })
-    
-    # Optimisation processus
-    draft_orders = Order.objects.filter(status='draft', created_at__lte=timezone.now() - timezone.timedelta(days=2))
-    if draft_orders.exists():
-        opportunities.append({
-            'category': 'process',
-            'title': 'Commandes en attente',
-            'description': f'{draft_orders.count()} commandes brouillons non traitées',
-            'impact': 'low',
-            'action': 'traiter_brouillons'
-        })
-    
-    return {
-        'total_opportunities': len(opportunities),
-        'high_impact_count': len([o for o in opportunities if o['impact'] == 'high']),
-        'opportunities': opportunities
-    }
-
-def get_business_overview():
-    """Vue d'ensemble de l'entreprise"""
-    context = get_current_business_context()
-    
-    return {
-        'summary': {
-            'total_customers': context['total_customers'],
-            'total_products': context['total_products'],
-            'active_orders': context['active_orders_count'],
-            'monthly_revenue': analyze_financial_performance()['total_revenue_30d']
-        },
-        'health_indicators': {
-            'stock_health': calculate_stock_health(),
-            'production_health': calculate_production_health(),
-            'financial_health': calculate_financial_health()
-        },
-        'key_metrics': {
-            'on_time_delivery_rate': calculate_on_time_rate(),
-            'stock_turnover': calculate_stock_turnover(),
-            'customer_satisfaction': estimate_customer_satisfaction()
-        }
-    }
-
-def calculate_stock_health():
-    """Calcule la santé du stock (0-100%)"""
-    total_products = Product.objects.count()
-    if total_products == 0:
-        return 100
-    
-    healthy_stock = Product.objects.filter(
-        current_stock__gt=F('min_stock'),
-        current_stock__lte=F('max_stock')
-    ).count()
-    
-    return round((healthy_stock / total_products) * 100, 1)
-
-def calculate_production_health():
-    """Calcule la santé de la production (0-100%)"""
-    total_orders = Order.objects.filter(status__in=['confirmed', 'in_production', 'shipped']).count()
-    if total_orders == 0:
-        return 100
-    
-    on_time_orders = Order.objects.filter(
-        status__in=['shipped', 'delivered'],
-        delivery_date__gte=models.F('created_at')
-    ).count()
-    
-    return round((on_time_orders / total_orders) * 100, 1) if total_orders > 0 else 100
-
-def calculate_financial_health():
-    """Estime la santé financière (simplifié)"""
-    # Logique simplifiée - à adapter selon vos besoins
-    recent_paid_orders = Order.objects.filter(
-        status__in=['shipped', 'delivered'],
-        created_at__gte=timezone.now() - timezone.timedelta(days=30)
-    ).count()
-    
-    if recent_paid_orders > 20:
-        return 90
-    elif recent_paid_orders > 10:
-        return 75
-    elif recent_paid_orders > 5:
-        return 60
-    else:
-        return 40
-
-def calculate_stock_turnover():
-    """Calcule la rotation des stocks (simplifié)"""
-    # Logique simplifiée - à implémenter selon votre business
-    return 4.2  # Exemple: 4.2 rotations par an
-
-def estimate_customer_satisfaction():
-    """Estime la satisfaction client (simplifié)"""
-    delayed_orders = Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    ).count()
-    
-    total_active_orders = Order.objects.filter(status__in=['confirmed', 'in_production']).count()
-    
-    if total_active_orders == 0:
-        return 95
-    
-    satisfaction = 100 - (delayed_orders / total_active_orders * 50)  # Pénalité pour retards
-    return max(60, min(100, round(satisfaction, 1)))
-
-def generate_action_suggestions(action_type, context):
-    """Génère des suggestions d'actions spécifiques"""
-    suggestions = []
-    
-    if action_type == 'stock_management':
-        low_stock_products = context.get('low_stock_products', [])
-        for product in low_stock_products[:3]:
-            suggestions.append({
-                'action': f'reorder_{product["reference"]}',
-                'title': f'Réapprovisionner {product["reference"]}',
-                'description': f'Stock actuel: {product["current_stock"]}, Minimum: {product["min_stock"]}',
-                'priority': 'high' if product['current_stock'] == 0 else 'medium'
-            })
-    
-    elif action_type == 'production_optimization':
-        if context.get('delayed_orders_count', 0) > 0:
-            suggestions.append({
-                'action': 'prioritize_delayed_orders',
-                'title': 'Prioriser les commandes en retard',
-                'description': f'{context["delayed_orders_count"]} commandes nécessitent une attention immédiate',
-                'priority': 'high'
-            })
-    
-    elif action_type == 'customer_management':
-        suggestions.extend([
-            {
-                'action': 'analyze_customer_segments',
-                'title': 'Analyser les segments clients',
-                'description': 'Identifier les clients les plus rentables',
-                'priority': 'medium'
-            },
-            {
-                'action': 'check_payment_delays',
-                'title': 'Vérifier les retards de paiement',
-                'description': 'Surveiller la santé financière des clients',
-                'priority': 'medium'
-            }
-        ])
-    
-    return suggestions
-
 def execute_copilot_action(action, parameters, user):
     """Exécute une action via le copilot"""
     
     if action == 'generate_stock_report':
         # Générer un rapport de stock
-        low_stock_products = Product.objects.filter(current_stock__lte=F('min_stock'))
+        low_stock_products = Product.objects.filter(LOW_STOCK)
         return {
             'message': f'Rapport généré: {low_stock_products.count()} produits en stock faible',
             'data': list(low_stock_products.values('reference', 'name', 'current_stock', 'min_stock'))
@@ -1958,11 +1342,17 @@ def execute_copilot_action(action, parameters, user):
         product_ref = action.replace('reorder_', '')
         try:
             product = Product.objects.get(reference=product_ref)
-            suggested_qty = max(product.min_stock * 2, product.current_stock + 10)
+            # Produit absent de la prévision en cache (créé depuis) : pas de quantité suggérée
+            forecast = get_product_forecast(product)
+            suggested_qty = forecast['suggested_quantity'] if forecast else None
             return {
-                'message': f'Réapprovisionnement suggéré pour {product_ref}: {suggested_qty} unités',
+                'message': (
+                    f'Réapprovisionnement suggéré pour {product_ref}: {suggested_qty} unités' if forecast
+                    else f'Aucune prévision disponible pour {product_ref}'
+                ),
                 'product': product_ref,
-                'suggested_quantity': suggested_qty
+                'suggested_quantity': suggested_qty,
+                'forecast': forecast
             }
         except Product.DoesNotExist:
             return {'error': f'Produit {product_ref} non trouvé'}
@@ -1970,305 +1360,84 @@ def execute_copilot_action(action, parameters, user):
     else:
         return {'error': f'Action {action} non reconnue'}
 
-# ========== FONCTIONS SUPPORT ERP COPILOT ==========
+# Données dont dépend le fragment `copilot_main` du gabarit
+COPILOT_FRAGMENT_DATA = ('order', 'product', 'stock', 'analysis')
 
-def get_current_business_context():
-    """Récupère le contexte métier actuel pour l'IA - Version corrigée"""
-    low_stock_products = list(Product.objects.filter(
-        current_stock__lte=F('min_stock')
-    ).values('reference', 'name', 'current_stock', 'min_stock'))
-    
-    delayed_orders = list(Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    ).values('order_number', 'customer__name', 'delivery_date'))
-    
-    recent_stock_movements = list(StockMovement.objects.select_related(
-        'product'
-    ).order_by('-created_at')[:10].values(
-        'product__reference', 'movement_type', 'quantity', 'reason', 'created_at'
-    ))
-    
-    context = {
-        'low_stock_products': low_stock_products,
-        'delayed_orders': delayed_orders,
-        'active_orders_count': Order.objects.filter(status='in_production').count(),
-        'total_products': Product.objects.count(),
-        'total_customers': Customer.objects.count(),
-        'recent_stock_movements': recent_stock_movements,
-        'low_stock_products_count': len(low_stock_products),
-        'delayed_orders_count': len(delayed_orders),
-        'cash_flow_risk': analyze_cash_flow_risk(),
-        'production_capacity': estimate_production_capacity()
-    }
-    
-    return context
 
-def get_extended_business_context():
-    """Version étendue pour le copilot - sans récursion"""
-    base_context = get_current_business_context()
+def build_copilot_context(sections, missing):
+    """Contexte du copilot à partir des sections calculées (contexte métier, vue d'ensemble, activités)"""
+    overview = sections['overview'] or {}
+    health_indicators = overview.get('health_indicators', {})
     
-    # Ajouter des données supplémentaires pour le copilot
-    base_context.update({
-        'cash_flow_risk': analyze_cash_flow_risk(),
-        'production_capacity': estimate_production_capacity(),
-        'health_indicators': {
-            'stock_health': calculate_stock_health(),
-            'production_health': calculate_production_health(),
-            'financial_health': calculate_financial_health()
-        }
-    })
-    
-    return base_context
-
-@login_required
-def erp_copilot(request):
-    """Vue principale pour l'ERP Copilot - Assistant automatique contextuel"""
-    
-    # Utiliser la version étendue sans récursion
-    business_context = get_extended_business_context()
+    business_context = sections['business_context'] or {
+        'low_stock_products': [],
+        'delayed_orders': [],
+        'active_orders_count': 0,
+        'total_products': 0,
+        'low_stock_products_count': 0,
+        'delayed_orders_count': 0,
+    }
+    business_context['health_indicators'] = {
+        'stock_health': health_indicators.get('stock_health'),
+        'production_health': health_indicators.get('production_health'),
+        'financial_health': health_indicators.get('financial_health'),
+    }
     
-    # Générer des insights automatiques
-    automatic_insights = generate_automatic_insights(business_context)
+    # Générer des insights automatiques (sans requête : le taux de ponctualité est déjà calculé)
+    automatic_insights = generate_automatic_insights(
+        business_context, on_time_rate=overview.get('key_metrics', {}).get('on_time_delivery_rate')
+    )
     
     # Statistiques pour le dashboard copilot
     copilot_stats = {
         'total_insights': len(automatic_insights),
         'critical_alerts': business_context['low_stock_products_count'] + business_context['delayed_orders_count'],
         'optimization_opportunities': count_optimization_opportunities(business_context),
-        'recent_activities': get_recent_activities()
+        'recent_activities': sections['recent_activities'] or []
     }
     
-    context = {
+    return {
         'business_context': business_context,
         'automatic_insights': automatic_insights,
         'copilot_stats': copilot_stats,
-        'page_suggestions': get_page_specific_suggestions(request.path),
-    }
-    
-    return render(request, 'dashboard/copilot/erp_copilot.html', context)
-
-def analyze_cash_flow_risk():
-    """Analyse simplifiée du risque de trésorerie"""
-    # Logique simplifiée - à adapter
-    unpaid_orders = Order.objects.filter(status='shipped').count()
-    return unpaid_orders > 5  # Risque si plus de 5 commandes livrées non payées
-
-def estimate_production_capacity():
-    """Estime la capacité de production actuelle"""
-    active_orders = Order.objects.filter(status='in_production').count()
-    return "Élevée" if active_orders < 8 else "Critique" if active_orders > 15 else "Normale"
-
-def calculate_stock_health():
-    """Calcule la santé du stock (0-100%)"""
-    total_products = Product.objects.count()
-    if total_products == 0:
-        return 100
-    
-    # Utilisez seulement min_stock puisque max_stock n'existe pas
-    healthy_stock = Product.objects.filter(
-        current_stock__gt=F('min_stock')
-    ).count()
-    
-    return round((healthy_stock / total_products) * 100, 1)
-
-def analyze_optimization_opportunities():
-    """Identifie les opportunités d'optimisation - Version corrigée"""
-    opportunities = []
-    
-    # Optimisation stock - version corrigée sans max_stock
-    overstock_products = Product.objects.filter(current_stock__gt=F('min_stock') * 3)
-    if overstock_products.exists():
-        opportunities.append({
-            'category': 'stock',
-            'title': 'Surstock potentiel',
-            'description': f'{overstock_products.count()} produits avec stock > 3x minimum',
-            'impact': 'medium',
-            'action': 'reduire_stock'
-        })
-    
-    # Optimisation production
-    long_production_orders = Order.objects.filter(
-        status='in_production',
-        created_at__lte=timezone.now() - timezone.timedelta(days=7)
-    )
-    if long_production_orders.exists():
-        opportunities.append({
-            'category': 'production',
-            'title': 'Temps de production longs',
-            'description': f'{long_production_orders.count()} commandes en production depuis +7j',
-            'impact': 'high',
-            'action': 'accelerer_production'
-        })
-    
-    # Optimisation processus
-    draft_orders = Order.objects.filter(status='draft', created_at__lte=timezone.now() - timezone.timedelta(days=2))
-    if draft_orders.exists():
-        opportunities.append({
-            'category': 'process',
-            'title': 'Commandes en attente',
-            'description': f'{draft_orders.count()} commandes brouillons non traitées',
-            'impact': 'low',
-            'action': 'traiter_brouillons'
-        })
-    
-    return {
-        'total_opportunities': len(opportunities),
-        'high_impact_count': len([o for o in opportunities if o['impact'] == 'high']),
-        'opportunities': opportunities
+        'missing_sections': missing,
     }
 
-def calculate_production_health():
-    """Calcule la santé de la production (0-100%)"""
-    total_orders = Order.objects.filter(status__in=['confirmed', 'in_production', 'shipped']).count()
-    if total_orders == 0:
-        return 100
-    
-    on_time_orders = Order.objects.filter(
-        status__in=['shipped', 'delivered'],
-        delivery_date__gte=models.F('created_at')
-    ).count()
-    
-    return round((on_time_orders / total_orders) * 100, 1) if total_orders > 0 else 100
 
-def calculate_financial_health():
-    """Estime la santé financière (simplifié)"""
-    # Logique simplifiée - à adapter selon vos besoins
-    recent_paid_orders = Order.objects.filter(
-        status__in=['shipped', 'delivered'],
-        created_at__gte=timezone.now() - timezone.timedelta(days=30)
-    ).count()
-    
-    if recent_paid_orders > 20:
-        return 90
-    elif recent_paid_orders > 10:
-        return 75
-    elif recent_paid_orders > 5:
-        return 60
+@login_required
+async def erp_copilot(request):
+    """Vue principale pour l'ERP Copilot - sections indépendantes calculées en parallèle"""
+    user = await request.auser()
+    
+    if await sync_to_async(fragment_is_cached)('copilot_main', COPILOT_FRAGMENT_DATA, user.role):
+        # Fragment à jour : rien n'est calculé. Repli synchrone (au rendu) s'il expire entre-temps
+        @functools.cache
+        def fallback():
+            return build_copilot_context({
+                'business_context': get_current_business_context(),
+                'overview': get_analysis_data('overview'),
+                'recent_activities': get_recent_activities(),
+            }, [])
+        
+        context = {
+            name: functools.partial(lambda name: fallback()[name], name)
+            for name in ('business_context', 'automatic_insights', 'copilot_stats', 'missing_sections')
+        }
     else:
-        return 40
-    
-    
-# ========== FONCTIONS MANQUANTES POUR LES ANALYSES ==========
-
-def analyze_financial_performance():
-    """Analyse les performances financières"""
-    # Calcul du chiffre d'affaires des 30 derniers jours
-    thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_orders = Order.objects.filter(
-        created_at__gte=thirty_days_ago,
-        status__in=['shipped', 'delivered']
-    )
-    
-    total_revenue = sum(order.total_amount for order in recent_orders) if recent_orders else 0
-    average_order_value = total_revenue / len(recent_orders) if recent_orders else 0
-    
-    # Analyse de la rentabilité
-    high_value_orders = recent_orders.filter(total_amount__gt=average_order_value * 1.5) if recent_orders else []
-    
-    return {
-        'total_revenue_30d': total_revenue,
-        'average_order_value': round(average_order_value, 2),
-        'high_value_orders_count': len(high_value_orders),
-        'orders_count_30d': len(recent_orders),
-        'insights': [
-            f"CA 30j : {total_revenue:,.2f}€" if total_revenue > 0 else "Aucune vente récente",
-            f"Commande moyenne : {average_order_value:.2f}€" if average_order_value > 0 else "Aucune commande"
-        ],
-        'recommendations': [
-            "Développer le portefeuille clients" if len(recent_orders) < 10 else "Portefeuille clients stable",
-            "Fidéliser les clients à forte valeur" if len(high_value_orders) > 0 else "Diversifier le portefeuille"
-        ]
-    }
-
-def analyze_optimization_opportunities():
-    """Identifie les opportunités d'optimisation - Version corrigée"""
-    opportunities = []
-    
-    # Optimisation stock
-    overstock_products = Product.objects.filter(current_stock__gt=F('min_stock') * 3)
-    if overstock_products.exists():
-        opportunities.append({
-            'category': 'stock',
-            'title': 'Surstock potentiel',
-            'description': f'{overstock_products.count()} produits avec stock > 3x minimum',
-            'impact': 'medium',
-            'action': 'reduire_stock'
+        # Contexte métier, vue d'ensemble planifiée et activités récentes en parallèle
+        sections, missing = await gather_sections({
+            'business_context': get_current_business_context,
+            'overview': lambda: get_analysis_data('overview'),
+            'recent_activities': get_recent_activities,
         })
+        context = build_copilot_context(sections, missing)
+        if missing:
+            # Sections en timeout : ce rendu partiel ne doit pas être mis en cache
+            context['fragment_cache_ttl'] = 0
     
-    # Optimisation production
-    long_production_orders = Order.objects.filter(
-        status='in_production',
-        created_at__lte=timezone.now() - timezone.timedelta(days=7)
-    )
-    if long_production_orders.exists():
-        opportunities.append({
-            'category': 'production',
-            'title': 'Temps de production longs',
-            'description': f'{long_production_orders.count()} commandes en production depuis +7j',
-            'impact': 'high',
-            'action': 'accelerer_production'
-        })
-    
-    # Optimisation processus
-    draft_orders = Order.objects.filter(status='draft', created_at__lte=timezone.now() - timezone.timedelta(days=2))
-    if draft_orders.exists():
-        opportunities.append({
-            'category': 'process',
-            'title': 'Commandes en attente',
-            'description': f'{draft_orders.count()} commandes brouillons non traitées',
-            'impact': 'low',
-            'action': 'traiter_brouillons'
-        })
+    context['page_suggestions'] = get_page_specific_suggestions(request.path)
     
-    return {
-        'total_opportunities': len(opportunities),
-        'high_impact_count': len([o for o in opportunities if o['impact'] == 'high']),
-        'opportunities': opportunities
-    }
-
-def get_business_overview():
-    """Vue d'ensemble de l'entreprise"""
-    context = get_current_business_context()
-    
-    return {
-        'summary': {
-            'total_customers': context['total_customers'],
-            'total_products': context['total_products'],
-            'active_orders': context['active_orders_count'],
-            'monthly_revenue': analyze_financial_performance()['total_revenue_30d']
-        },
-        'health_indicators': {
-            'stock_health': calculate_stock_health(),
-            'production_health': calculate_production_health(),
-            'financial_health': calculate_financial_health()
-        },
-        'key_metrics': {
-            'on_time_delivery_rate': calculate_on_time_rate(),
-            'stock_turnover': 4.2,  # Valeur simulée
-            'customer_satisfaction': estimate_customer_satisfaction()
-        }
-    }
-
-def calculate_stock_turnover():
-    """Calcule la rotation des stocks (simplifié)"""
-    # Logique simplifiée - à implémenter selon votre business
-    return 4.2  # Exemple: 4.2 rotations par an
-
-def estimate_customer_satisfaction():
-    """Estime la satisfaction client (simplifié)"""
-    delayed_orders = Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    ).count()
-    
-    total_active_orders = Order.objects.filter(status__in=['confirmed', 'in_production']).count()
-    
-    if total_active_orders == 0:
-        return 95
-    
-    satisfaction = 100 - (delayed_orders / total_active_orders * 50)  # Pénalité pour retards
-    return max(60, min(100, round(satisfaction, 1)))
+    return await sync_to_async(render)(request, 'dashboard/copilot/erp_copilot.html', context)
 
 def generate_action_suggestions(action_type, context):
     """Génère des suggestions d'actions spécifiques"""
@@ -2312,30 +1481,38 @@ def generate_action_suggestions(action_type, context):
     return suggestions    
 
 
-@require_POST
+@require_http_methods(['GET', 'POST'])
 @login_required
-def copilot_analyze(request):
-    """Endpoint pour les analyses en temps réel"""
+async def copilot_analyze(request):
+    """Endpoint des analyses du copilot : sert le dernier résultat planifié (AIAnalysis).
+
+    En GET, la réponse porte l'ETag de la ligne servie : un `If-None-Match`
+    identique reçoit un 304 sans sérialiser le résultat.
+    """
     try:
-        analysis_type = request.POST.get('analysis_type', 'overview')
+        params = request.GET if request.method == 'GET' else request.POST
+        analysis_type = params.get('analysis_type', 'overview')
         
-        if analysis_type == 'overview':
-            data = get_business_overview()
-        elif analysis_type == 'stock':
-            data = analyze_stock_situation()
-        elif analysis_type == 'production':
-            data = analyze_production_situation()
-        elif analysis_type == 'financial':
-            data = analyze_financial_performance()
-        else:
+        if analysis_type not in ('overview', 'stock', 'production', 'financial', 'optimization'):
             return JsonResponse({'success': False, 'error': 'Type d\'analyse non valide'})
+        analysis = await sync_to_async(get_analysis)(analysis_type)
         
-        return JsonResponse({
+        etag = analysis_etag(analysis) if request.method == 'GET' else None
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+        
+        response = JsonResponse({
             'success': True,
             'analysis_type': analysis_type,
-            'data': data,
+            'data': analysis_payload(analysis),
             'timestamp': timezone.now().isoformat()
         })
+        if etag:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
         
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -2347,12 +1524,15 @@ def copilot_execute_action(request):
     try:
         action = request.POST.get('action', '')
         
-        if action == 'stock_report':
-            result = generate_stock_report()
-        elif action == 'production_plan':
-            result = generate_production_plan()
-        elif action == 'customer_analysis':
-            result = generate_customer_analysis()
+        if action in JOB_HANDLERS:
+            # Rapports lourds : exécutés par `manage.py run_worker`, le client suit la tâche
+            job = enqueue(action, user=request.user)
+            return JsonResponse({
+                'success': True,
+                'job_id': job.pk,
+                'status': job.status,
+                'status_url': reverse('job_status', args=[job.pk]),
+            }, status=202)
         elif action == 'alert_summary':
             result = generate_alert_summary()
         else:
@@ -2367,58 +1547,13 @@ def copilot_execute_action(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
-# ========== FONCTIONS D'ANALYSE CONCRÈTES ==========
-
-def analyze_stock_situation():
-    """Analyse concrète de la situation du stock"""
-    low_stock_products = list(Product.objects.filter(
-        current_stock__lte=F('min_stock')
-    ).values('reference', 'name', 'current_stock', 'min_stock'))
-    
-    critical_products = [p for p in low_stock_products if p['current_stock'] == 0]
-    
-    return {
-        'low_stock_count': len(low_stock_products),
-        'critical_count': len(critical_products),
-        'low_stock_products': low_stock_products,
-        'insights': [
-            f"{len(critical_products)} produits en rupture de stock",
-            f"{len(low_stock_products)} produits sous le stock minimum",
-            "Planifier les réapprovisionnements urgents" if critical_products else "Stock globalement stable"
-        ]
-    }
-
-def analyze_production_situation():
-    """Analyse concrète de la production"""
-    delayed_orders = list(Order.objects.filter(
-        delivery_date__lt=timezone.now().date(),
-        status__in=['confirmed', 'in_production']
-    ).values('order_number', 'customer__name', 'delivery_date'))
-    
-    urgent_orders = Order.objects.filter(
-        delivery_date__lte=timezone.now().date() + timezone.timedelta(days=2),
-        status__in=['confirmed', 'in_production']
-    ).count()
-    
-    return {
-        'delayed_orders_count': len(delayed_orders),
-        'urgent_orders_count': urgent_orders,
-        'total_active_orders': Order.objects.filter(status='in_production').count(),
-        'delayed_orders': delayed_orders,
-        'priority_actions': [
-            "Traiter les commandes en retard en priorité",
-            "Replanifier la production pour les urgences",
-            "Contacter les clients pour les retards importants"
-        ] if delayed_orders else ["Production dans les délais"]
-    }
-
 # ========== FONCTIONS D'ACTION CONCRÈTES ==========
 
 def generate_stock_report():
     """Génère un rapport stock concret"""
-    low_stock_products = list(Product.objects.filter(
-        current_stock__lte=F('min_stock')
-    ).values('reference', 'name', 'current_stock', 'min_stock'))
+    low_stock_products = list(Product.objects.filter(LOW_STOCK).values(
+        'reference', 'name', 'current_stock', 'min_stock'
+    ))
     
     critical_products = [p for p in low_stock_products if p['current_stock'] == 0]
     
@@ -2487,7 +1622,7 @@ def generate_customer_analysis():
 
 def generate_alert_summary():
     """Génère un résumé des alertes"""
-    low_stock_count = Product.objects.filter(current_stock__lte=F('min_stock')).count()
+    low_stock_count = Product.objects.filter(LOW_STOCK).count()
     delayed_orders_count = Order.objects.filter(
         delivery_date__lt=timezone.now().date(),
         status__in=['confirmed', 'in_production']
@@ -2513,13 +1648,36 @@ def execute_insight_action(action):
     """Exécute une action spécifique depuis un insight"""
     if action.startswith('reorder_'):
         reference = action.replace('reorder_', '')
+        product = Product.objects.filter(reference=reference).first()
+        forecast = get_product_forecast(product) if product else None
         return {
             'type': 'action',
             'message': f'Réapprovisionnement lancé pour {reference}',
             'data': {
                 'action': 'reorder',
                 'product_reference': reference,
-                'status': 'planned'
+                'status': 'planned',
+                'suggested_quantity': forecast['suggested_quantity'] if forecast else None,
+                'forecast': forecast
+            }
+        }
+    elif action == 'reapprovisionner_urgence':
+        # Quantités basées sur la demande prévue, pas sur un multiple du stock mini
+        forecast = get_catalog_forecast()
+        critical_products = list(Product.objects.filter(current_stock=0).values('id', 'reference', 'name'))
+        return {
+            'type': 'action',
+            'message': f'Réapprovisionnement urgent de {len(critical_products)} produit(s)',
+            'data': {
+                'action': 'reorder',
+                'products': [
+                    {
+                        'reference': p['reference'],
+                        'name': p['name'],
+                        **(forecast.for_product(p['id']) or {})
+                    }
+                    for p in critical_products
+                ]
             }
         }
     elif action == 'prioritize_delayed_orders':
@@ -2537,7 +1695,43 @@ def execute_insight_action(action):
     return {'type': 'action', 'message': 'Action exécutée', 'data': {}}
 
 
+# ========== SUIVI DES TÂCHES DE FOND ==========
+
+JOB_WAIT_MAX = 25  # secondes, en dessous des timeouts usuels des proxys
+
+@login_required
+async def job_status(request, job_id):
+    """État d'une tâche ; `?wait=N` attend jusqu'à N secondes qu'elle se termine (long polling)"""
+    user = await request.auser()
+    get_job = sync_to_async(Job.objects.filter(pk=job_id, created_by=user).first)
+    try:
+        wait = min(float(request.GET.get('wait', 0)), JOB_WAIT_MAX)
+    except ValueError:
+        wait = 0
+    
+    job = await get_job()
+    deadline = time.monotonic() + wait
+    while job is not None and not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        job = await get_job()
+    
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Tâche introuvable'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result if job.status == 'succeeded' else None,
+        'error': 'Le traitement a échoué' if job.status == 'failed' else None,
+    })
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for(user_names=('notifications',)))
 def notifications_list(request):
     notifications = Notification.objects.filter(
         user=request.user
@@ -2545,7 +1739,8 @@ def notifications_list(request):
     
     # Marquer toutes comme lues quand on visite la page
     if request.method == 'GET':
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        if Notification.objects.filter(user=request.user, is_read=False).update(is_read=True):
+            bump_versions(user_version_name('notifications', request.user.pk))
     
     return render(request, 'dashboard/notifications/list.html', {
         'notifications': notifications
@@ -2561,6 +1756,8 @@ def mark_notification_read(request, notification_id):
     return JsonResponse({'success': True})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=etag_for(user_names=('notifications',)))
 def get_unread_count(request):
     """Retourne le nombre de notifications non lues (API)"""
     count = Notification.objects.filter(user=request.user, is_read=False).count()
@@ -2570,7 +1767,8 @@ def get_unread_count(request):
 @login_required
 def mark_all_notifications_read(request):
     """Marque toutes les notifications comme lues"""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    if Notification.objects.filter(user=request.user, is_read=False).update(is_read=True):
+        bump_versions(user_version_name('notifications', request.user.pk))
     return JsonResponse({'success': True})
 
 @login_required
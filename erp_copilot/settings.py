@@ -64,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'dashboard.context_processors.data_versions',
             ],
         },
     },
@@ -130,4 +131,76 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Ajouter ces configurations
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
-LOGIN_URL = '/accounts/login/'
\ No newline at end of file
+LOGIN_URL = '/accounts/login/'
+# Prévision de la demande et points de commande (dashboard/forecasting.py)
+FORECAST_HISTORY_DAYS = 365
+FORECAST_LEAD_TIME_DAYS = 7
+FORECAST_REVIEW_PERIOD_DAYS = 7
+FORECAST_SERVICE_LEVEL_Z = 1.65
+FORECAST_CACHE_TTL = 3600
+
+# Calcul des besoins nets sur nomenclature (dashboard/bom.py)
+MRP_HORIZON_DAYS = 90
+MRP_MANUFACTURING_LEAD_TIME_DAYS = 2
+MRP_PURCHASE_LEAD_TIME_DAYS = 7
+
+# Ordonnancement et scénarios « et si » (dashboard/scheduling.py, dashboard/scenarios.py)
+SCHEDULING_HORIZON_DAYS = 180
+SCENARIO_MAX = 20
+# SCENARIO_WORKERS : processus du pool de simulation (défaut : min(4, nombre de CPU))
+OPTIMIZER_MAX_SECONDS = 60  # Budget maximal d'une optimisation de séquence (dashboard/optimizer.py)
+
+# Stock multi-emplacements : emplacement des mouvements sans emplacement explicite (dashboard/ledger.py)
+STOCK_DEFAULT_LOCATION = 'MAIN'
+
+# Analyse du stock : rotation, couverture, stock dormant, ABC (dashboard/inventory_analytics.py)
+INVENTORY_ANALYTICS_WINDOW_DAYS = 365
+INVENTORY_DEAD_STOCK_DAYS = 90
+
+# Copilot asynchrone (ASGI) : délai max par section d'analyse, en secondes
+COPILOT_SECTION_TIMEOUT = 5.0
+
+# Moteur de réponse de l'assistant IA (dashboard/ai_engine.py)
+# 'rules' = moteur à règles ; 'local' = serveur de modèle local compatible OpenAI, ex. :
+# AI_ENGINE = {'BACKEND': 'local', 'OPTIONS': {'url': 'http://127.0.0.1:11434/v1/chat/completions', 'model': 'mistral'}}
+AI_ENGINE = {'BACKEND': 'rules', 'OPTIONS': {}}
+AI_ANSWER_CACHE_TTL = 300
+
+# Analyses IA planifiées (dashboard/analysis_scheduler.py) : fraîcheur par type en secondes,
+# ex. AI_ANALYSIS_TTL = {'stock': 120, 'overview': 900}
+AI_ANALYSIS_TTL = {}
+AI_ANALYSIS_HISTORY_DAYS = 7
+
+# File de tâches de fond (dashboard/jobs.py), exécutée par `manage.py run_worker`
+# EAGER = True exécute les tâches dans la requête (développement sans worker)
+JOB_QUEUE = {
+    'EAGER': False,
+    'CONCURRENCY': 2,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_BACKOFF': 10,
+    'RESULT_TTL': 3600,
+    'LOCK_TIMEOUT': 600,
+    'POLL_INTERVAL': 1.0,
+    'MAINTENANCE_INTERVAL': 60,
+}
+
+# Outbox des événements métier (dashboard/outbox.py), livrés par `manage.py run_dispatcher`.
+# Puits : {'nom': {'BACKEND': 'webhook' | 'jsonl' | chemin pointé, 'OPTIONS': {...}}}, ex. :
+# 'SINKS': {'mes': {'BACKEND': 'webhook', 'OPTIONS': {'url': 'http://127.0.0.1:9000/events', 'secret': '...'}},
+#           'archive': {'BACKEND': 'jsonl', 'OPTIONS': {'path': BASE_DIR / 'var' / 'events.jsonl'}}}
+OUTBOX = {
+    'SINKS': {},
+    'BATCH_SIZE': 200,
+    'MAX_ATTEMPTS': 10,
+    'RETRY_BACKOFF': 5,
+    'MAX_BACKOFF': 3600,
+    'LEASE': 120,
+    'POLL_INTERVAL': 1.0,
+    'RETENTION_DAYS': 7,
+    'MAINTENANCE_INTERVAL': 300,
+}
+
+# Cache des fragments de gabarits indexé sur les versions des données (dashboard/data_versions.py).
+# Les versions sont en base et partagées par tous les processus ; le cache par défaut (mémoire locale)
+# garde les fragments par processus. Un cache partagé (Redis, Memcached) dans CACHES les partage aussi.
+FRAGMENT_CACHE_TTL = 3600
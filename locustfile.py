@@ -0,0 +1,98 @@
+"""
+Test de charge Locust des parcours principaux (voir dashboard/loadtest.py).
+
+    python manage.py seed_scale
+    python manage.py runserver
+    locust -f locustfile.py --host http://127.0.0.1:8000 --headless -u 20 -r 5 -t 2m
+
+Variables d'environnement : LOADTEST_PASSWORD, LOADTEST_PREFIX, LOADTEST_SEED
+et LOADTEST_OUTPUT (fichier JSON des résultats, même format que
+`manage.py loadtest`).
+"""
+import os
+import random
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erp_copilot.settings')
+django.setup()
+
+from locust import HttpUser, between, events, task  # noqa: E402
+
+from dashboard.loadtest import LOGIN_PATH, TASKS, build_request, load_targets, tasks_for_role, write_report  # noqa: E402
+from dashboard.seeding import PREFIX, ROLES  # noqa: E402
+
+PASSWORD = os.environ.get('LOADTEST_PASSWORD', 'password123')
+PREFIX = os.environ.get('LOADTEST_PREFIX', PREFIX)
+SEED = int(os.environ.get('LOADTEST_SEED', 42))
+OUTPUT = os.environ.get('LOADTEST_OUTPUT', 'loadtest-results.json')
+
+TARGETS = load_targets(prefix=PREFIX, seed=SEED)
+
+
+class RoleUser(HttpUser):
+    abstract = True
+    role = None
+    wait_time = between(0, 1)
+
+    def on_start(self):
+        self.rng = random.Random()
+        self.tasks_list, self.cum_weights = tasks_for_role(self.role)
+        self.etags = {}
+        self.client.get(LOGIN_PATH, name='login')
+        response = self.client.post(LOGIN_PATH, {
+            'username': f'{PREFIX.lower()}_{self.role}', 'password': PASSWORD,
+            'csrfmiddlewaretoken': self.client.cookies.get('csrftoken', ''),
+        }, name='login', allow_redirects=False)
+        if response.status_code != 302:
+            raise RuntimeError(f"Connexion refusée pour {PREFIX.lower()}_{self.role}")
+
+    @task
+    def journey(self):
+        current = self.rng.choices(self.tasks_list, cum_weights=self.cum_weights)[0]
+        path, data = build_request(current, TARGETS, self.rng)
+        if current.method == 'POST':
+            self.client.post(
+                path, data, name=current.name, allow_redirects=False,
+                headers={'X-CSRFToken': self.client.cookies.get('csrftoken', '')},
+            )
+        else:
+            # Revalidation comme un navigateur : If-None-Match avec le dernier ETag reçu (304 attendu)
+            headers = {'If-None-Match': self.etags[path]} if path in self.etags else {}
+            response = self.client.get(path, name=current.name, allow_redirects=False, headers=headers)
+            if response.status_code == 200 and 'ETag' in response.headers:
+                self.etags[path] = response.headers['ETag']
+
+
+# Une classe par rôle, à parts égales (comme le client asyncio)
+for _role in ROLES:
+    globals()[f'{_role.capitalize()}User'] = type(f'{_role.capitalize()}User', (RoleUser,), {'role': _role})
+
+
+@events.quitting.add_listener
+def _write_report(environment, **kwargs):
+    stats = environment.stats
+    duration = max(stats.last_request_timestamp - stats.start_time, 0) if stats.last_request_timestamp else 0
+
+    def summary(entry):
+        return {
+            'requests': entry.num_requests,
+            'failures': entry.num_failures,
+            'throughput_rps': round(entry.num_requests / duration, 2) if duration else None,
+            'mean_ms': round(entry.avg_response_time, 2),
+            'p50_ms': entry.get_response_time_percentile(0.50),
+            'p95_ms': entry.get_response_time_percentile(0.95),
+            'p99_ms': entry.get_response_time_percentile(0.99),
+            'max_ms': entry.max_response_time,
+        }
+
+    endpoints = {name: summary(entry) for (name, _), entry in sorted(stats.entries.items()) if name != 'login'}
+    endpoints['total'] = summary(stats.total)
+    write_report(OUTPUT, {
+        'tool': 'locust',
+        'host': environment.host,
+        'users': environment.runner.user_count if environment.runner else None,
+        'duration_s': round(duration, 2),
+        'seed': SEED,
+        'tasks': {current.name: current.weight for current in TASKS},
+    }, endpoints)